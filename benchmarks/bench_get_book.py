@@ -0,0 +1,73 @@
+"""Compare latency of GET /books/<id> with and without stats recalculation
+
+Run from repository root:
+    python -m benchmarks.bench_get_book
+"""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+from sqlalchemy import event
+from book_library_app import create_app, db
+from book_library_app.books import books
+from book_library_app.commands.db_manage_commands import add_data
+from book_library_app.response_cache import init_response_cache
+from book_library_app.utils import recompute_stats
+
+REQUESTS = 500
+BOOK_ID = 1
+
+
+def run(app, label: str) -> None:
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    event.listen(engine, "commit", lambda *args: statements.append("COMMIT"))
+
+    with app.test_client() as client:
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            client.get(f"/api/v1/books/{BOOK_ID}")
+        elapsed = time.perf_counter() - start
+
+    commits = statements.count("COMMIT")
+    print(
+        f"{label:<22} {elapsed / REQUESTS * 1000:7.3f} ms/request "
+        f"{(len(statements) - commits) / REQUESTS:5.1f} statements "
+        f"{commits / REQUESTS:4.1f} commits per request"
+    )
+
+
+def main() -> None:
+    # cover links are out of scope, only database work is measured
+    books.get_book_cover_link = lambda cover_name: cover_name
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app = create_app("testing")
+        app.config["SQLALCHEMY_DATABASE_URI"] = (
+            f"sqlite:///{Path(tmp_dir) / 'bench.db'}"
+        )
+        with app.app_context():
+            db.create_all()
+        app.test_cli_runner().invoke(add_data)
+        # cached responses skip the view, the read itself is measured
+        app.config["RESPONSE_CACHE"] = None
+        init_response_cache(app)
+
+        run(app, "pure read")
+
+        # recalculation on every view as GET /books/<id> used to do
+        @app.before_request
+        def recalculate_book_stats():
+            recompute_stats(BOOK_ID, BOOK_ID)
+
+        run(app, "read with recalculation")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Compare stdlib json and orjson encoding of book list responses
+
+Run from repository root:
+    python -m benchmarks.bench_json
+"""
+
+import time
+from flask import jsonify
+from flask.json import JSONEncoder
+from book_library_app import create_app
+from book_library_app.json_provider import OrjsonEncoder
+from book_library_app.models import BookSchema
+from book_library_app.serializers import get_serializer
+from benchmarks.bench_serializers import make_page
+
+PAGE_SIZES = [5, 100, 1000]
+REQUESTS = 200
+
+
+def make_response_data(page_size: int) -> dict:
+    books = (make_page()[BookSchema] * (page_size // 100 + 1))[:page_size]
+    return {
+        "success": True,
+        "data": get_serializer(BookSchema, many=True).dump(books),
+        "numbers_of_records": page_size,
+        "pagination": {
+            "total_pages": 20,
+            "total_records": 20 * page_size,
+            "current_page": f"/api/v1/books?page=1&limit={page_size}",
+            "next_page": f"/api/v1/books?page=2&limit={page_size}",
+        },
+    }
+
+
+def responses_per_second(app, encoder, data) -> float:
+    app.json_encoder = encoder
+    with app.test_request_context():
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            jsonify(data)
+        return REQUESTS / (time.perf_counter() - start)
+
+
+def main() -> None:
+    app = create_app("testing")
+    # compact output like in production
+    app.debug = False
+    for page_size in PAGE_SIZES:
+        data = make_response_data(page_size)
+        stdlib = responses_per_second(app, JSONEncoder, data)
+        orjson = responses_per_second(app, OrjsonEncoder, data)
+        print(
+            f"{page_size:>5} books per page: json {stdlib:8.0f} responses/s "
+            f"orjson {orjson:8.0f} responses/s ({orjson / stdlib:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
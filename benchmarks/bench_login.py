@@ -0,0 +1,80 @@
+"""Login throughput with passwords hashed in request threads and in a pool
+of processes
+
+Run from repository root:
+    python -m benchmarks.bench_login
+"""
+
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from book_library_app import create_app, db
+from book_library_app.models import User
+from book_library_app.passwords import get_hash_function
+
+USERS = 16
+LOGINS = 200
+THREADS = 16
+ITERATIONS = 260000
+
+
+def login(app, number: int) -> int:
+    with app.test_client() as client:
+        response = client.post(
+            "/api/v1/auth/login",
+            json={"username": f"user{number % USERS}", "password": "password"},
+        )
+    return response.status_code
+
+
+def run(app, label: str) -> None:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as executor:
+        statuses = list(executor.map(lambda number: login(app, number), range(LOGINS)))
+    elapsed = time.perf_counter() - start
+    app.extensions["password_hasher"].shutdown()
+
+    rate = statuses.count(200) / elapsed
+    print(
+        f"{label:<30} {rate:7.1f} logins/s {rate / os.cpu_count():7.1f} per core "
+        f"{statuses.count(503)} rejected with 503"
+    )
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app = create_app("testing")
+        app.config.update(
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{Path(tmp_dir) / 'bench.db'}",
+            SECRET_KEY=app.config["SECRET_KEY"] or "benchmark",
+            PASSWORD_HASH_ITERATIONS=ITERATIONS,
+            PASSWORD_HASH_QUEUE_TIMEOUT=60,
+        )
+        with app.app_context():
+            db.create_all()
+            hash_function = get_hash_function(app.config)
+            for number in range(USERS):
+                db.session.add(
+                    User(
+                        username=f"user{number}",
+                        email=f"user{number}@test.com",
+                        password=hash_function("password"),
+                    )
+                )
+            db.session.commit()
+
+        print(f"{os.cpu_count()} cores, pbkdf2 with {ITERATIONS} iterations")
+        app.config["PASSWORD_HASH_WORKERS"] = 0
+        run(app, "hashing in request threads")
+        app.config["PASSWORD_HASH_WORKERS"] = None
+        run(app, "hashing in process pool")
+
+        # small queue, logins over the limit are rejected instead of waiting
+        app.config.update(PASSWORD_HASH_QUEUE_SIZE=0, PASSWORD_HASH_QUEUE_TIMEOUT=0)
+        run(app, "process pool without queue")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare cost of S3 calls with a client created per call and a shared client,
+S3 is replaced by moto so no network or real credentials are needed
+
+Run from repository root:
+    python -m benchmarks.bench_s3_client
+"""
+
+import io
+import os
+import time
+import boto3
+from botocore.client import Config
+from moto import mock_aws
+from book_library_app import create_app
+from book_library_app.utils import get_boto3_client
+
+CALLS = 200
+BUCKET = "booklibraryimagebucket"
+
+
+def client_per_call():
+    return boto3.client(
+        "s3",
+        region_name="eu-central-1",
+        aws_access_key_id=os.environ.get("S3_KEY"),
+        aws_secret_access_key=os.environ.get("S3_SECRET"),
+        config=Config(signature_version=os.environ.get("signature_version")),
+    )
+
+
+def run(label: str, get_client) -> None:
+    start = time.perf_counter()
+    for number in range(CALLS):
+        get_client().generate_presigned_url(
+            "get_object",
+            Params={"Bucket": BUCKET, "Key": f"cover{number}.jpg"},
+            ExpiresIn=300,
+        )
+    signing = (time.perf_counter() - start) / CALLS
+
+    start = time.perf_counter()
+    for number in range(CALLS):
+        get_client().put_object(
+            Body=io.BytesIO(b"cover"), Bucket=BUCKET, Key=f"cover{number}.jpg"
+        )
+    upload = (time.perf_counter() - start) / CALLS
+
+    print(
+        f"{label:<18} presigned url {signing * 1000:7.3f} ms "
+        f"upload {upload * 1000:7.3f} ms per call"
+    )
+
+
+def main() -> None:
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.update(S3_KEY="testing", S3_SECRET="testing", signature_version="s3v4")
+
+    app = create_app("testing")
+    with mock_aws(), app.app_context():
+        get_boto3_client().create_bucket(
+            Bucket=BUCKET,
+            CreateBucketConfiguration={"LocationConstraint": "eu-central-1"},
+        )
+        run("client per call", client_per_call)
+        run("shared client", get_boto3_client)
+
+
+if __name__ == "__main__":
+    main()
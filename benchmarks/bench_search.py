@@ -0,0 +1,102 @@
+"""Compare ?q= search with full text index and with LIKE scans of books
+
+Run from repository root:
+    python -m benchmarks.bench_search
+"""
+
+import os
+import random
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from book_library_app import create_app, db
+from book_library_app.models import Author, Book
+from book_library_app.search import apply_search, update_search_index
+
+AUTHORS = 500
+BOOKS = 50000
+REQUESTS = 20
+QUERIES = ["zorvath", "harbor", "harbor lantern", "george"]
+
+
+def add_books(seed: int = 0) -> None:
+    rng = random.Random(seed)
+    # words have different frequencies like in natural language
+    words = [
+        f"{rng.choice('bcdfghklmnprst')}{rng.randint(0, 10**6)}" for _ in range(5000)
+    ]
+    words += ["harbor", "lantern", "zorvath"]
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    weights[-1] = 0.00001
+
+    db.session.execute(
+        Author.__table__.insert(),
+        [
+            {
+                "id": number,
+                "first_name": rng.choice(["George", "Ann", "Kurt", "Olga"]),
+                "last_name": f"Author{number}",
+                "birth_date": date(1950, 1, 1),
+            }
+            for number in range(1, AUTHORS + 1)
+        ],
+    )
+    db.session.execute(
+        Book.__table__.insert(),
+        [
+            {
+                "id": number,
+                "title": " ".join(rng.choices(words, weights, k=3)),
+                "isbn": 9780000000000 + number,
+                "number_of_pages": 100,
+                "description": " ".join(rng.choices(words, weights, k=60)),
+                "author_id": rng.randint(1, AUTHORS),
+                "book_category": "novel",
+                "cover_name": f"cover{number}.jpg",
+            }
+            for number in range(1, BOOKS + 1)
+        ],
+    )
+    update_search_index(Author)
+    db.session.commit()
+
+
+def search(app, text: str) -> tuple[int, float]:
+    """Number of matching books and ms per request with count and first page"""
+    with app.test_request_context(query_string={"q": text}):
+        query = apply_search(Book, Book.query).order_by(Book.id)
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            total = query.order_by(None).count()
+            query.limit(20).all()
+        return total, (time.perf_counter() - start) / REQUESTS * 1000
+
+
+def main() -> None:
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app = create_app("testing")
+        app.config["SQLALCHEMY_DATABASE_URI"] = (
+            f"sqlite:///{Path(tmp_dir) / 'bench.db'}"
+        )
+        with app.app_context():
+            db.create_all()
+            add_books()
+
+            print(f"{BOOKS} books")
+            for text in QUERIES:
+                results = []
+                for backend in ["auto", "like"]:
+                    app.config["SEARCH_BACKEND"] = backend
+                    results.append(search(app, text))
+                (total, full_text), (_, like) = results
+                print(
+                    f"q={text!r:<18} {total:6} matches: full text {full_text:8.2f} ms "
+                    f"like {like:8.2f} ms ({like / full_text:.0f}x)"
+                )
+
+
+if __name__ == "__main__":
+    main()
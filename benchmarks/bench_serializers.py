@@ -0,0 +1,83 @@
+"""Compare rows per second of marshmallow schemas and compiled serializers
+on large pages of books, authors and votes
+
+Run from repository root:
+    python -m benchmarks.bench_serializers
+"""
+
+import time
+from datetime import date
+from book_library_app.models import (
+    Author,
+    AuthorSchema,
+    Book,
+    BookSchema,
+    Votes,
+    VotesSchema,
+)
+from book_library_app.serializers import get_serializer
+
+PAGE_SIZE = 100
+PAGES = 200
+
+
+def make_page() -> dict:
+    authors = [
+        Author(
+            id=number,
+            first_name="George",
+            last_name="Orwell",
+            birth_date=date(1903, 6, 25),
+            author_average_score=3.5,
+        )
+        for number in range(PAGE_SIZE)
+    ]
+    books = [
+        Book(
+            id=number,
+            title="Animal Farm",
+            isbn=9780141036137 + number,
+            number_of_pages=112,
+            description="Mr Jones of Manor Farm is so lazy and drunken " * 5,
+            author_id=number,
+            author=authors[number],
+            book_category="social",
+            cover_name=f"cover{number}.jpg",
+            number_of_votes=3,
+            score_sum=12,
+            average_book_score=4.0,
+        )
+        for number in range(PAGE_SIZE)
+    ]
+    votes = [
+        Votes(comment_id=number, points=4, comment_text="Good", book_id=1, user_id=1)
+        for number in range(PAGE_SIZE)
+    ]
+    return {BookSchema: books, AuthorSchema: authors, VotesSchema: votes}
+
+
+def rows_per_second(dump, items) -> float:
+    start = time.perf_counter()
+    for _ in range(PAGES):
+        dump(items)
+    return PAGES * len(items) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    pages = make_page()
+    for schema_class, items in pages.items():
+        # schema is built on every request like list endpoints used to do
+        marshmallow = rows_per_second(
+            lambda items: schema_class(many=True).dump(items), items
+        )
+        compiled = rows_per_second(
+            lambda items: get_serializer(schema_class, many=True).dump(items), items
+        )
+        print(
+            f"{schema_class.__name__:<13} marshmallow {marshmallow:10.0f} rows/s "
+            f"compiled {compiled:10.0f} rows/s ({compiled / marshmallow:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Latency of prefix lookups in /suggest index with millions of titles
+
+Run from repository root:
+    python -m benchmarks.bench_suggest
+"""
+
+import os
+import random
+import time
+from book_library_app import create_app
+from book_library_app.suggestions import get_book_entries
+
+TITLES = 2_000_000
+LOOKUPS = 100_000
+
+
+def make_titles(rng: random.Random) -> list[str]:
+    syllables = ["ka", "lo", "mi", "ne", "ra", "to", "vu", "sha", "qui", "ber"]
+    words = ["".join(rng.choices(syllables, k=rng.randint(1, 4))) for _ in range(20000)]
+    return [" ".join(rng.choices(words, k=rng.randint(1, 5))) for _ in range(TITLES)]
+
+
+def main() -> None:
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    rng = random.Random(0)
+    titles = make_titles(rng)
+
+    app = create_app("testing")
+    index = app.extensions["suggest"]["book"]
+    start = time.perf_counter()
+    # the same as index.build() without reading titles from database
+    index.records = {
+        book_id: get_book_entries(book_id, title)
+        for book_id, title in enumerate(titles, 1)
+    }
+    index.entries = sorted(
+        entry for entries in index.records.values() for entry in entries
+    )
+    index.version = []
+    print(f"{TITLES} titles indexed in {time.perf_counter() - start:.1f} s")
+
+    # prefixes typed letter by letter, version check is not measured
+    app.config["SUGGEST_REFRESH_INTERVAL"] = float("inf")
+    prefixes = []
+    for title in rng.choices(titles, k=LOOKUPS // 5):
+        prefixes += [title[:length] for length in range(1, 6)]
+
+    latencies = []
+    with app.app_context():
+        for prefix in prefixes:
+            start = time.perf_counter()
+            index.lookup(prefix, 10)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for book_id in range(TITLES + 1, TITLES + 1001):
+            index.add(book_id, rng.choice(titles))
+        insert = (time.perf_counter() - start) / 1000
+
+    latencies.sort()
+    for percentile in [50, 99, 99.9]:
+        latency = latencies[int(len(latencies) * percentile / 100) - 1]
+        print(f"p{percentile:<5} lookup {latency * 1e6:7.1f} us")
+    print(f"insert of a title {insert * 1e6:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Cost of token verification in token_required with and without cache of
+verified tokens, and of the check of revoked tokens
+
+Run from repository root:
+    python -m benchmarks.bench_token
+"""
+
+import time
+import tempfile
+import jwt
+from datetime import datetime, timedelta
+from pathlib import Path
+from book_library_app import create_app, db
+from book_library_app.models import RevokedToken
+from book_library_app.revocations import get_token_revocations
+from book_library_app.utils import decode_token, jwt_cache
+
+REQUESTS = 100_000
+REVOKED = 10_000
+
+
+def main() -> None:
+    app = create_app("testing")
+    # config reads SECRET_KEY from environment when it is imported
+    app.config["SECRET_KEY"] = app.config["SECRET_KEY"] or "benchmark"
+    database = Path(tempfile.mkdtemp()) / "bench_token.db"
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{database}"
+    expires_at = datetime.utcnow() + timedelta(minutes=15)
+    payload = {"user_id": 1, "exp": expires_at, "jti": "valid", "iat": time.time()}
+    token = jwt.encode(payload, app.config["SECRET_KEY"])
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(
+            RevokedToken.__table__.insert(),
+            [
+                {"kind": "token", "key": f"revoked{number}", "expires_at": expires_at}
+                for number in range(REVOKED)
+            ],
+        )
+        db.session.commit()
+
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])
+        uncached = (time.perf_counter() - start) / REQUESTS
+
+        jwt_cache.clear()
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            decode_token(token)
+        cached = (time.perf_counter() - start) / REQUESTS
+
+        revocations = get_token_revocations()
+        payload = decode_token(token)
+        revocations.sync()
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            revocations.is_revoked(payload)
+        in_memory = (time.perf_counter() - start) / REQUESTS
+
+        query = RevokedToken.query.filter(
+            RevokedToken.kind == "token", RevokedToken.key == payload["jti"]
+        )
+        start = time.perf_counter()
+        for _ in range(REQUESTS // 10):
+            db.session.query(query.exists()).scalar()
+        in_database = (time.perf_counter() - start) / (REQUESTS // 10)
+
+    print(f"jwt.decode   {uncached * 1e6:6.2f} us per request")
+    print(f"decode_token {cached * 1e6:6.2f} us per request, {jwt_cache.stats()}")
+    print(f"revocation in Bloom filter {in_memory * 1e6:6.2f} us per request")
+    print(f"revocation in database     {in_database * 1e6:6.2f} us per request")
+    database.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,41 @@ def create_app(config_name="development"):
     db.init_app(app)
     migrate.init_app(app, db)
 
+    # orjson based encoding of responses with fallback to stdlib json
+    from book_library_app.json_provider import init_json
+
+    init_json(app)
+
+    # cache of GET responses, shared by workers with sqlite backend
+    from book_library_app.response_cache import init_response_cache
+
+    init_response_cache(app)
+
+    # in memory prefix index of titles and author names for /suggest
+    from book_library_app.suggestions import init_suggestions
+
+    init_suggestions(app)
+
+    # outgoing emails sent in background from a queue in database
+    from book_library_app.mail_queue import init_mail_queue
+
+    init_mail_queue(app)
+
+    # password hashing in a pool of processes
+    from book_library_app.passwords import init_password_hasher
+
+    init_password_hasher(app)
+
+    # revoked refresh tokens kept in memory of every process
+    from book_library_app.refresh_tokens import init_refresh_tokens
+
+    init_refresh_tokens(app)
+
+    # revoked access tokens kept in memory of every process
+    from book_library_app.revocations import init_token_revocations
+
+    init_token_revocations(app)
+
     # responsible for adding or remove sample data from database
     from book_library_app.commands import db_manage_bp
 
@@ -29,6 +64,8 @@ def create_app(config_name="development"):
     from book_library_app.books import books_bp
     from book_library_app.auth import auth_bp
     from book_library_app.votes import votes_bp
+    from book_library_app.suggest import suggest_bp
+    from book_library_app.export import export_bp
 
     app.register_blueprint(db_manage_bp)
     app.register_blueprint(errors_bp)
@@ -36,5 +73,7 @@ def create_app(config_name="development"):
     app.register_blueprint(books_bp, url_prefix="/api/v1")
     app.register_blueprint(auth_bp, url_prefix="/api/v1/auth")
     app.register_blueprint(votes_bp, url_prefix="/api/v1")
+    app.register_blueprint(suggest_bp, url_prefix="/api/v1")
+    app.register_blueprint(export_bp, url_prefix="/api/v1")
 
     return app
@@ -1,19 +1,30 @@
 from book_library_app.auth import auth_bp
 from book_library_app.utils import (
     token_required,
+    get_token_payload,
     validate_json_content_type,
-    email_sender,
+)
+from book_library_app.mail_queue import queue_email, notify_mail_queue
+from book_library_app.revocations import revoke_token, revoke_user_tokens
+from book_library_app.passwords import hash_password, check_password
+from book_library_app.refresh_tokens import (
+    get_token_hash,
+    issue_refresh_token,
+    revoke_refresh_tokens,
+    rotate_refresh_token,
 )
 from webargs.flaskparser import use_args
 from book_library_app.models import (
     HashResetTable,
+    RefreshToken,
+    RefreshTokenSchema,
     UserSchema,
     user_schema,
     User,
     user_password_update_schema,
     UserPasswordUpdateSchema,
 )
-from flask import jsonify, abort, url_for
+from flask import jsonify, abort, url_for, request
 from book_library_app import db
 
 
@@ -29,15 +40,17 @@ def register(args: dict):
     if User.query.filter(User.email == args["email"]).first():
         abort(409, description=(f'User with email { args["email"] } alredy exists'))
 
-    args["password"] = User.generate_hashed_password(args["password"])
+    args["password"] = hash_password(args["password"])
     user = User(**args)
 
     db.session.add(user)
+    db.session.flush()
+    refresh_token = issue_refresh_token(user.id)
     db.session.commit()
 
     token = user.generate_jwt()
 
-    return jsonify({"token": token}), 201
+    return jsonify({"token": token, "refresh_token": refresh_token}), 201
 
 
 @auth_bp.route("/login", methods=["POST"])
@@ -48,12 +61,61 @@ def login(args: dict):
     if not user:
         abort(401, description=("Invalid credentials"))
 
-    if not user.is_password_valid(args["password"]):
+    if not check_password(user, args["password"]):
         abort(401, description=("Invalid credentials"))
+    refresh_token = issue_refresh_token(user.id)
+    # password hash is replaced when hashing settings were changed
+    db.session.commit()
 
     token = user.generate_jwt()
 
-    return jsonify({"token": token})
+    return jsonify({"token": token, "refresh_token": refresh_token})
+
+
+@auth_bp.route("/refresh", methods=["POST"])
+@validate_json_content_type
+@use_args(RefreshTokenSchema(), error_status_code=400)
+def refresh(args: dict):
+    # refresh token replaces password, so no hashing is done here
+    user_id, refresh_token = rotate_refresh_token(args["refresh_token"])
+    user = User.query.get(user_id)
+    if user is None:
+        abort(401, description="Invalid refresh token, please login")
+
+    token = user.generate_jwt()
+
+    return jsonify({"token": token, "refresh_token": refresh_token})
+
+
+@auth_bp.route("/logout", methods=["POST"])
+@token_required
+def logout(user_id: int):
+    revoke_token(get_token_payload())
+    # refresh token given in body is revoked with tokens rotated from it
+    refresh_token = (request.get_json(silent=True) or {}).get("refresh_token")
+    if refresh_token:
+        family = (
+            db.session.query(RefreshToken.family)
+            .filter(
+                RefreshToken.token_hash == get_token_hash(refresh_token),
+                RefreshToken.user_id == user_id,
+            )
+            .scalar_subquery()
+        )
+        revoke_refresh_tokens(RefreshToken.family == family)
+    db.session.commit()
+
+    return jsonify({"data": "You have been logged out"})
+
+
+@auth_bp.route("/logout/all", methods=["POST"])
+@token_required
+def logout_all(user_id: int):
+    revoke_user_tokens(user_id)
+    revoke_refresh_tokens(RefreshToken.user_id == user_id)
+    db.session.commit()
+
+    return jsonify({"data": "You have been logged out from all devices"})
 
 
 @auth_bp.route("/me", methods=["GET"])
@@ -75,10 +137,12 @@ def update_user_password(user_id: int, args):
         user_id, description=f"User with id {user_id} not found"
     )
 
-    if not user.is_password_valid(args["current_password"]):
+    if not check_password(user, args["current_password"]):
         abort(401, description="Invalid password")
 
-    user.password = user.generate_hashed_password(args["new_password"])
+    user.password = hash_password(args["new_password"])
+    # sessions started with the old password have to login again
+    revoke_refresh_tokens(RefreshToken.user_id == user.id)
     db.session.commit()
     return jsonify({"data": user_schema.dump(user)})
 
@@ -120,11 +184,12 @@ def reset_password(args: dict, hash: str):
 
     user = User.query.get_or_404(hash_record.user_id, description="Wrong adres")
 
-    if user.is_password_valid(args["new_password"]):
+    if check_password(user, args["new_password"]):
         db.session.delete(hash_record)
         abort(401, "New password can't be the same as old one")
 
-    user.password = User.generate_hashed_password(args["new_password"])
+    user.password = hash_password(args["new_password"])
+    revoke_refresh_tokens(RefreshToken.user_id == user.id)
 
     db.session.delete(hash_record)
     db.session.commit()
@@ -146,14 +211,14 @@ def send_recovery_email(args: dict):
 
             Best regards :D
             """
-        email_sender(args["email"], text)
+        queue_email(args["email"], text)
     else:
 
         hash = HashResetTable()
         hash.hash_code = hash.generate_jwt()
         hash.user_id = user.id
         db.session.add(hash)
-        db.session.commit()
+        db.session.flush()
 
         text = f"""\
             Your reset password link:
@@ -161,6 +226,10 @@ def send_recovery_email(args: dict):
             Best regards :D
             """
 
-        email_sender(args["email"], text, hashCode=hash.hash_code)
+        queue_email(args["email"], text)
+
+    # email is sent by background workers, so request does not wait for SMTP
+    db.session.commit()
+    notify_mail_queue()
 
     return jsonify({"data": "Reset link has been send to provided email"})
@@ -1,27 +1,57 @@
 from flask import jsonify
 from book_library_app import db
 from book_library_app.utils import validate_json_content_type
-from book_library_app.models import Author, AuthorSchema, author_schema
+from book_library_app.models import Author, AuthorSchema, Book, Votes, author_schema
 from webargs.flaskparser import use_args
 from book_library_app.authors import authors_bp
+from book_library_app.serializers import get_serializer
+from book_library_app.search import apply_search, update_search_index
+from book_library_app.suggestions import (
+    bump_suggest_versions,
+    update_suggestions,
+    add_suggestions,
+    remove_suggestions,
+)
+from book_library_app.bulk import (
+    load_bulk_items,
+    get_bulk_rows,
+    insert_many,
+    get_bulk_errors,
+)
 from book_library_app.utils import (
     get_schema_args,
+    get_eager_options,
+    get_load_options,
+    get_books_preview_limit,
+    load_books_preview,
     apply_order,
     apply_filter,
     get_pagination,
     token_required,
+    conditional_response,
+    bump_table_versions,
 )
 
 
 @authors_bp.route("/authors", methods=["GET"])
+@conditional_response(Author, Book)
 def get_authors():
     """Query table Authors and returns data as json"""
-    query = Author.query
     schema_args = get_schema_args(Author)
+    serializer = get_serializer(AuthorSchema, **schema_args)
+    schema = serializer.schema
+    # books are limited to a short preview, all of them are in /authors/<id>/books
+    query = Author.query.options(
+        *get_load_options(Author, schema),
+        *get_eager_options(Author, schema, exclude={"books"}),
+    )
+    query = apply_search(Author, query)
     query = apply_order(Author, query)
     query = apply_filter(Author, query)
     items, pagination = get_pagination(query, "authors.get_authors")
-    authors = AuthorSchema(**schema_args).dump(items)
+    if "books" in schema.dump_fields:
+        load_books_preview(items, get_books_preview_limit())
+    authors = serializer.dump(items)
 
     return jsonify(
         {
@@ -33,12 +63,14 @@ def get_authors():
 
 
 @authors_bp.route("/authors/<int:author_id>", methods=["GET"])
+@conditional_response(Author, Book)
 def get_author(author_id: int):
     """Query DB for a specific id if not found returns 404 error
     which is handled"""
-    authors = Author.query.get_or_404(
-        author_id, description=f"Author with id: {author_id} not found"
-    )
+    authors = Author.query.options(
+        *get_eager_options(Author, author_schema, exclude={"books"})
+    ).get_or_404(author_id, description=f"Author with id: {author_id} not found")
+    load_books_preview([authors], get_books_preview_limit())
     return jsonify({"data": author_schema.dump(authors)})
 
 
@@ -51,11 +83,48 @@ def create_author(user_id: int, kwargs: dict):
     Then webargs library is used to validate user input based of marshmallow schema"""
     author = Author(**kwargs)
     db.session.add(author)
+    db.session.flush()
+    update_search_index(Author, [author.id])
+    bump_table_versions(Author)
+    bump_suggest_versions(Author)
     db.session.commit()
+    update_suggestions(author)
 
     return jsonify({"data": author_schema.dump(author)}), 201
 
 
+@authors_bp.route("/authors/bulk", methods=["POST"])
+@token_required
+@validate_json_content_type
+def create_authors(user_id: int):
+    """Create list of authors in one transaction, invalid items are skipped and
+    returned in errors with their positions in the list"""
+    schema = AuthorSchema(many=True, exclude=["books"])
+    items, errors = load_bulk_items(schema)
+    rows = [row for _, row in get_bulk_rows(Author, items, errors)]
+
+    ids = insert_many(Author, rows)
+    for row, author_id in zip(rows, ids):
+        row["id"] = author_id
+    if rows:
+        update_search_index(Author, ids)
+        bump_table_versions(Author)
+        bump_suggest_versions(Author)
+    db.session.commit()
+    add_suggestions(Author, rows)
+
+    return (
+        jsonify(
+            {
+                "data": schema.dump(rows),
+                "number_of_records": len(rows),
+                "errors": get_bulk_errors(errors),
+            }
+        ),
+        201,
+    )
+
+
 @authors_bp.route("/authors/<int:author_id>", methods=["PUT"])
 @token_required
 @validate_json_content_type
@@ -69,7 +138,12 @@ def update_author(user_id: int, kwargs: dict, author_id: int):
     authors.last_name = kwargs["last_name"]
     authors.birth_date = kwargs["birth_date"]
 
+    db.session.flush()
+    update_search_index(Author, [author_id])
+    bump_table_versions(Author)
+    bump_suggest_versions(Author)
     db.session.commit()
+    update_suggestions(authors)
 
     return jsonify({"data": author_schema.dump(authors)})
 
@@ -81,7 +155,15 @@ def delete_author(user_id: int, author_id: int):
         author_id, description=f"Author with id: {author_id} not found"
     )
 
+    books_ids = [book.id for book in authors.books]
     db.session.delete(authors)
+    db.session.flush()
+    # books of the author are deleted with it
+    update_search_index(Author, [author_id])
+    bump_table_versions(Author, Book, Votes)
+    bump_suggest_versions(Author, Book)
     db.session.commit()
+    remove_suggestions(Author, [author_id])
+    remove_suggestions(Book, books_ids)
 
     return jsonify({"data": f"Author with {author_id} has been deleted"})
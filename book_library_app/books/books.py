@@ -2,38 +2,65 @@ from sre_constants import SUCCESS
 from flask import jsonify, abort
 from book_library_app import db
 from book_library_app.utils import validate_json_content_type
-from book_library_app.models import Book, BookSchema, book_schema, Author
+from book_library_app.models import Book, BookSchema, book_schema, Author, Votes
 from webargs.flaskparser import use_args
+from sqlalchemy.exc import IntegrityError
 from book_library_app.books import books_bp
+from book_library_app.serializers import get_serializer
+from book_library_app.search import apply_search, update_search_index
+from book_library_app.suggestions import (
+    bump_suggest_versions,
+    update_suggestions,
+    add_suggestions,
+    remove_suggestions,
+)
+from book_library_app.bulk import (
+    load_bulk_items,
+    get_bulk_rows,
+    insert_many,
+    get_bulk_errors,
+)
 from book_library_app.utils import (
-    calculate_stats,
     get_schema_args,
+    get_eager_options,
+    get_load_options,
     apply_order,
     apply_filter,
     get_pagination,
     token_required,
+    conditional_response,
+    bump_table_versions,
     get_book_cover_link,
+    get_book_cover_links,
+    invalidate_book_cover_link,
     upload_file_s3_bucket,
 )
 
 
 # add defoult cover
 @books_bp.route("/books", methods=["GET"])
+@conditional_response(Book, Author, cover_links=True)
 def get_books():
     """Query table Authors and returns data as json"""
-    query = Book.query
+    # specify what fields are to be serialized Schema(only=[fields])
+    schema_args = get_schema_args(Book)
+    serializer = get_serializer(BookSchema, **schema_args)
+    schema = serializer.schema
+
+    query = Book.query.options(
+        *get_load_options(Book, schema), *get_eager_options(Book, schema)
+    )
+    query = apply_search(Book, query)
     query = apply_order(Book, query)
     query = apply_filter(Book, query)
     items, pagination = get_pagination(query, "books.get_books")
 
-    # specify what fields are to be serialized Schema(only=[fields])
-    schema_args = get_schema_args(Book)
-
-    books = BookSchema(**schema_args).dump(items)
+    books = serializer.dump(items)
 
     if "only" in schema_args.keys() and "cover_name" in schema_args["only"]:
+        links = get_book_cover_links([book["cover_name"] for book in books])
         for book in books:
-            book["cover_name"] = get_book_cover_link(book["cover_name"])
+            book["cover_name"] = links[book["cover_name"]]
 
     return jsonify(
         {
@@ -45,13 +72,14 @@ def get_books():
 
 
 @books_bp.route("/books/<int:book_id>", methods=["GET"])
+@conditional_response(Book, Author, cover_links=True)
 def get_book(book_id: int):
-
-    book = Book.query.get_or_404(
+    """Stats are kept up to date by vote endpoints so this view only reads,
+    author nested in BookSchema is loaded in the same query"""
+    book = Book.query.options(*get_eager_options(Book, book_schema)).get_or_404(
         book_id, description=f"Book with id: {book_id} not found"
     )
 
-    calculate_stats([book_id])
     book_json = book_schema.dump(book)
     book_json["cover_name"] = get_book_cover_link(book_json["cover_name"])
 
@@ -88,7 +116,12 @@ def update_book(author_id: str, args: dict, book_id: int):
         )
         book.author_id = author_id
 
+    db.session.flush()
+    update_search_index(Book, [book.id])
+    bump_table_versions(Book)
+    bump_suggest_versions(Book)
     db.session.commit()
+    update_suggestions(book)
 
     return jsonify({"data": book_schema.dump(book)})
 
@@ -103,7 +136,9 @@ def update_cover(user_id, book_id):
     cover_name_with_extension = upload_file_s3_bucket(cover_name_with_id)
 
     if cover_name_with_extension is not None:
+        invalidate_book_cover_link(book.cover_name)
         book.cover_name = cover_name_with_extension
+        bump_table_versions(Book)
         db.session.commit()
 
     return jsonify({"success": "True"})
@@ -117,19 +152,35 @@ def delete_book(author_id: str, book_id: int):
     )
 
     db.session.delete(book)
+    db.session.flush()
+    update_search_index(Book, [book_id])
+    bump_table_versions(Book, Votes)
+    bump_suggest_versions(Book)
     db.session.commit()
+    remove_suggestions(Book, [book_id])
 
     return jsonify({"data": f"Book with {book_id} has been deleted"})
 
 
 @books_bp.route("/authors/<int:author_id>/books", methods=["GET"])
+@conditional_response(Book, Author)
 def get_all_author_books(author_id: int):
     Author.query.get_or_404(author_id, description=f"Author with {author_id} not found")
-    books = Book.query.filter(Book.author_id == author_id).all()
+    schema_args = get_schema_args(Book)
+    serializer = get_serializer(BookSchema, exclude=["author"], **schema_args)
+    schema = serializer.schema
 
-    items = BookSchema(many=True, exclude=["author"]).dump(books)
+    query = Book.query.options(*get_load_options(Book, schema))
+    query = query.filter(Book.author_id == author_id)
+    query = apply_order(Book, query)
+    query = apply_filter(Book, query)
+    items, pagination = get_pagination(query, "books.get_all_author_books")
+
+    items = serializer.dump(items)
 
-    return jsonify({"data": items, "number_of_records": len(items)})
+    return jsonify(
+        {"data": items, "number_of_records": len(items), "pagination": pagination}
+    )
 
 
 @books_bp.route("/authors/<int:author_id>/books", methods=["POST"])
@@ -143,10 +194,82 @@ def create_book(user_id: int, args: dict, author_id: str):
 
     book = Book(author_id=author_id, **args)
     db.session.add(book)
+    db.session.flush()
+    update_search_index(Book, [book.id])
+    bump_table_versions(Book)
+    bump_suggest_versions(Book)
     db.session.commit()
+    update_suggestions(book)
 
     return jsonify(
         {
             "data": book_schema.dump(book),
         }
     )
+
+
+@books_bp.route("/authors/<int:author_id>/books/bulk", methods=["POST"])
+@token_required
+@validate_json_content_type
+def create_books(user_id: int, author_id: int):
+    """Create list of books of the author in one transaction, invalid items and
+    books with existing ISBN are skipped and returned in errors"""
+    Author.query.get_or_404(author_id, description=f"Author with {author_id} not found")
+    schema = BookSchema(many=True, exclude=["author_id", "author"])
+    items, errors = load_bulk_items(schema)
+    items = [(index, dict(item, author_id=author_id)) for index, item in items]
+    items = get_bulk_rows(Book, items, errors)
+
+    # ISBNs and covers already saved are found with one query each, repeated ones
+    # are added to them. Books without cover get the same default one, so only
+    # the first of them can be saved
+    isbns = {row["isbn"] for _, row in items}
+    existing = {
+        isbn for (isbn,) in db.session.query(Book.isbn).filter(Book.isbn.in_(isbns))
+    }
+    covers = {row["cover_name"] for _, row in items}
+    used_covers = {
+        cover_name
+        for (cover_name,) in db.session.query(Book.cover_name).filter(
+            Book.cover_name.in_(covers)
+        )
+    }
+    rows = []
+    for index, row in items:
+        item_errors = {}
+        if row["isbn"] in existing:
+            item_errors["isbn"] = [f'Book with ISBN { row["isbn"] } already exists']
+        if row["cover_name"] in used_covers:
+            item_errors["cover_name"] = [f'Cover { row["cover_name"] } is already used']
+        if item_errors:
+            errors[index] = item_errors
+            continue
+        existing.add(row["isbn"])
+        used_covers.add(row["cover_name"])
+        rows.append(row)
+
+    try:
+        ids = insert_many(Book, rows)
+        if rows:
+            update_search_index(Book, ids)
+            bump_table_versions(Book)
+            bump_suggest_versions(Book)
+        db.session.commit()
+    except IntegrityError:
+        # books with the same ISBN or cover were saved by another request
+        db.session.rollback()
+        abort(409, description="Books could not be saved, nothing has been changed")
+    for row, book_id in zip(rows, ids):
+        row["id"] = book_id
+    add_suggestions(Book, rows)
+
+    return (
+        jsonify(
+            {
+                "data": schema.dump(rows),
+                "number_of_records": len(rows),
+                "errors": get_bulk_errors(errors),
+            }
+        ),
+        201,
+    )
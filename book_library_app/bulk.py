@@ -0,0 +1,86 @@
+from flask import request, current_app, abort
+from flask_sqlalchemy import DefaultMeta
+from marshmallow import Schema, ValidationError
+from book_library_app import db
+
+
+def load_bulk_items(schema: Schema) -> tuple[list[tuple], dict]:
+    """Validate list of items from request body with schema(many=True), returns
+    valid items with their positions in the list and errors of invalid ones"""
+    data = request.get_json()
+    if not isinstance(data, list):
+        abort(400, description="Request body must be a list of items")
+    limit = current_app.config["BULK_MAX_ITEMS"]
+    if len(data) > limit:
+        abort(400, description=f"Too many items, limit is {limit}")
+
+    try:
+        items, errors = schema.load(data), {}
+    except ValidationError as error:
+        # with many=True valid_data has an entry for every item of the list
+        items, errors = error.valid_data, error.messages
+    return [
+        (index, item) for index, item in enumerate(items) if index not in errors
+    ], errors
+
+
+def get_bulk_rows(model: DefaultMeta, items: list[tuple], errors: dict) -> list:
+    """Rows with values of all columns so they are inserted by one executemany,
+    missing values get column defaults and items without values of required
+    columns are added to errors"""
+    columns = [column for column in model.__table__.columns if not column.primary_key]
+    rows = []
+    for index, item in items:
+        row = {}
+        for column in columns:
+            if column.key in item:
+                row[column.key] = item[column.key]
+            elif column.default is not None and column.default.is_scalar:
+                row[column.key] = column.default.arg
+            elif column.nullable:
+                row[column.key] = None
+            else:
+                errors.setdefault(index, {})[column.key] = [
+                    "Missing data for required field."
+                ]
+        if index not in errors:
+            rows.append((index, row))
+    return rows
+
+
+def insert_many(model: DefaultMeta, rows: list[dict]) -> list[int]:
+    """Insert rows with one executemany in the current transaction and return
+    their primary keys in the same order"""
+    if not rows:
+        return []
+    table = model.__table__
+    key = table.primary_key.columns.values()[0]
+
+    if db.engine.dialect.name == "postgresql":
+        # ids are taken from the sequence first because executemany does not
+        # return them
+        sequence = db.func.pg_get_serial_sequence(table.name, key.name)
+        ids = (
+            db.session.execute(
+                db.select(db.func.nextval(sequence)).select_from(
+                    db.func.generate_series(1, len(rows))
+                )
+            )
+            .scalars()
+            .all()
+        )
+        rows = [dict(row, **{key.key: record_id}) for row, record_id in zip(rows, ids)]
+        db.session.execute(table.insert(), rows)
+        return ids
+
+    db.session.execute(table.insert(), rows)
+    # sqlite has one writer at a time and gives every next row the next rowid
+    last_id = db.session.query(db.func.max(key)).scalar()
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+
+def get_bulk_errors(errors: dict) -> list[dict]:
+    return [
+        {"index": index, "errors": messages}
+        for index, messages in sorted(errors.items())
+    ]
@@ -1,10 +1,15 @@
 from book_library_app import db
 from book_library_app.models import Author, Book, User, Votes
 import json
+import click
 from pathlib import Path
 from datetime import datetime
+from flask import current_app
 from book_library_app.commands import db_manage_bp
-from book_library_app.utils import calculate_stats
+from book_library_app.utils import recompute_stats, bump_table_versions
+from book_library_app.suggestions import bump_suggest_versions
+from book_library_app.search import update_search_index
+from book_library_app.importer import IMPORT_MODELS, import_file, remove_checkpoint
 
 
 def load_json_data(file_name: str) -> list:
@@ -54,9 +59,13 @@ def add_data():
             vote = Votes(**item)
             db.session.add(vote)
 
+        db.session.flush()
+        update_search_index(Author)
+        bump_table_versions(Author, Book, Votes)
+        bump_suggest_versions(Author, Book)
         db.session.commit()
 
-        calculate_stats([id for id in range(1, len(Book.query.all()))])
+        recompute_stats()
         print("Data has been sucessfully added to database")
     except Exception as exc:
         print(f"Unexcepted error: {exc}")
@@ -68,7 +77,103 @@ def remove_data():
     try:
         # SQL comant to deleta date from db
         db.session.execute("TRUNCATE TABLE authors RESTART IDENTITY CASCADE;")
+        update_search_index(Author)
+        bump_table_versions(Author, Book, Votes)
+        bump_suggest_versions(Author, Book)
         db.session.commit()
         print("Data has been sucessfully removed from database")
     except Exception as exc:
         print(f"Unexcepted error: {exc}")
+
+
+@db_manage.command("reindex-search")
+def reindex_search_command():
+    """Rebuild full text search index of books and authors"""
+    try:
+        update_search_index(Author)
+        db.session.commit()
+        print("Search index has been rebuilt")
+    except Exception as exc:
+        print(f"Unexcepted error: {exc}")
+
+
+@db_manage.command("import-data")
+@click.argument("kind", type=click.Choice(list(IMPORT_MODELS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["jsonl", "csv"]),
+    help="Format of the file, taken from its extension by default",
+)
+@click.option("--batch-size", default=5000, show_default=True, help="Rows per batch")
+@click.option(
+    "--workers", type=int, help="Processes hashing passwords, number of CPUs by default"
+)
+@click.option("--restart", is_flag=True, help="Ignore checkpoint and start again")
+def import_data_command(
+    kind: str,
+    path: Path,
+    file_format: str,
+    batch_size: int,
+    workers: int,
+    restart: bool,
+):
+    """Import authors, books, users or votes from JSONL or CSV file"""
+    file_format = file_format or ("csv" if path.suffix == ".csv" else "jsonl")
+    try:
+        if restart:
+            remove_checkpoint(kind, path)
+            db.session.commit()
+        rows = import_file(kind, path, file_format, batch_size, workers)
+        print(f"{rows} {kind} have been imported")
+    except Exception as exc:
+        db.session.rollback()
+        print(f"Unexcepted error: {exc}")
+
+
+@db_manage.command("send-emails")
+def send_emails_command():
+    """Send queued emails which are due, e.g. from cron instead of worker threads"""
+    try:
+        mail_queue = current_app.extensions["mail_queue"]
+        processed = 0
+        while emails := mail_queue.process_due():
+            processed += emails
+        mail_queue.pool.close_all()
+        print(f"{processed} queued emails have been processed")
+    except Exception as exc:
+        print(f"Unexcepted error: {exc}")
+
+
+def print_stats_diff(name: str, rows: list[dict]) -> None:
+    for row in rows:
+        row_id = row.pop("id")
+        changes = ", ".join(
+            f"{column} {old} -> {new}" for column, (old, new) in row.items()
+        )
+        print(f"{name} {row_id}: {changes}")
+
+
+@db_manage.command("recompute-stats")
+@click.option("--start-id", type=int, help="First book id to recalculate")
+@click.option("--end-id", type=int, help="Last book id to recalculate")
+@click.option("--dry-run", is_flag=True, help="Show differences without saving them")
+def recompute_stats_command(start_id: int, end_id: int, dry_run: bool):
+    """Recalculate book and author scores from votes"""
+    try:
+        result = recompute_stats(start_id, end_id, dry_run=dry_run)
+        if dry_run:
+            print_stats_diff("Book", result["books"])
+            print_stats_diff("Author", result["authors"])
+            print(
+                f"{len(result['books'])} books and {len(result['authors'])} authors "
+                "have outdated stats"
+            )
+        else:
+            print(
+                f"Stats have been recalculated for {result['books']} books "
+                f"and {result['authors']} authors"
+            )
+    except Exception as exc:
+        print(f"Unexcepted error: {exc}")
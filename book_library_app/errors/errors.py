@@ -9,6 +9,7 @@ err_code = {
     "Conflict": 409,
     "UnsupportedMediaType": 415,
     "InternalServerError": 500,
+    "ServiceUnavailable": 503,
 }
 
 
@@ -28,6 +29,9 @@ class ErrorResponse:
 
 @errors_bp.app_errorhandler(err_code["BadRequest"])
 def bad_request_error(err):
+    # validation errors from webargs have messages, other bad requests only description
+    if not hasattr(err, "data"):
+        return ErrorResponse(err.description, err_code["BadRequest"]).to_response()
     messages = err.data.get("messages", {}).get("json", {})
     return ErrorResponse(messages, err_code["BadRequest"]).to_response()
 
@@ -62,3 +66,14 @@ def internal_server_error(err):
     # in case of error 500 internal server error we reset connection with database
     db.session.rollback()
     return ErrorResponse(err.description, err_code["InternalServerError"]).to_response()
+
+
+@errors_bp.app_errorhandler(err_code["ServiceUnavailable"])
+def service_unavailable_error(err):
+    response = ErrorResponse(
+        err.description, err_code["ServiceUnavailable"]
+    ).to_response()
+    # client can retry after given number of seconds
+    if getattr(err, "retry_after", None) is not None:
+        response.headers["Retry-After"] = str(err.retry_after)
+    return response
@@ -0,0 +1,6 @@
+from flask import Blueprint
+
+export_bp = Blueprint("export", __name__)
+
+
+from book_library_app.export import export
@@ -0,0 +1,123 @@
+import io
+import csv
+import zlib
+from flask import Response, abort, request, current_app, stream_with_context
+from book_library_app import db
+from book_library_app.export import export_bp
+from book_library_app.models import (
+    Author,
+    AuthorSchema,
+    Book,
+    BookSchema,
+    Votes,
+    VotesSchema,
+)
+from book_library_app.search import apply_search
+from book_library_app.serializers import get_serializer
+from book_library_app.utils import (
+    get_schema_args,
+    get_dumped_columns,
+    apply_order,
+    apply_filter,
+)
+
+# model, its schema and relationships which are not exported
+EXPORTS = {
+    "books": (Book, BookSchema, ["author"]),
+    "authors": (Author, AuthorSchema, ["books"]),
+    "votes": (Votes, VotesSchema, []),
+}
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def get_json_encoder():
+    """Encoder of the app with options of jsonify without indent, one record
+    is written in one line"""
+    return current_app.json_encoder(
+        separators=(",", ":"),
+        ensure_ascii=current_app.config["JSON_AS_ASCII"],
+        sort_keys=current_app.config["JSON_SORT_KEYS"],
+    ).encode
+
+
+def generate_ndjson(serializer, rows):
+    encode = get_json_encoder()
+    for row in rows:
+        yield encode(serializer.dump_one(row)) + "\n"
+
+
+def generate_csv(serializer, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # columns in order of schema declaration, order of dump_fields is random
+    schema = serializer.schema
+    names = [name for name in schema.declared_fields if name in schema.dump_fields]
+    writer.writerow(names)
+    for row in rows:
+        data = serializer.dump_one(row)
+        writer.writerow([data[name] for name in names])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def join_chunks(lines, size: int):
+    """Lines are sent in chunks of size records instead of one write per record"""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield "".join(chunk).encode()
+            chunk = []
+    if chunk:
+        yield "".join(chunk).encode()
+
+
+def compress(chunks, level: int):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@export_bp.route("/export/<kind>", methods=["GET"])
+def export_records(kind: str):
+    """Stream all records matching filters as NDJSON or CSV. Rows are read from
+    database cursor in batches, so memory use does not depend on number of rows
+    and there is no COUNT or OFFSET like in paginated endpoints"""
+    if kind not in EXPORTS:
+        abort(404, description=f"kind must be one of: {', '.join(EXPORTS)}")
+    file_format = request.args.get("format", "ndjson")
+    if file_format not in FORMATS:
+        abort(400, description=f"format must be one of: {', '.join(FORMATS)}")
+
+    model, schema_class, relationships = EXPORTS[kind]
+    schema_args = get_schema_args(model)
+    serializer = get_serializer(schema_class, exclude=relationships, **schema_args)
+    batch_size = current_app.config["EXPORT_BATCH_SIZE"]
+
+    # only serialized columns are selected, rows are not turned into ORM objects
+    query = db.session.query(*get_dumped_columns(model, serializer.schema))
+    if model is not Votes:
+        query = apply_search(model, query)
+    query = apply_filter(model, query)
+    query = apply_order(model, query)
+    rows = query.execution_options(stream_results=True).yield_per(batch_size)
+
+    generate = generate_csv if file_format == "csv" else generate_ndjson
+    chunks = join_chunks(generate(serializer, rows), batch_size)
+    headers = {
+        "Content-Disposition": f"attachment; filename={kind}.{file_format}",
+        "Vary": "Accept-Encoding",
+    }
+    if request.accept_encodings["gzip"]:
+        chunks = compress(chunks, current_app.config["EXPORT_GZIP_LEVEL"])
+        headers["Content-Encoding"] = "gzip"
+
+    return Response(
+        stream_with_context(chunks), mimetype=FORMATS[file_format], headers=headers
+    )
@@ -0,0 +1,238 @@
+import io
+import os
+import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+from typing import Iterator
+import click
+from flask import current_app
+from flask_sqlalchemy import DefaultMeta
+from book_library_app import db
+from book_library_app.models import Author, Book, User, Votes, ImportCheckpoint
+from book_library_app.search import update_search_index
+from book_library_app.passwords import get_hash_function
+from book_library_app.suggestions import bump_suggest_versions
+from book_library_app.utils import recompute_stats, bump_table_versions
+
+IMPORT_MODELS = {"authors": Author, "books": Book, "users": User, "votes": Votes}
+
+
+def read_rows(path: Path, file_format: str) -> Iterator[dict]:
+    """Rows of JSONL or CSV file read one by one, so only a batch of them is kept
+    in memory"""
+    with open(path, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def convert_value(column: db.Column, value):
+    """Value from file in type of the column, dates are in ISO or dd-mm-yyyy
+    format like in sample data. Empty CSV values of not text columns are NULL"""
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if isinstance(value, python_type):
+        return value
+    if value == "" and python_type is not str:
+        return None
+    if python_type is date:
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            return datetime.strptime(value, "%d-%m-%Y").date()
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return python_type(value)
+
+
+def get_default(column: db.Column):
+    if column.default is None:
+        return None
+    if column.default.is_callable:
+        return column.default.arg(None)
+    return column.default.arg
+
+
+def prepare_batch(model: DefaultMeta, batch: list[dict], start: int) -> tuple:
+    """Columns and rows of a batch with values converted to column types, columns
+    missing in a row get their defaults"""
+    table = model.__table__
+    keys = set().union(*batch)
+    unknown = keys - set(table.columns.keys())
+    if unknown:
+        raise click.ClickException(f"Unknown columns: {', '.join(sorted(unknown))}")
+
+    columns = [
+        column
+        for column in table.columns
+        if column.key in keys or column.default is not None
+    ]
+    rows = []
+    for number, item in enumerate(batch, start + 1):
+        row = {}
+        for column in columns:
+            try:
+                if column.key in item:
+                    row[column.key] = convert_value(column, item[column.key])
+                else:
+                    row[column.key] = get_default(column)
+            except (TypeError, ValueError) as exc:
+                raise click.ClickException(f"Row {number}, {column.key}: {exc}")
+        rows.append(row)
+    return columns, rows
+
+
+def check_unique_values(
+    model: DefaultMeta, batch: list[dict], rows: list[dict], start: int
+) -> None:
+    """Report the first row with a value of a unique column which is already used
+    by a saved row or an earlier row of the batch, rows without the column get
+    the same default (e.g. cover name of books) and are reported too"""
+    for column in model.__table__.columns:
+        if not column.unique:
+            continue
+        values = [row[column.key] for row in rows if row.get(column.key) is not None]
+        used = set()
+        # values are checked in chunks which fit into bound parameters of sqlite
+        for index in range(0, len(values), 500):
+            chunk = values[index : index + 500]
+            used.update(
+                value for (value,) in db.session.query(column).filter(column.in_(chunk))
+            )
+        for number, (item, row) in enumerate(zip(batch, rows), start + 1):
+            value = row.get(column.key)
+            if value is None:
+                continue
+            if value in used:
+                default = "" if column.key in item else " (default)"
+                raise click.ClickException(
+                    f"Row {number}, {column.key}: {value}{default} is already used"
+                )
+            used.add(value)
+
+
+def format_copy_value(value) -> str:
+    """Value in text format of postgres COPY"""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def write_rows(model: DefaultMeta, columns: list, rows: list[dict]) -> None:
+    """Save rows in the current transaction with COPY on postgres and with one
+    executemany on other databases"""
+    table = model.__table__
+    if db.engine.dialect.name != "postgresql":
+        db.session.execute(table.insert(), rows)
+        return
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(
+            "\t".join(format_copy_value(row[column.key]) for column in columns) + "\n"
+        )
+    buffer.seek(0)
+    names = ", ".join(column.name for column in columns)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(f"COPY {table.name} ({names}) FROM STDIN", buffer)
+
+
+def hash_passwords(executor: ProcessPoolExecutor, workers: int, rows: list) -> None:
+    passwords = [row["password"] for row in rows]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    hash_function = get_hash_function(current_app.config)
+    hashes = executor.map(hash_function, passwords, chunksize=chunksize)
+    for row, password_hash in zip(rows, hashes):
+        row["password"] = password_hash
+
+
+def get_checkpoint(kind: str, path: Path) -> ImportCheckpoint:
+    """Checkpoint of the file, a new one is added to the current transaction"""
+    source = str(path.resolve())
+    checkpoint = ImportCheckpoint.query.get((kind, source))
+    if checkpoint is None:
+        checkpoint = ImportCheckpoint(kind=kind, source=source, rows=0)
+        db.session.add(checkpoint)
+    return checkpoint
+
+
+def remove_checkpoint(kind: str, path: Path) -> None:
+    ImportCheckpoint.query.filter(
+        ImportCheckpoint.kind == kind, ImportCheckpoint.source == str(path.resolve())
+    ).delete(synchronize_session=False)
+
+
+def finish_import(kind: str, path: Path) -> None:
+    """Work done once for the whole file: sequences after rows with ids, search
+    index and stats of books. Checkpoint is removed with it"""
+    model = IMPORT_MODELS[kind]
+    if db.engine.dialect.name == "postgresql":
+        table = model.__table__
+        key = table.primary_key.columns.values()[0].name
+        db.session.execute(
+            db.text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', '{key}'), "
+                f"(SELECT coalesce(max({key}), 0) + 1 FROM {table.name}), false)"
+            )
+        )
+    if model in (Author, Book):
+        update_search_index(model)
+        bump_suggest_versions(model)
+    remove_checkpoint(kind, path)
+    db.session.commit()
+    if model is Votes:
+        recompute_stats()
+
+
+def import_file(
+    kind: str, path: Path, file_format: str, batch_size: int, workers: int
+) -> int:
+    """Import rows of file in batches, every batch is saved in its own transaction
+    together with number of saved rows in import_checkpoints, so the next run
+    continues after the last saved batch. Returns number of imported rows"""
+    model = IMPORT_MODELS[kind]
+    checkpoint = get_checkpoint(kind, path)
+    done = checkpoint.rows
+    if done:
+        click.echo(f"Resuming after {done} rows")
+    rows = islice(read_rows(path, file_format), done, None)
+    workers = workers or os.cpu_count()
+    executor = ProcessPoolExecutor(workers) if model is User else None
+
+    imported, started = 0, time.monotonic()
+    try:
+        while batch := list(islice(rows, batch_size)):
+            columns, values = prepare_batch(model, batch, done)
+            check_unique_values(model, batch, values, done)
+            if executor is not None:
+                hash_passwords(executor, workers, values)
+            write_rows(model, columns, values)
+            bump_table_versions(model)
+            done += len(batch)
+            checkpoint.rows = done
+            checkpoint.updated_at = datetime.utcnow()
+            db.session.commit()
+
+            imported += len(batch)
+            rate = imported / max(time.monotonic() - started, 1e-6)
+            click.echo(f"{done} rows imported, {rate:.0f} rows/s")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    finish_import(kind, path)
+    return imported
@@ -0,0 +1,52 @@
+from flask.json import JSONEncoder, JSONDecoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonEncoder(JSONEncoder):
+    """Flask encoder which serializes with orjson, cases orjson does not support
+    like custom indent or escaping non ascii characters are handled by stdlib
+    encoder. Dates and datetimes which are not dumped by schema are passed to
+    Flask default so they are formatted like before"""
+
+    def encode(self, o) -> str:
+        if self.indent not in (None, 2):
+            return super().encode(o)
+
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent == 2:
+            option |= orjson.OPT_INDENT_2
+        try:
+            data = orjson.dumps(o, default=self.default, option=option)
+        except orjson.JSONEncodeError:
+            # e.g. integers bigger than 64 bits, stdlib gives the same output as before
+            return super().encode(o)
+        # orjson does not escape non ascii characters
+        if self.ensure_ascii and not data.isascii():
+            return super().encode(o)
+        return data.decode()
+
+
+class OrjsonDecoder(JSONDecoder):
+    def decode(self, s, *args, **kwargs):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # stdlib accepts also NaN and Infinity
+            return super().decode(s, *args, **kwargs)
+
+
+def init_json(app) -> None:
+    """Install JSON encoder and decoder chosen in JSON_BACKEND, stdlib json is used
+    when orjson is not installed"""
+    if app.config["JSON_BACKEND"] == "orjson" and orjson is not None:
+        app.json_encoder = OrjsonEncoder
+        app.json_decoder = OrjsonDecoder
+    else:
+        app.json_encoder = JSONEncoder
+        app.json_decoder = JSONDecoder
@@ -0,0 +1,255 @@
+import os
+import ssl
+import time
+import random
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from flask import current_app
+from book_library_app import db
+from book_library_app.models import OutgoingEmail
+
+RESET_PASSWORD_SUBJECT = "Reset password request"
+
+
+def build_message(sender: str, receiver: str, subject: str, text: str) -> str:
+    # Create a multipart message and set headers
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = sender
+    message["To"] = receiver
+
+    # Create the plain-text and HTML version of your message
+    html = f"""\
+    <html><body>
+        <p>Hi, Book Library API HERE<br>{text}<br></p>
+    </body></html>
+    """
+
+    # Add HTML/plain-text parts to MIMEMultipart message
+    message.attach(MIMEText(text, "plain"))
+    message.attach(MIMEText(html, "html"))
+    return message.as_string()
+
+
+def is_connection_error(exc: OSError) -> bool:
+    """Errors after which SMTP connection can not be used anymore, other SMTP
+    errors are responses of server to a single message"""
+    return isinstance(exc, smtplib.SMTPServerDisconnected) or not isinstance(
+        exc, smtplib.SMTPException
+    )
+
+
+class SMTPConnectionPool:
+    """Authenticated SMTP connections kept open between emails, so TLS handshake
+    and login are done once per connection instead of once per email. Connections
+    idle for longer than MAIL_CONNECTION_MAX_IDLE are closed, servers drop them"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def connect(self) -> smtplib.SMTP:
+        config = self.config
+        server, port = config["MAIL_SERVER"], config["MAIL_PORT"]
+        timeout = config["MAIL_TIMEOUT"]
+        if config["MAIL_USE_SSL"]:
+            connection = smtplib.SMTP_SSL(
+                server, port, timeout=timeout, context=ssl.create_default_context()
+            )
+        else:
+            connection = smtplib.SMTP(server, port, timeout=timeout)
+            if config["MAIL_USE_TLS"]:
+                connection.starttls(context=ssl.create_default_context())
+        if config["MAIL_USERNAME"]:
+            connection.login(config["MAIL_USERNAME"], config["MAIL_PASSWORD"])
+        return connection
+
+    def get(self) -> smtplib.SMTP:
+        expired, connection = [], None
+        with self.lock:
+            while self.idle and connection is None:
+                connection, used = self.idle.pop()
+                if time.monotonic() - used > self.config["MAIL_CONNECTION_MAX_IDLE"]:
+                    expired.append(connection)
+                    connection = None
+        for expired_connection in expired:
+            self.close(expired_connection)
+        return connection or self.connect()
+
+    def put(self, connection: smtplib.SMTP) -> None:
+        with self.lock:
+            if len(self.idle) < self.config["MAIL_POOL_SIZE"]:
+                self.idle.append((connection, time.monotonic()))
+                return
+        self.close(connection)
+
+    @staticmethod
+    def close(connection: smtplib.SMTP) -> None:
+        try:
+            connection.quit()
+        except OSError:
+            connection.close()
+
+    def close_all(self) -> None:
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection, _ in idle:
+            self.close(connection)
+
+
+class MailQueue:
+    """Emails saved in outgoing_emails table in the same transaction as the request
+    which sends them and delivered by background worker threads. Failed emails
+    are retried with exponential backoff until MAIL_MAX_ATTEMPTS"""
+
+    def __init__(self, app):
+        self.app = app
+        self.pool = SMTPConnectionPool(app.config)
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.workers = []
+        self.pid = None
+        self.stopping = False
+
+    def start(self) -> None:
+        """Start MAIL_QUEUE_WORKERS threads in this process, it is done on the first
+        request so they are not started before gunicorn forks workers and emails
+        queued before restart are sent without waiting for a new one"""
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.pool = SMTPConnectionPool(self.app.config)
+            self.stopping = False
+            self.workers = [
+                threading.Thread(target=self.run, daemon=True)
+                for _ in range(self.app.config["MAIL_QUEUE_WORKERS"])
+            ]
+            for worker in self.workers:
+                worker.start()
+
+    def stop(self) -> None:
+        self.stopping = True
+        self.wakeup.set()
+        for worker in self.workers:
+            worker.join()
+        self.pid = None
+        self.pool.close_all()
+
+    def notify(self) -> None:
+        self.start()
+        self.wakeup.set()
+
+    def run(self) -> None:
+        with self.app.app_context():
+            while not self.stopping:
+                try:
+                    sent = self.process_due()
+                except Exception:
+                    self.app.logger.exception("Sending queued emails failed")
+                    db.session.rollback()
+                    sent = 0
+                if not sent:
+                    self.wakeup.wait(self.app.config["MAIL_POLL_INTERVAL"])
+                    self.wakeup.clear()
+
+    def claim(self) -> list[OutgoingEmail]:
+        """Take due emails, time of their next attempt is moved by MAIL_LEASE so other
+        workers skip them and they are taken again only if this worker dies. The
+        conditional UPDATE lets only one worker take an email"""
+        now = datetime.utcnow()
+        due = OutgoingEmail.status == "pending", OutgoingEmail.next_attempt_at <= now
+        ids = [
+            email_id
+            for (email_id,) in db.session.query(OutgoingEmail.id)
+            .filter(*due)
+            .order_by(OutgoingEmail.next_attempt_at)
+            .limit(current_app.config["MAIL_BATCH_SIZE"])
+        ]
+        lease = now + timedelta(seconds=current_app.config["MAIL_LEASE"])
+        claimed = [
+            email_id
+            for email_id in ids
+            if OutgoingEmail.query.filter(OutgoingEmail.id == email_id, *due).update(
+                {OutgoingEmail.next_attempt_at: lease}, synchronize_session=False
+            )
+        ]
+        db.session.commit()
+        return OutgoingEmail.query.filter(OutgoingEmail.id.in_(claimed)).all()
+
+    def send(self, email: OutgoingEmail) -> None:
+        sender = current_app.config["MAIL_SENDER"]
+        message = build_message(sender, email.recipient, email.subject, email.text)
+        # pooled connection could be closed by server, then a new one is tried
+        for retry in (True, False):
+            connection = self.pool.get()
+            try:
+                connection.sendmail(sender, email.recipient, message)
+            except OSError as exc:
+                if not is_connection_error(exc):
+                    self.pool.put(connection)
+                    raise
+                self.pool.close(connection)
+                if not retry:
+                    raise
+            except Exception:
+                # state of connection after other errors is unknown
+                self.pool.close(connection)
+                raise
+            else:
+                self.pool.put(connection)
+                return
+
+    def retry_later(self, email: OutgoingEmail, exc: Exception) -> None:
+        config = current_app.config
+        email.attempts += 1
+        email.last_error = str(exc)
+        if email.attempts >= config["MAIL_MAX_ATTEMPTS"]:
+            email.status = "failed"
+            current_app.logger.error(f"Email {email.id} failed: {exc}")
+            return
+        delay = min(
+            config["MAIL_RETRY_DELAY"] * 2 ** (email.attempts - 1),
+            config["MAIL_RETRY_MAX_DELAY"],
+        )
+        # jitter spreads retries of emails which failed at the same time
+        delay *= random.uniform(0.8, 1.2)
+        email.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+    def process_due(self) -> int:
+        """Send emails which are due, returns number of processed emails. Every
+        error of an email counts as its attempt, so MAIL_MAX_ATTEMPTS applies also
+        to emails which can not be built or encoded"""
+        emails = self.claim()
+        for email in emails:
+            try:
+                self.send(email)
+            except Exception as exc:
+                self.retry_later(email, exc)
+            else:
+                email.status = "sent"
+                email.sent_at = datetime.utcnow()
+            db.session.commit()
+        return len(emails)
+
+
+def init_mail_queue(app) -> None:
+    mail_queue = MailQueue(app)
+    app.extensions["mail_queue"] = mail_queue
+    app.before_request(mail_queue.start)
+
+
+def queue_email(receiver_email: str, text: str, subject=RESET_PASSWORD_SUBJECT) -> None:
+    """Add email to queue in the current transaction, call notify_mail_queue after
+    commit so workers send it without waiting for the next poll"""
+    db.session.add(OutgoingEmail(recipient=receiver_email, subject=subject, text=text))
+
+
+def notify_mail_queue() -> None:
+    current_app.extensions["mail_queue"].notify()
@@ -1,3 +1,5 @@
+import time
+import secrets
 from datetime import date, datetime, timedelta
 from sqlalchemy import ForeignKey
 import jwt
@@ -12,7 +14,7 @@ class Author(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
-    birth_date = db.Column(db.Date, nullable=False)
+    birth_date = db.Column(db.Date, nullable=False, index=True)
     books = db.relationship(
         "Book", back_populates="author", cascade="all, delete-orphan"
     )
@@ -52,11 +54,13 @@ class AuthorSchema(Schema):
 class Book(db.Model):
     __tablename__ = "books"
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(50), nullable=False)
+    title = db.Column(db.String(50), nullable=False, index=True)
     isbn = db.Column(db.BigInteger, nullable=False, unique=True)
     number_of_pages = db.Column(db.Integer, nullable=False)
     description = db.Column(db.Text, nullable=False)
-    author_id = db.Column(db.Integer, db.ForeignKey("authors.id"), nullable=False)
+    author_id = db.Column(
+        db.Integer, db.ForeignKey("authors.id"), nullable=False, index=True
+    )
     author = db.relationship("Author", back_populates="books")
     book_category = db.Column(db.Text, nullable=False)
     cover_name = db.Column(
@@ -65,7 +69,7 @@ class Book(db.Model):
 
     number_of_votes = db.Column(db.Integer, nullable=True, default=0)
     score_sum = db.Column(db.Integer, nullable=True, default=0)
-    average_book_score = db.Column(db.Float, nullable=True, default=0)
+    average_book_score = db.Column(db.Float, nullable=True, default=0, index=True)
 
     comment = db.relationship("Votes")
 
@@ -101,10 +105,14 @@ class BookSchema(Schema):
 
 class Votes(db.Model):
     __tablename__ = "votes"
+    # user can vote only once for a book, the index is used also by user_id lookups
+    __table_args__ = (
+        db.Index("ix_votes_user_id_book_id", "user_id", "book_id", unique=True),
+    )
     comment_id = db.Column(db.Integer, primary_key=True)
     points = db.Column(db.Integer)
     comment_text = db.Column(db.String(255))
-    book_id = db.Column(db.Integer, db.ForeignKey("books.id"))
+    book_id = db.Column(db.Integer, db.ForeignKey("books.id"), index=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
 
     @staticmethod
@@ -149,6 +157,10 @@ class User(db.Model):
             "user_id": self.id,
             "exp": datetime.utcnow()
             + timedelta(minutes=current_app.config.get("JWT_EXPIRED_MINUTES", 30)),
+            # jti identifies token on logout, precise iat tells which tokens were
+            # issued before revocation of all tokens of the user
+            "jti": secrets.token_hex(8),
+            "iat": time.time(),
         }
 
         return jwt.encode(payload, current_app.config.get("SECRET_KEY"))
@@ -158,7 +170,7 @@ class HashResetTable(db.Model):
     __tablename__ = "hash_reset"
     id = db.Column(db.Integer, primary_key=True)
     creation_date = db.Column(db.DateTime, default=datetime.utcnow)
-    hash_code = db.Column(db.String(255))
+    hash_code = db.Column(db.String(255), index=True)
     user_id = db.Column(db.Integer, ForeignKey("users.id"))
 
     def generate_jwt(self):
@@ -195,6 +207,87 @@ class UserPasswordUpdateSchema(Schema):
     )
 
 
+class TableVersion(db.Model):
+    """Version of data in a table, it is increased by every write to the table and
+    used to validate cached responses with ETag and Last-Modified"""
+
+    __tablename__ = "table_versions"
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ImportCheckpoint(db.Model):
+    """Number of rows of a file saved by import-data, it is updated in the same
+    transaction as every batch so a resumed import never repeats a saved batch"""
+
+    __tablename__ = "import_checkpoints"
+    kind = db.Column(db.String(20), primary_key=True)
+    source = db.Column(db.String(255), primary_key=True)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class RefreshToken(db.Model):
+    """Long lived token exchanged for access tokens in /auth/refresh, only its
+    sha256 is stored. Every use replaces it with a new token of the same family"""
+
+    __tablename__ = "refresh_tokens"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, ForeignKey("users.id"), nullable=False, index=True)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True)
+    # tokens created by rotation of the same login
+    family = db.Column(db.String(32), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    revoked_at = db.Column(db.DateTime, index=True)
+
+
+class RefreshTokenSchema(Schema):
+    refresh_token = fields.String(required=True, load_only=True)
+
+
+class RevokedToken(db.Model):
+    """Access token revoked before its exp (kind "token", key is its jti) or all
+    tokens of a user issued until issued_before (kind "user", key is user id),
+    see book_library_app.revocations"""
+
+    __tablename__ = "revoked_tokens"
+    __table_args__ = (db.Index("ix_revoked_tokens_kind_key", "kind", "key"),)
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    revoked_at = db.Column(
+        db.DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
+    issued_before = db.Column(db.DateTime)
+    # revocation is not needed after all revoked tokens expire
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class OutgoingEmail(db.Model):
+    """Email waiting in queue for background workers, see book_library_app.mail_queue"""
+
+    __tablename__ = "outgoing_emails"
+    # due emails are found by status and time of the next attempt
+    __table_args__ = (
+        db.Index(
+            "ix_outgoing_emails_status_next_attempt_at", "status", "next_attempt_at"
+        ),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    # pending, sent or failed when all attempts were used
+    status = db.Column(db.String(10), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+
 author_schema = AuthorSchema()
 book_schema = BookSchema()
 user_schema = UserSchema()
@@ -0,0 +1,98 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from flask import current_app, abort
+from werkzeug.security import generate_password_hash, check_password_hash
+from book_library_app.models import User
+
+
+def get_hash_method(config) -> str:
+    """Werkzeug method of hashes made with PASSWORD_HASH_ALGORITHM and cost"""
+    return (
+        f"pbkdf2:{config['PASSWORD_HASH_ALGORITHM']}:"
+        f"{config['PASSWORD_HASH_ITERATIONS']}"
+    )
+
+
+def get_hash_function(config) -> partial:
+    """Hashing function with configured method, it can be sent to other processes"""
+    return partial(
+        generate_password_hash,
+        method=get_hash_method(config),
+        salt_length=config["PASSWORD_SALT_LENGTH"],
+    )
+
+
+def needs_rehash(password_hash: str, config) -> bool:
+    return password_hash.split("$", 1)[0] != get_hash_method(config)
+
+
+class PasswordHasher:
+    """Process pool which computes password hashes, so slow hashing does not block
+    request threads and runs on all cores instead of one behind GIL. Number of
+    hashes running and waiting is bounded, requests over the limit get 503"""
+
+    def __init__(self, config):
+        self.config = config
+        self.executor = None
+        self.slots = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        # pool is created on first use in every process, so every forked gunicorn
+        # worker has its own
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            workers = self.config["PASSWORD_HASH_WORKERS"] or os.cpu_count()
+            self.executor = ProcessPoolExecutor(workers)
+            self.slots = threading.BoundedSemaphore(
+                workers + self.config["PASSWORD_HASH_QUEUE_SIZE"]
+            )
+            self.pid = os.getpid()
+
+    def shutdown(self) -> None:
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+            self.executor, self.pid = None, None
+
+    def run(self, func, *args):
+        # 0 workers means hashing in the request thread
+        if self.config["PASSWORD_HASH_WORKERS"] == 0:
+            return func(*args)
+
+        self.start()
+        if not self.slots.acquire(timeout=self.config["PASSWORD_HASH_QUEUE_TIMEOUT"]):
+            abort(
+                503,
+                description="Too many login requests, try again later",
+                retry_after=self.config["PASSWORD_HASH_RETRY_AFTER"],
+            )
+        try:
+            return self.executor.submit(func, *args).result()
+        finally:
+            self.slots.release()
+
+
+def init_password_hasher(app) -> None:
+    app.extensions["password_hasher"] = PasswordHasher(app.config)
+
+
+def get_password_hasher() -> PasswordHasher:
+    return current_app.extensions["password_hasher"]
+
+
+def hash_password(password: str) -> str:
+    return get_password_hasher().run(get_hash_function(current_app.config), password)
+
+
+def check_password(user: User, password: str) -> bool:
+    """Check password of user, hash made with other algorithm or cost than
+    configured one is replaced after successful check. Caller commits it"""
+    valid = get_password_hasher().run(check_password_hash, user.password, password)
+    if valid and needs_rehash(user.password, current_app.config):
+        user.password = hash_password(password)
+    return valid
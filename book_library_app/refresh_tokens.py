@@ -0,0 +1,134 @@
+import time
+import secrets
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from flask import current_app, abort
+from book_library_app import db
+from book_library_app.models import RefreshToken
+
+
+def get_token_hash(token: str) -> str:
+    # tokens are random so a fast hash without salt is enough
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class RevokedRefreshTokens:
+    """Hashes of revoked refresh tokens which have not expired yet, kept in memory
+    of every process. Revocations made by this process are added at once, the
+    ones of other processes are loaded every REFRESH_TOKEN_SYNC_INTERVAL seconds.
+    Tokens which are not here are still checked by conditional UPDATE in database"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.synced_at = None
+        self.checked = 0
+        self.lock = threading.Lock()
+
+    def add(self, token_hash: str, expires_at: datetime) -> None:
+        with self.lock:
+            self.hashes[token_hash] = expires_at
+
+    def sync(self) -> None:
+        now = time.monotonic()
+        if now - self.checked < current_app.config["REFRESH_TOKEN_SYNC_INTERVAL"]:
+            return
+        self.checked = now
+
+        synced_at = datetime.utcnow()
+        query = db.session.query(RefreshToken.token_hash, RefreshToken.expires_at)
+        query = query.filter(
+            RefreshToken.revoked_at.isnot(None), RefreshToken.expires_at > synced_at
+        )
+        if self.synced_at is not None:
+            query = query.filter(RefreshToken.revoked_at >= self.synced_at)
+        rows = query.all()
+
+        with self.lock:
+            self.hashes.update(rows)
+            # expired tokens are rejected anyway
+            self.hashes = {
+                token_hash: expires_at
+                for token_hash, expires_at in self.hashes.items()
+                if expires_at > synced_at
+            }
+            self.synced_at = synced_at
+
+    def __contains__(self, token_hash: str) -> bool:
+        return token_hash in self.hashes
+
+
+def init_refresh_tokens(app) -> None:
+    app.extensions["revoked_refresh_tokens"] = RevokedRefreshTokens()
+
+
+def get_revoked_refresh_tokens() -> RevokedRefreshTokens:
+    return current_app.extensions["revoked_refresh_tokens"]
+
+
+def issue_refresh_token(user_id: int, family: str = None) -> str:
+    """New refresh token saved in the current transaction, tokens of a new login
+    start a new family"""
+    token = secrets.token_urlsafe(32)
+    expires_at = datetime.utcnow() + timedelta(
+        days=current_app.config["REFRESH_TOKEN_EXPIRED_DAYS"]
+    )
+    db.session.add(
+        RefreshToken(
+            user_id=user_id,
+            token_hash=get_token_hash(token),
+            family=family or secrets.token_hex(16),
+            expires_at=expires_at,
+        )
+    )
+    return token
+
+
+def revoke_refresh_tokens(*conditions) -> None:
+    """Revoke not revoked tokens matching conditions in the current transaction"""
+    revoked = get_revoked_refresh_tokens()
+    query = RefreshToken.query.filter(RefreshToken.revoked_at.is_(None), *conditions)
+    for token_hash, expires_at in query.with_entities(
+        RefreshToken.token_hash, RefreshToken.expires_at
+    ):
+        revoked.add(token_hash, expires_at)
+    query.update(
+        {RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False
+    )
+
+
+def rotate_refresh_token(token: str) -> tuple[int, str]:
+    """Revoke refresh token and return its user with a new token of the same family.
+    Use of an already rotated token means it was stolen, then the whole family
+    is revoked so the thief and the owner have to login again"""
+    revoked = get_revoked_refresh_tokens()
+    revoked.sync()
+    token_hash = get_token_hash(token)
+    if token_hash in revoked:
+        revoke_refresh_tokens(
+            RefreshToken.family
+            == db.session.query(RefreshToken.family)
+            .filter(RefreshToken.token_hash == token_hash)
+            .scalar_subquery()
+        )
+        db.session.commit()
+        abort(401, description="Refresh token has been revoked, please login")
+
+    now = datetime.utcnow()
+    record = RefreshToken.query.filter(RefreshToken.token_hash == token_hash).first()
+    if record is None or record.expires_at <= now:
+        abort(401, description="Invalid refresh token, please login")
+
+    # only one of concurrent requests with the same token rotates it
+    rotated = RefreshToken.query.filter(
+        RefreshToken.id == record.id, RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+    if not rotated:
+        revoke_refresh_tokens(RefreshToken.family == record.family)
+        db.session.commit()
+        abort(401, description="Refresh token has been revoked, please login")
+
+    new_token = issue_refresh_token(record.user_id, record.family)
+    db.session.commit()
+    revoked.add(token_hash, record.expires_at)
+    return record.user_id, new_token
@@ -0,0 +1,133 @@
+import os
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+from book_library_app.utils import TTLCache
+
+
+class ResponseCache(ABC):
+    """Cache of response bodies with hit and miss counters. Keys are ETags which
+    contain versions of tables, so a write to a table makes keys of responses
+    based on it unreachable and old entries are evicted by LRU or ttl"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        value = self.load(key)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: Tuple[bytes, str]) -> None:
+        self.save(key, value)
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0,
+        }
+
+    @abstractmethod
+    def load(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """Cached value or None"""
+
+    @abstractmethod
+    def save(self, key: str, value: Tuple[bytes, str]) -> None:
+        """Store value, backend evicts old entries"""
+
+
+class MemoryResponseCache(ResponseCache):
+    """Cache in memory of a single process"""
+
+    def __init__(self, max_size: int, ttl: float):
+        super().__init__(max_size, ttl)
+        self.entries = TTLCache(max_size=max_size)
+
+    def load(self, key: str) -> Optional[Tuple[bytes, str]]:
+        return self.entries.get(key)
+
+    def save(self, key: str, value: Tuple[bytes, str]) -> None:
+        self.entries.set(key, value, self.ttl)
+
+
+class SQLiteResponseCache(ResponseCache):
+    """Cache in a local SQLite file shared by all workers on the machine,
+    every thread and process uses its own connection"""
+
+    def __init__(self, max_size: int, ttl: float, path: str):
+        super().__init__(max_size, ttl)
+        self.path = path
+        self.local = threading.local()
+
+    def get_connection(self) -> sqlite3.Connection:
+        if getattr(self.local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, "
+                "body BLOB, mimetype TEXT, expires REAL, used REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_responses_used ON responses (used)"
+            )
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def load(self, key: str) -> Optional[Tuple[bytes, str]]:
+        connection = self.get_connection()
+        now = time.time()
+        row = connection.execute(
+            "SELECT body, mimetype FROM responses WHERE key = ? AND expires > ?",
+            (key, now),
+        ).fetchone()
+        if row is not None:
+            connection.execute(
+                "UPDATE responses SET used = ? WHERE key = ?", (now, key)
+            )
+        return row
+
+    def save(self, key: str, value: Tuple[bytes, str]) -> None:
+        connection = self.get_connection()
+        now = time.time()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, *value, now + self.ttl, now),
+            )
+            connection.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+            # least recently used entries over the limit
+            connection.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                "ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,),
+            )
+
+
+def init_response_cache(app) -> None:
+    """Create cache of GET responses chosen in RESPONSE_CACHE: memory, sqlite
+    or None to disable it"""
+    backend = app.config["RESPONSE_CACHE"]
+    max_size = app.config["RESPONSE_CACHE_SIZE"]
+    ttl = app.config["RESPONSE_CACHE_TTL"]
+    if backend == "memory":
+        cache = MemoryResponseCache(max_size, ttl)
+    elif backend == "sqlite":
+        cache = SQLiteResponseCache(max_size, ttl, app.config["RESPONSE_CACHE_PATH"])
+    else:
+        cache = None
+    app.extensions["response_cache"] = cache
@@ -0,0 +1,180 @@
+import math
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from book_library_app import db
+from book_library_app.models import RevokedToken
+
+
+class BloomFilter:
+    """Set of strings without false negatives, with about error_rate false
+    positives while it has less than capacity items"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item: str):
+        # positions are derived from two halves of one digest (double hashing)
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(item)
+        )
+
+
+class TokenRevocations:
+    """Revoked access tokens of revoked_tokens table kept in memory of every
+    process, so tokens which are not revoked are accepted without database.
+    Ids (jti) of revoked tokens are in a Bloom filter and its hits are confirmed
+    in database. Revocations of all tokens of a user are few and kept exactly.
+    Revocations of other processes are loaded every TOKEN_REVOCATION_SYNC_INTERVAL
+    seconds, expired ones are dropped when the filter is rebuilt"""
+
+    def __init__(self):
+        self.filter = None
+        self.users = {}
+        self.synced_at = None
+        self.checked = 0
+        self.rebuilt = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def load(filter_: BloomFilter, users: dict, rows) -> None:
+        for kind, key, issued_before in rows:
+            if kind == "user":
+                user_id = int(key)
+                users[user_id] = max(users.get(user_id, issued_before), issued_before)
+            else:
+                filter_.add(key)
+
+    def add(self, kind: str, key: str, issued_before: datetime = None) -> None:
+        self.load(self.filter, self.users, [(kind, key, issued_before)])
+
+    def sync(self) -> None:
+        config = current_app.config
+        interval = config["TOKEN_REVOCATION_SYNC_INTERVAL"]
+        if time.monotonic() - self.checked < interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if now - self.checked < interval:
+                return
+            self.checked = now
+
+            started = datetime.utcnow()
+            rebuild = (
+                self.filter is None
+                or now - self.rebuilt >= config["TOKEN_REVOCATION_REBUILD_INTERVAL"]
+            )
+            query = db.session.query(
+                RevokedToken.kind, RevokedToken.key, RevokedToken.issued_before
+            ).filter(RevokedToken.expires_at > started)
+            if not rebuild:
+                query = query.filter(RevokedToken.revoked_at >= self.synced_at)
+            rows = query.all()
+
+            if rebuild:
+                # new filter is filled aside and replaces the old one at once,
+                # requests keep reading the old one meanwhile
+                filter_ = BloomFilter(
+                    max(config["TOKEN_REVOCATION_FILTER_CAPACITY"], 2 * len(rows)),
+                    config["TOKEN_REVOCATION_FILTER_ERROR_RATE"],
+                )
+                users = {}
+                self.load(filter_, users, rows)
+                self.filter, self.users = filter_, users
+                self.rebuilt = now
+            else:
+                self.load(self.filter, self.users, rows)
+            # revocations committed while the query ran are loaded again next time
+            self.synced_at = started - timedelta(seconds=interval)
+
+    def is_revoked(self, payload: dict) -> bool:
+        self.sync()
+        issued_at = datetime.utcfromtimestamp(payload.get("iat", 0))
+        issued_before = self.users.get(payload["user_id"])
+        if issued_before is not None and issued_at <= issued_before:
+            return True
+
+        jti = payload.get("jti")
+        if jti is None or jti not in self.filter:
+            return False
+        # filter has false positives, so its hits are checked in database
+        query = RevokedToken.query.filter(
+            RevokedToken.kind == "token", RevokedToken.key == jti
+        )
+        return db.session.query(query.exists()).scalar()
+
+
+def init_token_revocations(app) -> None:
+    app.extensions["token_revocations"] = TokenRevocations()
+
+
+def get_token_revocations() -> TokenRevocations:
+    return current_app.extensions["token_revocations"]
+
+
+def get_token_expiration(payload: dict = None) -> datetime:
+    """Expiration of token, of tokens issued now without payload"""
+    if payload is not None and "exp" in payload:
+        return datetime.utcfromtimestamp(payload["exp"])
+    return datetime.utcnow() + timedelta(
+        minutes=current_app.config.get("JWT_EXPIRED_MINUTES", 30)
+    )
+
+
+def revoke_token(payload: dict) -> None:
+    """Revoke access token in the current transaction, it is rejected by this
+    process at once and by others after their next sync. Tokens issued before
+    they had jti can not be revoked alone, then tokens of the user issued until
+    the token are revoked. Such tokens have no iat, so tokens with jti stay valid"""
+    if "jti" not in payload:
+        revoke_user_tokens(
+            payload["user_id"],
+            issued_before=datetime.utcfromtimestamp(payload.get("iat", 0)),
+            expires_at=get_token_expiration(payload),
+        )
+        return
+
+    revocations = get_token_revocations()
+    revocations.sync()
+    record = RevokedToken(
+        kind="token", key=payload["jti"], expires_at=get_token_expiration(payload)
+    )
+    db.session.add(record)
+    db.session.flush()
+    revocations.add(record.kind, record.key)
+
+
+def revoke_user_tokens(
+    user_id: int, issued_before: datetime = None, expires_at: datetime = None
+) -> None:
+    """Revoke access tokens issued to user until issued_before (now by default) in
+    the current transaction. Revocation is kept until the last of them expires"""
+    revocations = get_token_revocations()
+    revocations.sync()
+    record = RevokedToken(
+        kind="user",
+        key=str(user_id),
+        issued_before=issued_before or datetime.utcnow(),
+        expires_at=expires_at or get_token_expiration(),
+    )
+    db.session.add(record)
+    db.session.flush()
+    revocations.add(record.kind, record.key, record.issued_before)
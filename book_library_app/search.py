@@ -0,0 +1,243 @@
+import re
+from flask import request, current_app
+from flask_sqlalchemy import DefaultMeta, BaseQuery
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from book_library_app import db
+from book_library_app.models import Author, Book
+
+# language used by postgres to stem words, sqlite uses porter stemmer
+TEXT_SEARCH_CONFIG = "english"
+
+AUTHOR_NAME = "authors.first_name || ' ' || authors.last_name"
+
+# sqlite full text search tables, rowid is id of a book or an author
+search_metadata = db.MetaData()
+books_search = db.Table(
+    "books_search",
+    search_metadata,
+    db.Column("rowid", db.Integer),
+    db.Column("title", db.Text),
+    db.Column("description", db.Text),
+    db.Column("author", db.Text),
+    db.Column("author_id", db.Integer),
+)
+authors_search = db.Table(
+    "authors_search",
+    search_metadata,
+    db.Column("rowid", db.Integer),
+    db.Column("name", db.Text),
+)
+
+# search indexes are created with tables by create_all, migrations create them
+# in existing databases
+SEARCH_DDL = {
+    Book.__table__: {
+        "sqlite": [
+            "CREATE VIRTUAL TABLE books_search USING fts5(title, description, "
+            "author, author_id UNINDEXED, tokenize='porter unicode61')"
+        ],
+        "postgresql": [
+            "ALTER TABLE books ADD COLUMN search_vector tsvector",
+            "CREATE INDEX ix_books_search_vector ON books USING gin (search_vector)",
+        ],
+    },
+    Author.__table__: {
+        "sqlite": [
+            "CREATE VIRTUAL TABLE authors_search USING fts5(name, "
+            "tokenize='porter unicode61')"
+        ],
+        "postgresql": [
+            "ALTER TABLE authors ADD COLUMN search_vector tsvector",
+            "CREATE INDEX ix_authors_search_vector ON authors "
+            "USING gin (search_vector)",
+        ],
+    },
+}
+
+for table, dialects in SEARCH_DDL.items():
+    for dialect, statements in dialects.items():
+        for statement in statements:
+            event.listen(
+                table, "after_create", DDL(statement).execute_if(dialect=dialect)
+            )
+    event.listen(
+        table,
+        "after_drop",
+        DDL(f"DROP TABLE IF EXISTS {table.name}_search").execute_if(dialect="sqlite"),
+    )
+
+
+def get_words(text: str) -> list[str]:
+    return re.findall(r"\w+", text)
+
+
+def filter_ids(column: str, ids) -> tuple[str, dict]:
+    """SQL condition limiting update of search index to ids, None means all"""
+    if ids is None:
+        return "1 = 1", {}
+    return f"{column} IN :ids", {"ids": list(ids)}
+
+
+def execute(statement: str, params: dict) -> None:
+    statement = db.text(statement)
+    if "ids" in params:
+        statement = statement.bindparams(db.bindparam("ids", expanding=True))
+    db.session.execute(statement, params)
+
+
+class PostgresSearch:
+    """tsvector columns of books and authors with GIN indexes, book vector contains
+    also name of its author"""
+
+    book_vector = (
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', books.title), 'A') || "
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', {AUTHOR_NAME}), 'A') || "
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', books.description), 'C')"
+    )
+    author_vector = f"to_tsvector('{TEXT_SEARCH_CONFIG}', {AUTHOR_NAME})"
+
+    def search(
+        self, model: DefaultMeta, query: BaseQuery, text: str, ranked: bool
+    ) -> BaseQuery:
+        vector = db.literal_column(f"{model.__tablename__}.search_vector", TSVECTOR)
+        tsquery = db.func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, text)
+        query = query.filter(vector.op("@@")(tsquery))
+        if ranked:
+            query = query.order_by(db.func.ts_rank_cd(vector, tsquery).desc())
+        return query
+
+    def update_index(self, model: DefaultMeta, ids=None) -> None:
+        books_key = "books.id"
+        if model is Author:
+            condition, params = filter_ids("authors.id", ids)
+            execute(
+                f"UPDATE authors SET search_vector = {self.author_vector} "
+                f"WHERE {condition}",
+                params,
+            )
+            books_key = "books.author_id"
+
+        condition, params = filter_ids(books_key, ids)
+        execute(
+            f"UPDATE books SET search_vector = {self.book_vector} FROM authors "
+            f"WHERE authors.id = books.author_id AND {condition}",
+            params,
+        )
+
+
+class SQLiteSearch:
+    """FTS5 tables with copies of searched text ranked by bm25"""
+
+    tables = {Book: books_search, Author: authors_search}
+    # weights of columns in bm25, title and author are more important than description
+    weights = {Book: (10.0, 1.0, 10.0, 0.0), Author: (1.0,)}
+
+    def search(
+        self, model: DefaultMeta, query: BaseQuery, text: str, ranked: bool
+    ) -> BaseQuery:
+        words = get_words(text)
+        if not words:
+            return query.filter(db.false())
+
+        table = self.tables[model]
+        table_column = db.literal_column(table.name)
+        # every word is quoted so it is not treated as FTS5 query syntax
+        match = " ".join(f'"{word}"' for word in words)
+        query = query.join(table, table.c.rowid == model.id).filter(
+            table_column.op("MATCH")(match)
+        )
+        if ranked:
+            query = query.order_by(db.func.bm25(table_column, *self.weights[model]))
+        return query
+
+    def update_index(self, model: DefaultMeta, ids=None) -> None:
+        books_key, search_key = "books.id", "rowid"
+        if model is Author:
+            condition, params = filter_ids("rowid", ids)
+            execute(f"DELETE FROM authors_search WHERE {condition}", params)
+            condition, params = filter_ids("authors.id", ids)
+            execute(
+                "INSERT INTO authors_search (rowid, name) "
+                f"SELECT authors.id, {AUTHOR_NAME} FROM authors WHERE {condition}",
+                params,
+            )
+            books_key, search_key = "books.author_id", "author_id"
+
+        condition, params = filter_ids(search_key, ids)
+        execute(f"DELETE FROM books_search WHERE {condition}", params)
+        condition, params = filter_ids(books_key, ids)
+        execute(
+            "INSERT INTO books_search (rowid, title, description, author, author_id) "
+            f"SELECT books.id, books.title, books.description, {AUTHOR_NAME}, "
+            "books.author_id FROM books JOIN authors ON authors.id = books.author_id "
+            f"WHERE {condition}",
+            params,
+        )
+
+
+class LikeSearch:
+    """Search without index, every word has to be a part of one of the columns"""
+
+    def get_columns(self, model: DefaultMeta, word: str) -> list:
+        pattern = f"%{word}%"
+        author_name = [
+            Author.first_name.ilike(pattern),
+            Author.last_name.ilike(pattern),
+        ]
+        if model is Author:
+            return author_name
+        return [
+            Book.title.ilike(pattern),
+            Book.description.ilike(pattern),
+            Book.author.has(db.or_(*author_name)),
+        ]
+
+    def search(
+        self, model: DefaultMeta, query: BaseQuery, text: str, ranked: bool
+    ) -> BaseQuery:
+        words = get_words(text)
+        if not words:
+            return query.filter(db.false())
+        for word in words:
+            query = query.filter(db.or_(*self.get_columns(model, word)))
+        return query
+
+    def update_index(self, model: DefaultMeta, ids=None) -> None:
+        pass
+
+
+SEARCH_BACKENDS = {
+    "postgresql": PostgresSearch(),
+    "sqlite": SQLiteSearch(),
+    "like": LikeSearch(),
+}
+
+
+def get_search_backend():
+    """Backend set in SEARCH_BACKEND, auto is full text search index of the
+    database or LIKE for databases without it"""
+    name = current_app.config["SEARCH_BACKEND"]
+    if name == "auto":
+        name = db.engine.dialect.name
+    return SEARCH_BACKENDS.get(name, SEARCH_BACKENDS["like"])
+
+
+def apply_search(model: DefaultMeta, query: BaseQuery) -> BaseQuery:
+    """Filter records matching ?q= text, without ?sort= they are ordered from
+    the best match"""
+    text = request.args.get("q")
+    if text is None:
+        return query
+    return get_search_backend().search(
+        model, query, text, ranked="sort" not in request.args
+    )
+
+
+def update_search_index(model: DefaultMeta, ids=None) -> None:
+    """Refresh search index of records with ids (all when None) in the current
+    transaction, changes of authors refresh also their books. Deleted records
+    are removed from index"""
+    backend = SEARCH_BACKENDS.get(db.engine.dialect.name)
+    if backend is not None:
+        backend.update_index(model, ids)
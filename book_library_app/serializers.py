@@ -0,0 +1,107 @@
+from functools import lru_cache
+from typing import Callable
+from marshmallow import Schema, fields
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+
+# fields which are serialized by a builtin conversion of not None value
+CONVERSIONS = {
+    fields.Integer: "int",
+    fields.Float: "float",
+    fields.String: "str",
+    fields.Email: "str",
+}
+
+
+class CompiledSerializer:
+    """Schema with dump function generated once for its fields. Generated function
+    gives the same output as Schema.dump without per field dispatch"""
+
+    def __init__(self, schema: Schema):
+        self.schema = schema
+        self.dump_one = compile_schema(schema)
+
+    def dump(self, obj, many: bool = None):
+        many = self.schema.many if many is None else many
+        if many:
+            return [self.dump_one(item) for item in obj]
+        return self.dump_one(obj)
+
+
+def add_to_namespace(namespace: dict, prefix: str, value) -> str:
+    """Put value used by generated code to its namespace under a unique name"""
+    name = f"{prefix}_{len(namespace)}"
+    namespace[name] = value
+    return name
+
+
+def get_field_expression(field: fields.Field, value: str, namespace: dict) -> str:
+    """Python expression which serializes not None value like field does"""
+    if type(field) in CONVERSIONS and not getattr(field, "as_string", False):
+        return f"{CONVERSIONS[type(field)]}({value})"
+
+    if isinstance(field, fields.DateTime):
+        data_format = field.format or field.DEFAULT_FORMAT
+        if data_format in field.SERIALIZATION_FUNCS:
+            format_func = field.SERIALIZATION_FUNCS[data_format]
+            return f"{add_to_namespace(namespace, 'format', format_func)}({value})"
+        data_format = add_to_namespace(namespace, "format", data_format)
+        return f"{value}.strftime({data_format})"
+
+    if isinstance(field, fields.Nested):
+        nested = add_to_namespace(namespace, "nested", compile_schema(field.schema))
+        if field.schema.many or field.many:
+            return f"[{nested}(item) for item in {value}]"
+        return f"{nested}({value})"
+
+    if isinstance(field, fields.List):
+        inner = get_field_expression(field.inner, "item", namespace)
+        return f"[None if item is None else {inner} for item in {value}]"
+
+    field_name = add_to_namespace(namespace, "field", field)
+    return f"{field_name}._serialize({value}, None, None)"
+
+
+def compile_schema(schema: Schema) -> Callable:
+    """Generate function which serializes a single object with schema"""
+    if schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP):
+        return lambda obj: schema.dump(obj, many=False)
+
+    namespace = {}
+    lines = ["def serialize(obj):", "    data = {}"]
+    for name, field in schema.dump_fields.items():
+        attribute = field.attribute or name
+        key = field.data_key or name
+        # nested attributes like "author.id" are read by marshmallow itself
+        if not attribute.isidentifier():
+            field_name = add_to_namespace(namespace, "field", field)
+            lines.append(
+                f"    data[{key!r}] = {field_name}.serialize({attribute!r}, obj)"
+            )
+            continue
+
+        expression = get_field_expression(field, "value", namespace)
+        lines += [
+            f"    value = obj.{attribute}",
+            f"    data[{key!r}] = None if value is None else {expression}",
+        ]
+    lines.append("    return data")
+
+    exec("\n".join(lines), namespace)
+    return namespace["serialize"]
+
+
+@lru_cache(maxsize=256)
+def get_cached_serializer(
+    schema_class: type, many: bool, only: tuple, exclude: tuple
+) -> CompiledSerializer:
+    return CompiledSerializer(schema_class(many=many, only=only, exclude=exclude))
+
+
+def get_serializer(
+    schema_class: type, many: bool = False, only=None, exclude=()
+) -> CompiledSerializer:
+    """Compiled serializer for schema and fields set, it is created only once
+    for every combination of arguments"""
+    if only is not None:
+        only = tuple(sorted(set(only)))
+    return get_cached_serializer(schema_class, many, only, tuple(sorted(exclude)))
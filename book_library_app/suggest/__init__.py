@@ -0,0 +1,6 @@
+from flask import Blueprint
+
+suggest_bp = Blueprint("suggest", __name__)
+
+
+from book_library_app.suggest import suggest
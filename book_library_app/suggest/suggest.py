@@ -0,0 +1,25 @@
+from flask import jsonify, abort, request, current_app
+from book_library_app.suggest import suggest_bp
+
+KINDS = {"book", "author"}
+
+
+@suggest_bp.route("/suggest", methods=["GET"])
+def get_suggestions():
+    """Titles or author names starting with prefix, they are found in index kept
+    in memory so database is not queried"""
+    prefix = request.args.get("prefix", "")
+    kind = request.args.get("kind", "book")
+    if kind not in KINDS:
+        abort(400, description=f"kind must be one of: {', '.join(sorted(KINDS))}")
+    limit = min(
+        request.args.get("limit", 10, type=int),
+        current_app.config["SUGGEST_MAX_LIMIT"],
+    )
+
+    suggestions = []
+    if prefix.strip():
+        index = current_app.extensions["suggest"][kind]
+        suggestions = index.lookup(prefix, max(limit, 0))
+
+    return jsonify({"data": suggestions, "numbers_of_records": len(suggestions)})
@@ -0,0 +1,183 @@
+import time
+import threading
+from bisect import bisect_left, insort
+from flask import current_app
+from flask_sqlalchemy import DefaultMeta
+from book_library_app import db
+from book_library_app.models import Author, Book
+from book_library_app.utils import bump_versions, get_versions, get_committed_version
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def get_book_entries(book_id: int, title: str) -> list[tuple]:
+    return [(normalize(title), book_id, title)]
+
+
+def get_author_entries(author_id: int, first_name: str, last_name: str) -> list[tuple]:
+    """Authors are found by the beginning of full name and of last name"""
+    name = f"{first_name} {last_name}"
+    return [(normalize(name), author_id, name), (normalize(last_name), author_id, name)]
+
+
+# names of versions in table_versions bumped by writes of titles and names
+SUGGEST_VERSIONS = {Book: "book_titles", Author: "author_names"}
+
+
+class SuggestIndex:
+    """Sorted array of normalized names, records starting with a prefix are found
+    by binary search. It is built from database on first use, updated by writes of
+    this process and rebuilt in background when version of names changes because
+    of writes of other processes. The version is bumped only by writes of names,
+    not by other writes to the table like votes"""
+
+    def __init__(
+        self, model: DefaultMeta, columns: list, get_entries, version_name: str
+    ):
+        self.model = model
+        self.columns = columns
+        self.version_name = version_name
+        self.get_entries = get_entries
+        self.entries = []
+        self.records = {}
+        self.version = None
+        self.checked = 0
+        self.rebuilding = False
+        self.lock = threading.Lock()
+
+    def get_version(self) -> int:
+        versions = get_versions(self.version_name)
+        return versions[0][1] if versions else 0
+
+    def follow_commit(self) -> None:
+        """Take version saved by the write of this process which was applied to the
+        index, when it is the next one after the index version. Otherwise other
+        processes changed names too and the index is rebuilt"""
+        committed = get_committed_version(self.version_name)
+        with self.lock:
+            if self.version is not None and committed == self.version + 1:
+                self.version = committed
+
+    def build(self) -> None:
+        version = self.get_version()
+        records = {}
+        for row in db.session.query(*self.columns).yield_per(10000):
+            records[row[0]] = self.get_entries(*row)
+        entries = sorted(entry for entries in records.values() for entry in entries)
+        with self.lock:
+            self.entries, self.records, self.version = entries, records, version
+
+    def rebuild(self, app) -> None:
+        try:
+            with app.app_context():
+                self.build()
+        finally:
+            self.rebuilding = False
+
+    def refresh(self) -> None:
+        if self.version is None:
+            self.checked = time.monotonic()
+            self.build()
+            return
+
+        now = time.monotonic()
+        interval = current_app.config["SUGGEST_REFRESH_INTERVAL"]
+        if self.rebuilding or now - self.checked < interval:
+            return
+        self.checked = now
+        if self.get_version() != self.version:
+            self.rebuilding = True
+            app = current_app._get_current_object()
+            threading.Thread(target=self.rebuild, args=(app,), daemon=True).start()
+
+    def lookup(self, prefix: str, limit: int) -> list[dict]:
+        self.refresh()
+        prefix = normalize(prefix)
+        results, found = [], set()
+        with self.lock:
+            position = bisect_left(self.entries, (prefix,))
+            while position < len(self.entries) and len(results) < limit:
+                key, record_id, text = self.entries[position]
+                if not key.startswith(prefix):
+                    break
+                if record_id not in found:
+                    found.add(record_id)
+                    results.append({"id": record_id, "text": text})
+                position += 1
+        return results
+
+    def remove(self, record_id: int) -> None:
+        with self.lock:
+            for entry in self.records.pop(record_id, []):
+                position = bisect_left(self.entries, entry)
+                if position < len(self.entries) and self.entries[position] == entry:
+                    del self.entries[position]
+
+    def add(self, record_id: int, *values) -> None:
+        self.remove(record_id)
+        entries = self.get_entries(record_id, *values)
+        with self.lock:
+            self.records[record_id] = entries
+            for entry in entries:
+                insort(self.entries, entry)
+
+    def add_many(self, rows: list[tuple]) -> None:
+        """Add new records at once, entries are sorted again instead of inserting
+        them one by one"""
+        records = {row[0]: self.get_entries(*row) for row in rows}
+        with self.lock:
+            self.records.update(records)
+            self.entries = sorted(
+                self.entries
+                + [entry for entries in records.values() for entry in entries]
+            )
+
+
+def init_suggestions(app) -> None:
+    app.extensions["suggest"] = {
+        "book": SuggestIndex(
+            Book, [Book.id, Book.title], get_book_entries, SUGGEST_VERSIONS[Book]
+        ),
+        "author": SuggestIndex(
+            Author,
+            [Author.id, Author.first_name, Author.last_name],
+            get_author_entries,
+            SUGGEST_VERSIONS[Author],
+        ),
+    }
+
+
+def get_suggest_index(model: DefaultMeta) -> SuggestIndex:
+    kind = "book" if model is Book else "author"
+    return current_app.extensions["suggest"][kind]
+
+
+def bump_suggest_versions(*models: DefaultMeta) -> None:
+    """Mark titles or names changed in the current transaction, call it before
+    commit of every write of them"""
+    bump_versions(*[SUGGEST_VERSIONS[model] for model in models])
+
+
+def update_suggestions(record) -> None:
+    """Put saved book or author to suggestions of this process"""
+    index = get_suggest_index(type(record))
+    if index.version is not None:
+        index.add(*[getattr(record, column.key) for column in index.columns])
+        index.follow_commit()
+
+
+def add_suggestions(model: DefaultMeta, rows: list[dict]) -> None:
+    """Put books or authors inserted by bulk endpoints to suggestions"""
+    index = get_suggest_index(model)
+    if index.version is not None:
+        index.add_many([[row[column.key] for column in index.columns] for row in rows])
+        index.follow_commit()
+
+
+def remove_suggestions(model: DefaultMeta, ids: list) -> None:
+    index = get_suggest_index(model)
+    for record_id in ids:
+        index.remove(record_id)
+    index.follow_commit()
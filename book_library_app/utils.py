@@ -1,64 +1,442 @@
-import ssl
-import smtplib
 import os
 import re
+import math
+import time
+import json
+import threading
+import base64
+import binascii
+import hashlib
 import jwt
 import boto3
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime
 from functools import wraps
 from typing import Tuple
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from flask import request, url_for, current_app, abort
+from flask import request, url_for, current_app, abort, make_response
 from flask_sqlalchemy import DefaultMeta, BaseQuery
-from sqlalchemy.orm.attributes import InstrumentedAttribute
+from marshmallow import Schema
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from sqlalchemy.orm.attributes import InstrumentedAttribute, set_committed_value
 from sqlalchemy.sql.expression import BinaryExpression
-from book_library_app.models import Author, Votes, Book
+from book_library_app.models import Author, Votes, Book, TableVersion
 from book_library_app import db
+from book_library_app.revocations import get_token_revocations
 from werkzeug.exceptions import UnsupportedMediaType
+from werkzeug.http import is_resource_modified
 from werkzeug.utils import secure_filename
 from botocore.client import Config
 from botocore.exceptions import ClientError
 
 COMPARISION_OPERATORS_RE = re.compile(r"(.*)\[(gte|gt|lte|lt)\]")
 
+# backends which can join another table in UPDATE statement
+UPDATE_FROM_DIALECTS = {"postgresql", "mysql", "mssql"}
 
-def calculate_stats(books_id: list[int]) -> None:
-    """Calculate book score and number of votes based on book id and data in Votes"""
-    for book_id in books_id:
-        votes_list = Votes.query.filter(Votes.book_id == book_id).all()
-        book = Book.query.get_or_404(
-            book_id, description=f"Book with id: {book_id} not found"
+# request arguments which are not used for filtering
+RESERVED_ARGS = {
+    "fields",
+    "sort",
+    "page",
+    "limit",
+    "cursor",
+    "include_books",
+    "q",
+    "format",
+}
+
+# request arguments which do not change which records are counted
+COUNT_IGNORED_ARGS = RESERVED_ARGS - {"q"}
+
+# how total number of records in pagination is computed:
+# exact - COUNT(*) on every request, skip - no total, only if there is a next page,
+# estimate - postgres planner estimate, cached - COUNT(*) cached for filters with ttl
+COUNT_STRATEGIES = {"exact", "skip", "estimate", "cached"}
+
+
+class TTLCache:
+    """Thread safe per process LRU cache which entries expire after ttl seconds"""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None, min_ttl: float = 0):
+        """Value which is still valid for at least min_ttl seconds"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] - time.monotonic() <= min_ttl:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl: float) -> None:
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0,
+        }
+
+
+count_cache = TTLCache()
+
+
+def update_from_subquery(model: DefaultMeta, subquery, key: str, values: dict) -> int:
+    """UPDATE model rows with values computed in subquery joined on key column.
+    Backends without multiple-table UPDATE get correlated subqueries instead"""
+    model_key = getattr(model, key)
+    if db.engine.dialect.name in UPDATE_FROM_DIALECTS:
+        query = model.query.filter(model_key == subquery.c[key])
+    else:
+        query = model.query.filter(model_key.in_(db.session.query(subquery.c[key])))
+        values = {
+            column: db.session.query(value)
+            .filter(subquery.c[key] == model_key)
+            .scalar_subquery()
+            for column, value in values.items()
+        }
+    return query.update(values, synchronize_session=False)
+
+
+def get_books_stats(start_id: int = None, end_id: int = None):
+    """Subquery with book stats aggregated from Votes, optionally for a range of books"""
+    query = (
+        db.session.query(
+            Book.id.label("id"),
+            db.func.count(Votes.comment_id).label("number_of_votes"),
+            db.func.coalesce(db.func.sum(Votes.points), 0).label("score_sum"),
         )
-        book.score_sum = sum([vote.points for vote in votes_list])
-        book.number_of_votes = len(votes_list)
-        if book.number_of_votes != 0:
-            book.average_book_score = book.score_sum / book.number_of_votes
-        else:
-            book.average_book_score = 0
+        .outerjoin(Votes, Votes.book_id == Book.id)
+        .group_by(Book.id)
+    )
+    if start_id is not None:
+        query = query.filter(Book.id >= start_id)
+    if end_id is not None:
+        query = query.filter(Book.id <= end_id)
+    return query.subquery()
 
-        db.session.commit()
-        calculate_authors_stats(author_id=book.author_id)
+
+def get_authors_stats(start_id: int = None, end_id: int = None):
+    """Subquery with author scores aggregated from books, optionally only for authors
+    of books in a range. Authors without books get 0"""
+    query = (
+        db.session.query(
+            Author.id.label("id"),
+            db.func.coalesce(
+                db.func.avg(db.func.coalesce(Book.average_book_score, 0)), 0
+            ).label("author_average_score"),
+        )
+        .outerjoin(Book, Book.author_id == Author.id)
+        .group_by(Author.id)
+    )
+    if start_id is not None or end_id is not None:
+        books = db.session.query(Book.author_id)
+        if start_id is not None:
+            books = books.filter(Book.id >= start_id)
+        if end_id is not None:
+            books = books.filter(Book.id <= end_id)
+        query = query.filter(Author.id.in_(books))
+    return query.subquery()
 
 
-def calculate_authors_stats(author_id: int, db_save=True) -> None:
-    """Calculate author score if db_save is set to false db save is turned off"""
-    author = Author.query.get_or_404(
-        author_id, description=f"Author with id: {author_id} not found"
+def get_stats_diff(model: DefaultMeta, stats, columns: list[str]) -> list[dict]:
+    """Rows where stored stats differ from recomputed ones"""
+    differences = []
+    for column in columns:
+        stored = db.func.coalesce(getattr(model, column), -1)
+        differences.append(db.func.abs(stored - stats.c[column]) > 1e-9)
+
+    rows = (
+        db.session.query(model.id, *[getattr(model, column) for column in columns])
+        .add_columns(*[stats.c[column].label(f"new_{column}") for column in columns])
+        .filter(model.id == stats.c.id)
+        .filter(db.or_(*differences))
+        .order_by(model.id)
+    )
+    return [
+        {
+            "id": row.id,
+            **{
+                column: (getattr(row, column), getattr(row, f"new_{column}"))
+                for column in columns
+            },
+        }
+        for row in rows
+    ]
+
+
+def recompute_stats(start_id: int = None, end_id: int = None, dry_run=False) -> dict:
+    """Recalculate book and author stats with set based updates in one transaction.
+    Returns numbers of updated rows, with dry_run changes are rolled back and
+    differences between stored and recomputed values are returned instead"""
+    books_stats = get_books_stats(start_id, end_id)
+    average_book_score = db.case(
+        (
+            books_stats.c.number_of_votes > 0,
+            db.cast(books_stats.c.score_sum, db.Float) / books_stats.c.number_of_votes,
+        ),
+        else_=0,
+    )
+    books_stats = db.session.query(
+        books_stats, average_book_score.label("average_book_score")
+    ).subquery()
+    book_columns = ["number_of_votes", "score_sum", "average_book_score"]
+
+    result = {"books": [], "authors": []}
+    if dry_run:
+        result["books"] = get_stats_diff(Book, books_stats, book_columns)
+
+    books_updated = update_from_subquery(
+        Book,
+        books_stats,
+        "id",
+        {getattr(Book, column): books_stats.c[column] for column in book_columns},
     )
-    books = Book.query.filter(Book.author_id == author_id).all()
-    print(f"books:{books}")
-    sum_average_scores_book = 0
-    for book in books:
-        if book.average_book_score is not None:
-            sum_average_scores_book += book.average_book_score
-    number_of_author_books = len(books)
-    author.author_average_score = (
-        sum_average_scores_book / number_of_author_books
-        if number_of_author_books != 0
-        else 0
+
+    # authors are updated after books so their scores use recomputed book scores
+    authors_stats = get_authors_stats(start_id, end_id)
+    if dry_run:
+        result["authors"] = get_stats_diff(
+            Author, authors_stats, ["author_average_score"]
+        )
+
+    authors_updated = update_from_subquery(
+        Author,
+        authors_stats,
+        "id",
+        {Author.author_average_score: authors_stats.c.author_average_score},
     )
-    if db_save is True:
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        bump_table_versions(Book, Author)
         db.session.commit()
+        result = {"books": books_updated, "authors": authors_updated}
+    return result
+
+
+def apply_vote_delta(book_id: int, points_delta: int, votes_delta: int = 0) -> None:
+    """Apply change made by a single vote to book and author stats with atomic SQL updates.
+    Nothing is commited so stats are saved in the same transaction as the vote itself"""
+    if apply_vote_deltas({book_id: (points_delta, votes_delta)}) == 0:
+        db.session.rollback()
+        abort(404, description=f"Book with id: {book_id} not found")
+
+
+def apply_vote_deltas(deltas: dict) -> int:
+    """Apply summed changes of many votes, deltas are (points, votes) by book id.
+    Every touched book is updated once in one executemany and their authors in
+    a single statement, returns number of updated books"""
+    # authors are locked before their books are updated, so votes on different
+    # books of the same author wait for each other and the average computed
+    # below sees books updated by the other transaction. Rows are locked in order
+    # of ids so concurrent votes do not deadlock
+    authors_ids = [
+        author_id
+        for (author_id,) in db.session.query(Book.author_id)
+        .filter(Book.id.in_(deltas))
+        .distinct()
+    ]
+    db.session.query(Author.id).filter(Author.id.in_(authors_ids)).order_by(
+        Author.id
+    ).with_for_update().all()
+
+    books = Book.__table__
+    number_of_votes = db.func.coalesce(books.c.number_of_votes, 0) + db.bindparam(
+        "votes_delta"
+    )
+    score_sum = db.func.coalesce(books.c.score_sum, 0) + db.bindparam("points_delta")
+    statement = (
+        books.update()
+        .where(books.c.id == db.bindparam("book_id"))
+        .values(
+            number_of_votes=number_of_votes,
+            score_sum=score_sum,
+            average_book_score=db.case(
+                (number_of_votes > 0, db.cast(score_sum, db.Float) / number_of_votes),
+                else_=0,
+            ),
+        )
+    )
+    updated_rows = db.session.execute(
+        statement,
+        [
+            {"book_id": book_id, "points_delta": points, "votes_delta": votes}
+            for book_id, (points, votes) in sorted(deltas.items())
+        ],
+    ).rowcount
+
+    # author score is an average of the author's books scores, it is computed by
+    # database from books of these authors instead of loading them to python
+    author_score = (
+        db.session.query(db.func.avg(db.func.coalesce(Book.average_book_score, 0)))
+        .filter(Book.author_id == Author.id)
+        .scalar_subquery()
+    )
+    Author.query.filter(Author.id.in_(authors_ids)).update(
+        {Author.author_average_score: author_score}, synchronize_session=False
+    )
+    bump_table_versions(Book, Author)
+    return updated_rows
+
+
+def bump_table_versions(*models: DefaultMeta) -> None:
+    bump_versions(*[model.__tablename__ for model in models])
+
+
+def bump_versions(*names: str) -> None:
+    """Mark versions of tables (or of parts of tables, e.g. names used by suggestions)
+    changed in the current transaction. They are increased by
+    increase_table_versions right before commit, so versions are saved together
+    with the data and shared rows of table_versions are locked only for the time
+    of commit instead of the whole transaction"""
+    db.session.info.setdefault("changed_tables", set()).update(names)
+
+
+@event.listens_for(db.session, "before_commit")
+def increase_table_versions(session) -> None:
+    """Increase versions marked by bump_versions, rows are locked in the same order
+    by every write. New versions are kept in session.info["committed_versions"],
+    so caches of this process updated by the write can take them"""
+    table_names = sorted(session.info.pop("changed_tables", ()))
+    session.info.pop("committed_versions", None)
+    if not table_names:
+        return
+    now = datetime.utcnow()
+    updated_rows = (
+        session.query(TableVersion)
+        .filter(TableVersion.table_name.in_(table_names))
+        .update(
+            {
+                TableVersion.version: TableVersion.version + 1,
+                TableVersion.updated_at: now,
+            },
+            synchronize_session=False,
+        )
+    )
+    versions = session.query(TableVersion.table_name, TableVersion.version).filter(
+        TableVersion.table_name.in_(table_names)
+    )
+    if updated_rows == len(table_names):
+        session.info["committed_versions"] = dict(versions)
+        return
+
+    # rows are created by migration, this is only for databases made by create_all
+    existing = dict(versions)
+    for table_name in table_names:
+        if table_name not in existing:
+            existing[table_name] = 1
+            session.add(TableVersion(table_name=table_name, version=1, updated_at=now))
+    session.info["committed_versions"] = existing
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def forget_table_versions(session, previous_transaction) -> None:
+    # tables changed by rolled back transaction are not changed
+    session.info.pop("changed_tables", None)
+
+
+def get_committed_version(name: str):
+    """Version saved by the last commit of this session, None when it did not
+    change it"""
+    return db.session.info.get("committed_versions", {}).get(name)
+
+
+def get_table_versions(*models: DefaultMeta) -> list[Tuple]:
+    return get_versions(*[model.__tablename__ for model in models])
+
+
+def get_versions(*names: str) -> list[Tuple]:
+    return (
+        db.session.query(
+            TableVersion.table_name, TableVersion.version, TableVersion.updated_at
+        )
+        .filter(TableVersion.table_name.in_(names))
+        .order_by(TableVersion.table_name)
+        .all()
+    )
+
+
+def get_etag(versions: list[Tuple], *parts) -> str:
+    """Strong ETag of response made from versions of tables it is based on
+    and normalized request arguments"""
+    args = sorted(request.args.items(multi=True))
+    view_args = sorted((request.view_args or {}).items())
+    key = [request.endpoint, view_args, args, [row[:2] for row in versions], *parts]
+    return hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+
+
+def conditional_response(*models: DefaultMeta, cover_links=False):
+    """Decorator of GET views which returns 304 Not Modified when client has the
+    current version of response, otherwise response is taken from response cache
+    by its ETag. In both cases view is not called so neither page query nor
+    serialization runs. Presigned cover links are valid for limited time so
+    responses with them change at least every COVER_LINK_MIN_TTL seconds"""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            versions = get_table_versions(*models)
+            last_modified = max((row[2] for row in versions), default=None)
+            parts = []
+            if cover_links:
+                period = current_app.config["COVER_LINK_MIN_TTL"]
+                links_time = int(time.time()) // period * period
+                parts.append(links_time)
+                links_date = datetime.utcfromtimestamp(links_time)
+                last_modified = max(last_modified or links_date, links_date)
+            etag = get_etag(versions, *parts)
+
+            modified = is_resource_modified(
+                request.environ, etag=etag, last_modified=last_modified
+            )
+            cache = current_app.extensions["response_cache"]
+            cached = cache.get(etag) if modified and cache is not None else None
+
+            if not modified:
+                response = current_app.response_class(status=304)
+            elif cached is not None:
+                body, mimetype = cached
+                response = current_app.response_class(body, mimetype=mimetype)
+                response.headers["X-Cache"] = "HIT"
+            else:
+                response = make_response(func(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if cache is not None:
+                    cache.set(etag, (response.get_data(), response.mimetype))
+                    response.headers["X-Cache"] = "MISS"
+
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            return response
+
+        return wrapper
+
+    return decorator
 
 
 def validate_json_content_type(func):
@@ -74,26 +452,56 @@ def validate_json_content_type(func):
     return wrapper
 
 
+# payloads of verified tokens: digest of secret and token -> payload
+jwt_cache = TTLCache(max_size=4096)
+
+
+def decode_token(token: str) -> dict:
+    """Payload of token with verified signature and exp. Verified tokens are kept
+    in cache until their exp, so signature of a token is checked once and next
+    requests with it cost a dict lookup"""
+    secret = current_app.config.get("SECRET_KEY")
+    key = hashlib.sha256(f"{secret}.{token}".encode()).digest()
+    payload = jwt_cache.get(key)
+    if payload is not None:
+        return payload
+
+    try:
+        payload = jwt.decode(token, secret, algorithms=["HS256"])
+    except jwt.ExpiredSignatureError:
+        abort(404, description="Token expired. Please login to get new token")
+    except jwt.InvalidTokenError:
+        abort(404, description="Invalid token. Please login or register")
+
+    # tokens without exp are verified every time
+    ttl = payload.get("exp", 0) - time.time()
+    if ttl > 0:
+        jwt_cache.max_size = current_app.config.get("JWT_CACHE_SIZE", 4096)
+        jwt_cache.set(key, payload, ttl)
+    return payload
+
+
+def get_token_payload() -> dict:
+    """Verified payload of token from Authorization header which is not revoked"""
+    token = None
+    auth = request.headers.get("Authorization")
+    if auth:
+        token = auth.split(" ")[1]
+    if token is None:
+        abort(404, description="Missing token. Please login or register")
+
+    payload = decode_token(token)
+    # revoked tokens are found in memory, database is asked only on filter hits
+    if get_token_revocations().is_revoked(payload):
+        abort(404, description="Token revoked. Please login to get new token")
+    return payload
+
+
 def token_required(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
-        token = None
-        auth = request.headers.get("Authorization")
-        if auth:
-            token = auth.split(" ")[1]
-        if token is None:
-            abort(404, description="Missing token. Please login or register")
-
-        try:
-            payload = jwt.decode(
-                token, current_app.config.get("SECRET_KEY"), algorithms=["HS256"]
-            )
-        except jwt.ExpiredSignatureError:
-            abort(404, description="Token expired. Please login to get new token")
-        except jwt.InvalidTokenError:
-            abort(404, description="Invalid token. Please login or register")
-        else:
-            return func(payload["user_id"], *args, **kwargs)
+        payload = get_token_payload()
+        return func(payload["user_id"], *args, **kwargs)
 
     return wrapper
 
@@ -112,8 +520,93 @@ def get_schema_args(model: DefaultMeta) -> dict:
     return schema_args
 
 
+def get_eager_options(model: DefaultMeta, schema: Schema, exclude=()) -> list:
+    """Loader options for relationships which schema serializes, so they are loaded
+    with a constant number of queries instead of one query per record.
+    Relationships in exclude are loaded some other way"""
+    options = []
+    relationships = inspect(model).relationships
+    for name, field in schema.dump_fields.items():
+        attribute = field.attribute or name
+        if attribute not in relationships or attribute in exclude:
+            continue
+        relationship = relationships[attribute]
+        # single objects are joined, collections are loaded with one IN query
+        if relationship.uselist:
+            loader = selectinload(getattr(model, attribute))
+        else:
+            loader = joinedload(getattr(model, attribute))
+
+        nested_field = getattr(field, "inner", field)
+        if hasattr(nested_field, "schema"):
+            nested_model = relationship.mapper.class_
+            nested_columns = get_dumped_columns(nested_model, nested_field.schema)
+            if len(nested_columns) < len(nested_model.__table__.columns):
+                loader = loader.load_only(*nested_columns)
+            nested_options = get_eager_options(nested_model, nested_field.schema)
+            loader = loader.options(*nested_options)
+        options.append(loader)
+    return options
+
+
+def get_dumped_columns(model: DefaultMeta, schema: Schema) -> list:
+    """Columns which schema serializes, primary key is always loaded"""
+    names = {field.attribute or name for name, field in schema.dump_fields.items()}
+    return [
+        getattr(model, column.key)
+        for column in model.__table__.columns
+        if column.key in names or column.primary_key
+    ]
+
+
+def get_load_options(model: DefaultMeta, schema: Schema) -> list:
+    """Select only columns which are serialized or sorted by, so columns left out
+    by fields argument like long descriptions are not read from database"""
+    columns = get_dumped_columns(model, schema)
+    keys = {column.key for column in columns}
+    columns += [column for column, _ in get_sort_keys(model) if column.key not in keys]
+    if len(columns) == len(model.__table__.columns):
+        return []
+    return [load_only(*columns)]
+
+
+def get_books_preview_limit() -> int:
+    """How many books are included in every author, capped by config"""
+    max_books = current_app.config.get("AUTHOR_BOOKS_PREVIEW", 5)
+    limit = request.args.get("include_books", max_books, type=int)
+    return min(max(limit, 0), max_books)
+
+
+def load_books_preview(authors: list, limit: int) -> None:
+    """Load at most limit first books of every author with one query"""
+    authors_books = defaultdict(list)
+    if authors and limit > 0:
+        row_number = (
+            db.func.row_number()
+            .over(partition_by=Book.author_id, order_by=Book.id)
+            .label("row_number")
+        )
+        numbered_books = (
+            db.session.query(Book.id, row_number)
+            .filter(Book.author_id.in_([author.id for author in authors]))
+            .subquery()
+        )
+        books = (
+            Book.query.join(numbered_books, numbered_books.c.id == Book.id)
+            .filter(numbered_books.c.row_number <= limit)
+            .order_by(Book.author_id, Book.id)
+        )
+        for book in books:
+            authors_books[book.author_id].append(book)
+
+    for author in authors:
+        set_committed_value(author, "books", authors_books[author.id])
+
+
 def apply_order(model: DefaultMeta, querry: BaseQuery) -> BaseQuery:
     """Get sort arguments from request"""
+    primary_key = inspect(model).primary_key[0].key
+    sorted_by_primary_key = False
     sort_keys = request.args.get("sort")
     if sort_keys is not None:
         for key in sort_keys.split(","):
@@ -123,12 +616,16 @@ def apply_order(model: DefaultMeta, querry: BaseQuery) -> BaseQuery:
                 desc = True
             column_attr = getattr(model, key, None)
             if column_attr is not None:
+                sorted_by_primary_key = sorted_by_primary_key or key == primary_key
                 # specify sort based of what column if desc True sort in desc order
                 querry = (
                     querry.order_by(column_attr.desc())
                     if desc
                     else querry.order_by(column_attr)
                 )
+    # primary key is the last sort key so pages are stable when sort values repeat
+    if not sorted_by_primary_key:
+        querry = querry.order_by(getattr(model, primary_key))
     return querry
 
 
@@ -150,8 +647,9 @@ def apply_filter(model: DefaultMeta, query: BaseQuery) -> BaseQuery:
     """Show entry which meet requirments from request"""
     for param, value in request.args.items():
 
-        # all parameters that are not in fields, sort,page and limit are filtering args
-        if param not in {"fields", "sort", "page", "limit"}:
+        # all parameters that are not in fields, sort, page, limit and cursor
+        # are filtering args
+        if param not in RESERVED_ARGS:
             # defoult operator if none argument passed
             operator = "=="
             # return what symbols patch pre-compiled pattern
@@ -171,79 +669,292 @@ def apply_filter(model: DefaultMeta, query: BaseQuery) -> BaseQuery:
     return query
 
 
-def get_pagination(querry: BaseQuery, func_name: str) -> Tuple:
-    """Return divided data to pages with adres for next and previous page"""
-    page = request.args.get("page", 1, type=int)
-    limit = request.args.get("limit", current_app.config.get("PER_PAGE", 5), type=int)
-    # paginate pages save their origin parameters to a variabla and built page with them
-    params = {key: value for key, value in request.args.items() if key != "page"}
+def get_sort_keys(model: DefaultMeta) -> list[Tuple[InstrumentedAttribute, bool]]:
+    """Sort columns from request with desc flag, primary key is always the last one
+    so order of records is unique. Requested primary key keeps its direction"""
+    primary_key = getattr(model, inspect(model).primary_key[0].key)
+    sort_keys = []
+    for key in request.args.get("sort", "").split(","):
+        desc = key.startswith("-")
+        if desc:
+            key = key[1:]
+        if key in model.__table__.columns:
+            sort_keys.append((getattr(model, key), desc))
+            # keys after primary key do not change the order
+            if key == primary_key.key:
+                return sort_keys
+    sort_keys.append((primary_key, False))
+    return sort_keys
 
-    paginate_object = querry.paginate(page, limit, False)
-    pagination = {
-        "total_pages": paginate_object.pages,
-        "total_records": paginate_object.total,
-        "current_page": url_for(func_name, page=page, **params),
+
+def get_keyset_order(column: InstrumentedAttribute, desc: bool):
+    """Null is the greatest value like in postgres, so indexes can be used"""
+    if not column.nullable:
+        return column.desc() if desc else column.asc()
+    return column.desc().nulls_first() if desc else column.asc().nulls_last()
+
+
+def get_keyset_after(column: InstrumentedAttribute, desc: bool, value):
+    """Condition for records placed after value in sort order"""
+    if not column.nullable:
+        return column < value if desc else column > value
+    if desc:
+        return column.isnot(None) if value is None else column < value
+    return db.false() if value is None else db.or_(column > value, column.is_(None))
+
+
+def get_keyset_filter(sort_keys: list, values: list) -> BinaryExpression:
+    """Records after the one with given values of sort keys"""
+    columns = [column for column, _ in sort_keys]
+    directions = {desc for _, desc in sort_keys}
+    # the same direction of all not nullable keys is a single row value comparison
+    if len(directions) == 1 and not any(column.nullable for column in columns):
+        if directions.pop():
+            return db.tuple_(*columns) < db.tuple_(*values)
+        return db.tuple_(*columns) > db.tuple_(*values)
+
+    conditions = []
+    for index, ((column, desc), value) in enumerate(zip(sort_keys, values)):
+        equal = [
+            previous.is_(None) if previous_value is None else previous == previous_value
+            for previous, previous_value in zip(columns[:index], values[:index])
+        ]
+        conditions.append(db.and_(*equal, get_keyset_after(column, desc, value)))
+    return db.or_(*conditions)
+
+
+def encode_cursor(sort_keys: list, item, direction: str) -> str:
+    values = []
+    for column, _ in sort_keys:
+        value = getattr(item, column.key)
+        values.append(value.isoformat() if isinstance(value, date) else value)
+    cursor = {"values": values, "sort": request.args.get("sort"), "dir": direction}
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+def decode_cursor(sort_keys: list, token: str) -> Tuple[list, str]:
+    """Values of sort keys and direction stored in cursor token"""
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(token.encode()))
+        values = cursor["values"]
+        direction = cursor["dir"]
+        if (
+            len(values) != len(sort_keys)
+            or cursor["sort"] != request.args.get("sort")
+            or direction not in {"next", "prev"}
+        ):
+            raise ValueError
+        for index, ((column, _), value) in enumerate(zip(sort_keys, values)):
+            python_type = column.type.python_type
+            if value is not None and python_type in {date, datetime}:
+                values[index] = python_type.fromisoformat(value)
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        abort(400, description="Invalid cursor")
+    return values, direction
+
+
+def get_cursor_pagination(querry: BaseQuery, func_name: str) -> Tuple:
+    """Return page of data which starts after record encoded in cursor, so
+    database reads only one index range instead of skipping previous pages"""
+    model = querry.column_descriptions[0]["entity"]
+    limit = request.args.get("limit", current_app.config.get("PER_PAGE", 5), type=int)
+    token = request.args.get("cursor")
+    params = {
+        **(request.view_args or {}),
+        **{
+            key: value
+            for key, value in request.args.items()
+            if key not in {"page", "cursor"}
+        },
     }
-    if paginate_object.has_next:
-        pagination["next_page"] = url_for(func_name, page=page + 1, **params)
 
-    if paginate_object.has_prev:
-        pagination["previous_page"] = url_for(func_name, page=page - 1, **params)
+    sort_keys = get_sort_keys(model)
+    direction = "next"
+    if token:
+        values, direction = decode_cursor(sort_keys, token)
+        # previous page is read backwards from the first record of current page
+        if direction == "prev":
+            reversed_keys = [(column, not desc) for column, desc in sort_keys]
+            querry = querry.filter(get_keyset_filter(reversed_keys, values))
+        else:
+            querry = querry.filter(get_keyset_filter(sort_keys, values))
 
-    return paginate_object.items, pagination
+    order_keys = sort_keys
+    if direction == "prev":
+        order_keys = [(column, not desc) for column, desc in sort_keys]
+    querry = querry.order_by(None).order_by(
+        *[get_keyset_order(column, desc) for column, desc in order_keys]
+    )
 
+    items = querry.limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+    if direction == "prev":
+        items.reverse()
+        has_next, has_prev = bool(token), has_more
+    else:
+        has_next, has_prev = has_more, bool(token)
 
-def email_sender(receiver_email: str, text: str, hashCode="") -> None:
+    pagination = {"current_page": url_for(func_name, cursor=token, **params)}
+    if has_next and items:
+        next_cursor = encode_cursor(sort_keys, items[-1], "next")
+        pagination["next_page"] = url_for(func_name, cursor=next_cursor, **params)
 
-    port = 465
-    email_password = os.environ.get("email_password")
-    sender_email = os.environ.get("sender_email")
+    if has_prev and items:
+        previous_cursor = encode_cursor(sort_keys, items[0], "prev")
+        pagination["previous_page"] = url_for(
+            func_name, cursor=previous_cursor, **params
+        )
 
-    contex = ssl.create_default_context()
+    return items, pagination
 
-    # Create a multipart message and set headers
-    message = MIMEMultipart("alternative")
-    message["Subject"] = "Reset password request"
-    message["From"] = sender_email
-    message["To"] = receiver_email
 
-    # Create the plain-text and HTML version of your message
+def get_count_cache_key(func_name: str) -> Tuple:
+    """Endpoint with filtering and search arguments normalized so their order
+    does not matter"""
+    filters = sorted(
+        (key, value)
+        for key, value in request.args.items(multi=True)
+        if key not in COUNT_IGNORED_ARGS
+    )
+    view_args = sorted((request.view_args or {}).items())
+    return func_name, tuple(view_args), tuple(filters)
 
-    html = f"""\
-    <html><body>
-        <p>Hi, Book Library API HERE<br>{text}<br></p>
-    </body></html>
-    """
 
-    # Turn these into plain/html MIMEText objects
-    part1 = MIMEText(text, "plain")
-    part2 = MIMEText(html, "html")
+def get_cached_count(querry: BaseQuery, func_name: str) -> int:
+    """Exact number of records which is counted again only after ttl expires"""
+    key = get_count_cache_key(func_name)
+    total = count_cache.get(key)
+    if total is None:
+        total = querry.order_by(None).count()
+        count_cache.max_size = current_app.config.get(
+            "PAGINATION_COUNT_CACHE_SIZE", 1024
+        )
+        count_cache.set(
+            key, total, current_app.config.get("PAGINATION_COUNT_CACHE_TTL", 60)
+        )
+    return total
+
+
+def get_estimated_count(querry: BaseQuery) -> int:
+    """Number of records estimated by postgres planner, None for other databases"""
+    if db.engine.dialect.name != "postgresql":
+        return None
+    statement = querry.order_by(None).statement.compile(dialect=db.engine.dialect)
+    plan = (
+        db.session.connection()
+        .exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", statement.params)
+        .scalar()
+    )
+    return int(plan[0]["Plan"]["Plan Rows"])
+
 
-    # Add HTML/plain-text parts to MIMEMultipart message
-    message.attach(part1)
-    message.attach(part2)
+def get_total_pages(total: int, limit: int) -> int:
+    if total is None:
+        return None
+    return math.ceil(total / limit) if limit > 0 else 0
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", port=port, context=contex) as server:
-        server.login(sender_email, password=email_password)
-        server.sendmail(sender_email, receiver_email, message.as_string())
+
+def get_pagination(querry: BaseQuery, func_name: str) -> Tuple:
+    """Return divided data to pages with adres for next and previous page"""
+    if "cursor" in request.args:
+        return get_cursor_pagination(querry, func_name)
+
+    page = max(request.args.get("page", 1, type=int), 1)
+    limit = request.args.get("limit", current_app.config.get("PER_PAGE", 5), type=int)
+    # paginate pages save their origin parameters to a variabla and built page with them
+    params = {
+        **(request.view_args or {}),
+        **{key: value for key, value in request.args.items() if key != "page"},
+    }
+
+    strategy = current_app.config.get("PAGINATION_COUNT", "exact")
+    if strategy not in COUNT_STRATEGIES:
+        raise ValueError(f"Unknown pagination count strategy: {strategy}")
+
+    total = None
+    if strategy == "estimate":
+        total = get_estimated_count(querry)
+        if total is None:
+            strategy = "exact"
+
+    if strategy == "exact":
+        paginate_object = querry.paginate(page, limit, False)
+        items, total = paginate_object.items, paginate_object.total
+        has_next = paginate_object.has_next
+    else:
+        if strategy == "cached":
+            total = get_cached_count(querry, func_name)
+        # one more record is fetched to know if there is a next page without counting
+        items = querry.limit(limit + 1).offset((page - 1) * limit).all()
+        has_next = len(items) > limit
+        items = items[:limit]
+
+    pagination = {
+        "total_pages": get_total_pages(total, limit),
+        "total_records": total,
+        "count_strategy": strategy,
+        "current_page": url_for(func_name, page=page, **params),
+    }
+    if has_next:
+        pagination["next_page"] = url_for(func_name, page=page + 1, **params)
+
+    if page > 1:
+        pagination["previous_page"] = url_for(func_name, page=page - 1, **params)
+
+    return items, pagination
 
 
 ALLOWED_EXTENSIONS = set(["png", "jpg", "jpeg"])
 
+s3_client = None
+s3_client_lock = threading.Lock()
+
+# presigned links to book covers: cover name -> link
+cover_link_cache = TTLCache(max_size=4096)
+
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def get_boto3_client():
-    s3 = boto3.client(
+def create_boto3_client():
+    config = current_app.config
+    # session is created explicitly because default boto3 session is not thread safe
+    return boto3.session.Session().client(
         "s3",
         region_name="eu-central-1",
         aws_access_key_id=os.environ.get("S3_KEY"),
         aws_secret_access_key=os.environ.get("S3_SECRET"),
-        config=Config(signature_version=os.environ.get("signature_version")),
+        config=Config(
+            signature_version=os.environ.get("signature_version"),
+            max_pool_connections=config.get("S3_MAX_POOL_CONNECTIONS", 10),
+            connect_timeout=config.get("S3_CONNECT_TIMEOUT", 5),
+            read_timeout=config.get("S3_READ_TIMEOUT", 10),
+        ),
     )
-    return s3
+
+
+def get_boto3_client():
+    """S3 client shared by all threads of a process, it is created on first use
+    so credentials and service model are loaded only once"""
+    global s3_client
+    if s3_client is None:
+        with s3_client_lock:
+            if s3_client is None:
+                s3_client = create_boto3_client()
+    return s3_client
+
+
+def reset_boto3_client() -> None:
+    """Forget S3 client, forked process can't reuse connections of its parent"""
+    global s3_client, s3_client_lock
+    s3_client = None
+    s3_client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_boto3_client)
 
 
 def upload_file_s3_bucket(file_name: str):
@@ -261,6 +972,7 @@ def upload_file_s3_bucket(file_name: str):
             get_boto3_client().put_object(
                 Body=file, Bucket=bucket_name, Key=file.filename
             )
+            invalidate_book_cover_link(file.filename)
             success = True
         except ClientError as e:
             success = False
@@ -273,27 +985,48 @@ def upload_file_s3_bucket(file_name: str):
     return file.filename
 
 
-def get_book_cover_link(cover_name: str):
+def get_book_cover_links(covers_names: list[str]) -> dict:
+    """Presigned URLs to share S3 objects for a whole page of books at once.
+    Links are cached and signed again when they are close to expiration
+
+    :param covers_names: list of S3 keys
+    :return: Dictionary with presigned URL for every cover name
+    """
+    config = current_app.config
+    expiration = config.get("COVER_LINK_EXPIRATION", 300)
+    # link is never given out when it has less than this many seconds left
+    min_ttl = config.get("COVER_LINK_MIN_TTL", 60)
+    cover_link_cache.max_size = config.get("COVER_LINK_CACHE_SIZE", 4096)
+    bucket_name = os.environ.get("S3_BUCKET")
+
+    links = {}
+    for cover_name in covers_names:
+        if cover_name in links:
+            continue
+        link = cover_link_cache.get(cover_name, min_ttl=min_ttl)
+        if link is None:
+            try:
+                link = get_boto3_client().generate_presigned_url(
+                    "get_object",
+                    Params={"Bucket": bucket_name, "Key": cover_name},
+                    ExpiresIn=expiration,
+                )
+            except ClientError as e:
+                print(e)
+                abort(404, description=(f"Cover {cover_name} not found"))
+            cover_link_cache.set(cover_name, link, expiration)
+        links[cover_name] = link
+    return links
+
+
+def get_book_cover_link(cover_name: str) -> str:
     """Generate a presigned URL to share an S3 object
 
-    :param bucket_name: string
     :param cover_name: string
-    :param expiration: Time in seconds for the presigned URL to remain valid
-    :return: Presigned URL as string. If error, returns None.
+    :return: Presigned URL as string
     """
-    expiration = 300
-    bucket_name = os.environ.get("S3_BUCKET")
-    # Generate a presigned URL for the S3 object
+    return get_book_cover_links([cover_name])[cover_name]
 
-    try:
-        book_cover_link = get_boto3_client().generate_presigned_url(
-            "get_object",
-            Params={"Bucket": bucket_name, "Key": cover_name},
-            ExpiresIn=expiration,
-        )
-    except ClientError as e:
-        print(e)
-        abort(404, description=(f"Cover {cover_name} not found"))
 
-    # The response contains the presigned URL
-    return book_cover_link
+def invalidate_book_cover_link(cover_name: str) -> None:
+    cover_link_cache.pop(cover_name)
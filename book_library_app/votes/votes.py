@@ -1,29 +1,48 @@
 from flask import jsonify, abort
 from webargs.flaskparser import use_args
+from sqlalchemy.exc import IntegrityError
 from book_library_app import db
-from book_library_app.models import Votes, VotesSchema, votes_schema
+from book_library_app.models import Book, Votes, VotesSchema, votes_schema
 from book_library_app.votes import votes_bp
+from book_library_app.serializers import get_serializer
+from book_library_app.bulk import (
+    load_bulk_items,
+    get_bulk_rows,
+    insert_many,
+    get_bulk_errors,
+)
 from book_library_app.utils import (
     get_schema_args,
+    get_eager_options,
+    get_load_options,
     apply_order,
     apply_filter,
     get_pagination,
     token_required,
-    calculate_stats,
+    apply_vote_delta,
+    apply_vote_deltas,
+    conditional_response,
+    bump_table_versions,
     validate_json_content_type,
 )
 
 
 @votes_bp.route("/votes", methods=["GET"])
+@conditional_response(Votes)
 def get_votes():
     """Querry table Votes and returns data as json"""
-    query = Votes.query
+    schema_args = get_schema_args(Votes)
+    serializer = get_serializer(VotesSchema, **schema_args)
+    schema = serializer.schema
+
+    query = Votes.query.options(
+        *get_load_options(Votes, schema), *get_eager_options(Votes, schema)
+    )
     query = apply_order(Votes, query)
     query = apply_filter(Votes, query)
     items, pagination = get_pagination(query, "votes.get_votes")
 
-    schema_args = get_schema_args(Votes)
-    books = VotesSchema(**schema_args).dump(items)
+    books = serializer.dump(items)
 
     return jsonify(
         {
@@ -35,11 +54,23 @@ def get_votes():
 
 
 @votes_bp.route("/vote/<int:book_id>", methods=["GET"])
+@conditional_response(Votes)
 def get_vote(book_id):
+    schema_args = get_schema_args(Votes)
+    serializer = get_serializer(VotesSchema, **schema_args)
+    schema = serializer.schema
 
-    votes_list = Votes.query.filter(Votes.book_id == book_id).all()
+    query = Votes.query.options(*get_load_options(Votes, schema))
+    query = query.filter(Votes.book_id == book_id)
+    query = apply_order(Votes, query)
+    query = apply_filter(Votes, query)
+    items, pagination = get_pagination(query, "votes.get_vote")
 
-    return jsonify({"data": votes_schema.dump(votes_list, many=True)})
+    votes = serializer.dump(items)
+
+    return jsonify(
+        {"data": votes, "numbers_of_records": len(votes), "pagination": pagination}
+    )
 
 
 @votes_bp.route("/vote", methods=["POST"])
@@ -55,9 +86,16 @@ def create_vote(user_id: int, args: dict):
     ).first():
         abort(409, description=("User already add comment on this book"))
 
-    db.session.add(vote)
-    db.session.commit()
-    calculate_stats([vote.book_id])
+    try:
+        # book is checked first so only unique index of votes can fail
+        apply_vote_delta(vote.book_id, points_delta=vote.points or 0, votes_delta=1)
+        db.session.add(vote)
+        bump_table_versions(Votes)
+        db.session.commit()
+    except IntegrityError:
+        # vote of the same user sent at the same time was saved first
+        db.session.rollback()
+        abort(409, description=("User already add comment on this book"))
 
     return jsonify(
         {
@@ -66,6 +104,67 @@ def create_vote(user_id: int, args: dict):
     )
 
 
+@votes_bp.route("/vote/bulk", methods=["POST"])
+@token_required
+@validate_json_content_type
+def create_votes(user_id: int):
+    """Create list of votes of the user in one transaction, stats of every
+    touched book are updated once. Invalid items are returned in errors"""
+    items, errors = load_bulk_items(VotesSchema(many=True))
+    items = [(index, dict(item, user_id=user_id)) for index, item in items]
+    items = get_bulk_rows(Votes, items, errors)
+
+    books_ids = {row["book_id"] for _, row in items}
+    existing_books = {
+        book_id
+        for (book_id,) in db.session.query(Book.id).filter(Book.id.in_(books_ids))
+    }
+    # books voted by the user are found with one query, new votes are added to it
+    voted = {
+        book_id
+        for (book_id,) in db.session.query(Votes.book_id).filter(
+            Votes.user_id == user_id, Votes.book_id.in_(books_ids)
+        )
+    }
+    rows, deltas = [], {}
+    for index, row in items:
+        book_id = row["book_id"]
+        if book_id not in existing_books:
+            errors[index] = {"book_id": [f"Book with id: {book_id} not found"]}
+            continue
+        if book_id in voted:
+            errors[index] = {"book_id": ["User already add comment on this book"]}
+            continue
+        voted.add(book_id)
+        rows.append(row)
+        points, votes = deltas.get(book_id, (0, 0))
+        deltas[book_id] = (points + (row["points"] or 0), votes + 1)
+
+    try:
+        ids = insert_many(Votes, rows)
+        if rows:
+            apply_vote_deltas(deltas)
+            bump_table_versions(Votes)
+        db.session.commit()
+    except IntegrityError:
+        # votes of the same user sent at the same time were saved first
+        db.session.rollback()
+        abort(409, description="Votes could not be saved, nothing has been changed")
+    for row, comment_id in zip(rows, ids):
+        row["comment_id"] = comment_id
+
+    return (
+        jsonify(
+            {
+                "data": votes_schema.dump(rows, many=True),
+                "numbers_of_records": len(rows),
+                "errors": get_bulk_errors(errors),
+            }
+        ),
+        201,
+    )
+
+
 @votes_bp.route("/vote/<int:comment_id>", methods=["PUT"])
 @token_required
 @validate_json_content_type
@@ -79,19 +178,18 @@ def edit_comment(user_id: int, args: dict, comment_id: int):
     if user_id != vote.user_id:
         abort(409, description="This comment do not belong to this user")
 
+    points_delta = (args["points"] or 0) - (vote.points or 0)
     vote.points = args["points"]
-    args["comment_text"]
     vote.comment_text = args["comment_text"]
 
+    apply_vote_delta(vote.book_id, points_delta=points_delta)
+    bump_table_versions(Votes)
     db.session.commit()
-    calculate_stats([vote.book_id])
 
-    return (
-        jsonify(
-            {
-                "data": votes_schema.dump(vote),
-            }
-        ),
+    return jsonify(
+        {
+            "data": votes_schema.dump(vote),
+        }
     )
 
 
@@ -108,8 +206,8 @@ def delete_comment(user_id: int, args: dict, comment_id: int):
         abort(409, description="This comment do not belong to this user")
 
     db.session.delete(vote)
+    apply_vote_delta(vote.book_id, points_delta=-(vote.points or 0), votes_delta=-1)
+    bump_table_versions(Votes)
     db.session.commit()
 
-    calculate_stats([vote.book_id])
-
-    return (jsonify({"data": "Data has been deleted", "book_id": vote.book_id}),)
+    return jsonify({"data": "Data has been deleted", "book_id": vote.book_id})
@@ -27,7 +27,90 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     # variable with number of records in site using pagination
     PER_PAGE = 5
+    # max number of books included in every author, all are in /authors/<id>/books
+    AUTHOR_BOOKS_PREVIEW = 5
+    # how total number of records is computed: exact, skip, estimate or cached
+    PAGINATION_COUNT = "exact"
+    PAGINATION_COUNT_CACHE_TTL = 60
+    PAGINATION_COUNT_CACHE_SIZE = 1024
+    # shared S3 client connection pool size and timeouts in seconds
+    S3_MAX_POOL_CONNECTIONS = 10
+    S3_CONNECT_TIMEOUT = 5
+    S3_READ_TIMEOUT = 10
+    # presigned cover links are valid for COVER_LINK_EXPIRATION seconds and cached
+    # until less than COVER_LINK_MIN_TTL seconds are left
+    COVER_LINK_EXPIRATION = 300
+    COVER_LINK_MIN_TTL = 60
+    COVER_LINK_CACHE_SIZE = 4096
     JWT_EXPIRED_MINUTES = 15
+    # number of verified tokens kept in memory until their exp
+    JWT_CACHE_SIZE = 4096
+    # refresh tokens are exchanged for new access tokens without password, every
+    # process reloads revoked refresh tokens every REFRESH_TOKEN_SYNC_INTERVAL seconds
+    REFRESH_TOKEN_EXPIRED_DAYS = 30
+    REFRESH_TOKEN_SYNC_INTERVAL = 10
+    # revoked access tokens are recorded in database and kept by every process in
+    # a Bloom filter, loaded every TOKEN_REVOCATION_SYNC_INTERVAL seconds and
+    # rebuilt without expired revocations every TOKEN_REVOCATION_REBUILD_INTERVAL
+    TOKEN_REVOCATION_SYNC_INTERVAL = 5
+    TOKEN_REVOCATION_REBUILD_INTERVAL = 600
+    TOKEN_REVOCATION_FILTER_CAPACITY = 100000
+    TOKEN_REVOCATION_FILTER_ERROR_RATE = 0.001
+    # passwords are hashed with pbkdf2, hashes made with other algorithm or number
+    # of iterations are replaced on login
+    PASSWORD_HASH_ALGORITHM = "sha256"
+    PASSWORD_HASH_ITERATIONS = 260000
+    PASSWORD_SALT_LENGTH = 16
+    # processes hashing passwords (None - number of CPUs, 0 - in request thread),
+    # when PASSWORD_HASH_QUEUE_SIZE more hashes wait for longer than
+    # PASSWORD_HASH_QUEUE_TIMEOUT seconds requests get 503 with Retry-After
+    PASSWORD_HASH_WORKERS = None
+    PASSWORD_HASH_QUEUE_SIZE = 8
+    PASSWORD_HASH_QUEUE_TIMEOUT = 1
+    PASSWORD_HASH_RETRY_AFTER = 1
+    # json library used for responses: orjson or json, json is used when orjson
+    # is not installed
+    JSON_BACKEND = "orjson"
+    # cache of GET responses: memory (per process), sqlite (file shared by workers)
+    # or None, entries are evicted after RESPONSE_CACHE_TTL seconds or when
+    # there is more than RESPONSE_CACHE_SIZE of them
+    RESPONSE_CACHE = "memory"
+    RESPONSE_CACHE_PATH = base_dir / "response_cache.db"
+    RESPONSE_CACHE_SIZE = 1024
+    RESPONSE_CACHE_TTL = 300
+    # ?q= search: auto uses full text index of the database, like scans tables
+    SEARCH_BACKEND = "auto"
+    # how often in seconds /suggest checks if other workers changed titles or names
+    SUGGEST_REFRESH_INTERVAL = 5
+    SUGGEST_MAX_LIMIT = 50
+    # the most items accepted by one request to /bulk endpoints
+    BULK_MAX_ITEMS = 10000
+    # /export reads rows from database and sends them in batches of this size,
+    # gzip is used when client accepts it
+    EXPORT_BATCH_SIZE = 1000
+    EXPORT_GZIP_LEVEL = 6
+    # outgoing emails are queued in database and sent by MAIL_QUEUE_WORKERS
+    # threads of every process which reuse up to MAIL_POOL_SIZE SMTP connections
+    MAIL_SERVER = os.environ.get("MAIL_SERVER", "smtp.gmail.com")
+    MAIL_PORT = int(os.environ.get("MAIL_PORT", 465))
+    MAIL_USE_SSL = True
+    MAIL_USE_TLS = False
+    MAIL_USERNAME = os.environ.get("sender_email")
+    MAIL_PASSWORD = os.environ.get("email_password")
+    MAIL_SENDER = os.environ.get("sender_email")
+    MAIL_TIMEOUT = 10
+    MAIL_QUEUE_WORKERS = 2
+    MAIL_POOL_SIZE = 2
+    MAIL_CONNECTION_MAX_IDLE = 60
+    # workers check queue every MAIL_POLL_INTERVAL seconds and take MAIL_BATCH_SIZE
+    # emails for MAIL_LEASE seconds, failed emails are retried after
+    # MAIL_RETRY_DELAY seconds doubled by every attempt
+    MAIL_POLL_INTERVAL = 5
+    MAIL_BATCH_SIZE = 20
+    MAIL_LEASE = 300
+    MAIL_MAX_ATTEMPTS = 5
+    MAIL_RETRY_DELAY = 30
+    MAIL_RETRY_MAX_DELAY = 3600
 
 
 class DevelpmentConfig(Config):
@@ -50,6 +133,11 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{DB_FILE_PATH}"
     DEBUG = True
     TESTING = True
+    # queued emails are sent by tests with MailQueue.process_due
+    MAIL_QUEUE_WORKERS = 0
+    # cheap hashing in request thread
+    PASSWORD_HASH_ITERATIONS = 1000
+    PASSWORD_HASH_WORKERS = 0
 
 
 config = {"development": DevelpmentConfig, "testing": TestingConfig}
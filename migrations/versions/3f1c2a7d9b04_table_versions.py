@@ -0,0 +1,35 @@
+"""table versions for conditional requests
+
+Revision ID: 3f1c2a7d9b04
+Revises: 6922015a92e3
+Create Date: 2022-05-10 18:12:41.532811
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b04'
+down_revision = '6922015a92e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_versions = op.create_table('table_versions',
+    sa.Column('table_name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    now = datetime.utcnow()
+    op.bulk_insert(table_versions, [
+        {'table_name': table_name, 'version': 0, 'updated_at': now}
+        for table_name in ('authors', 'books', 'votes')
+    ])
+
+
+def downgrade():
+    op.drop_table('table_versions')
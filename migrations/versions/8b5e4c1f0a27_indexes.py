@@ -0,0 +1,83 @@
+"""indexes for filter, sort and join columns
+
+Revision ID: 8b5e4c1f0a27
+Revises: 3f1c2a7d9b04
+Create Date: 2022-05-14 11:47:05.218374
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b5e4c1f0a27'
+down_revision = '3f1c2a7d9b04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # only the first vote of a user for a book is kept, stats of books which
+    # lost votes and of their authors are recomputed
+    connection = op.get_bind()
+    duplicated = (
+        "SELECT user_id, book_id FROM votes "
+        "WHERE user_id IS NOT NULL AND book_id IS NOT NULL "
+        "GROUP BY user_id, book_id HAVING COUNT(*) > 1"
+    )
+    books_ids = sorted({
+        book_id for _, book_id in connection.execute(sa.text(duplicated))
+    })
+    if books_ids:
+        remove_duplicated_votes(connection, books_ids)
+    op.create_index('ix_votes_user_id_book_id', 'votes', ['user_id', 'book_id'], unique=True)
+    op.create_index(op.f('ix_votes_book_id'), 'votes', ['book_id'], unique=False)
+    op.create_index(op.f('ix_books_author_id'), 'books', ['author_id'], unique=False)
+    op.create_index(op.f('ix_books_title'), 'books', ['title'], unique=False)
+    op.create_index(op.f('ix_books_average_book_score'), 'books', ['average_book_score'], unique=False)
+    op.create_index(op.f('ix_authors_birth_date'), 'authors', ['birth_date'], unique=False)
+    op.create_index(op.f('ix_hash_reset_hash_code'), 'hash_reset', ['hash_code'], unique=False)
+
+
+def remove_duplicated_votes(connection, books_ids):
+    connection.execute(sa.text(
+        "DELETE FROM votes WHERE user_id IS NOT NULL AND book_id IS NOT NULL "
+        "AND comment_id NOT IN (SELECT MIN(comment_id) FROM votes "
+        "GROUP BY user_id, book_id)"
+    ))
+    books = sa.bindparam('books_ids', books_ids, expanding=True)
+    connection.execute(sa.text(
+        "UPDATE books SET "
+        "number_of_votes = (SELECT COUNT(votes.comment_id) FROM votes "
+        "WHERE votes.book_id = books.id), "
+        "score_sum = (SELECT COALESCE(SUM(votes.points), 0) FROM votes "
+        "WHERE votes.book_id = books.id), "
+        "average_book_score = (SELECT CASE WHEN COUNT(votes.comment_id) > 0 "
+        "THEN CAST(COALESCE(SUM(votes.points), 0) AS FLOAT) / COUNT(votes.comment_id) "
+        "ELSE 0 END FROM votes WHERE votes.book_id = books.id) "
+        "WHERE books.id IN :books_ids"
+    ).bindparams(books))
+    # authors are updated after books so their scores use recomputed book scores
+    connection.execute(sa.text(
+        "UPDATE authors SET author_average_score = ("
+        "SELECT COALESCE(AVG(COALESCE(books.average_book_score, 0)), 0) FROM books "
+        "WHERE books.author_id = authors.id) "
+        "WHERE authors.id IN (SELECT books.author_id FROM books "
+        "WHERE books.id IN :books_ids)"
+    ).bindparams(books))
+    # cached responses of changed tables are not valid anymore
+    connection.execute(sa.text(
+        "UPDATE table_versions SET version = version + 1, updated_at = :now "
+        "WHERE table_name IN ('authors', 'books', 'votes')"
+    ), {'now': datetime.utcnow()})
+
+
+def downgrade():
+    op.drop_index(op.f('ix_hash_reset_hash_code'), table_name='hash_reset')
+    op.drop_index(op.f('ix_authors_birth_date'), table_name='authors')
+    op.drop_index(op.f('ix_books_average_book_score'), table_name='books')
+    op.drop_index(op.f('ix_books_title'), table_name='books')
+    op.drop_index(op.f('ix_books_author_id'), table_name='books')
+    op.drop_index(op.f('ix_votes_book_id'), table_name='votes')
+    op.drop_index('ix_votes_user_id_book_id', table_name='votes')
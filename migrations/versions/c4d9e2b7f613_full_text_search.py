@@ -0,0 +1,70 @@
+"""full text search of books and authors
+
+Revision ID: c4d9e2b7f613
+Revises: 8b5e4c1f0a27
+Create Date: 2022-05-21 16:03:27.904112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d9e2b7f613'
+down_revision = '8b5e4c1f0a27'
+branch_labels = None
+depends_on = None
+
+AUTHOR_NAME = "authors.first_name || ' ' || authors.last_name"
+
+
+def upgrade():
+    # search columns are not in models, they are maintained by book_library_app.search
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.add_column('books', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.add_column('authors', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute(
+            "UPDATE authors SET search_vector = "
+            f"to_tsvector('english', {AUTHOR_NAME})"
+        )
+        op.execute(
+            "UPDATE books SET search_vector = "
+            "setweight(to_tsvector('english', books.title), 'A') || "
+            f"setweight(to_tsvector('english', {AUTHOR_NAME}), 'A') || "
+            "setweight(to_tsvector('english', books.description), 'C') "
+            "FROM authors WHERE authors.id = books.author_id"
+        )
+        op.create_index('ix_books_search_vector', 'books', ['search_vector'], postgresql_using='gin')
+        op.create_index('ix_authors_search_vector', 'authors', ['search_vector'], postgresql_using='gin')
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE books_search USING fts5(title, description, "
+            "author, author_id UNINDEXED, tokenize='porter unicode61')"
+        )
+        op.execute(
+            "CREATE VIRTUAL TABLE authors_search USING fts5(name, "
+            "tokenize='porter unicode61')"
+        )
+        op.execute(
+            "INSERT INTO authors_search (rowid, name) "
+            f"SELECT authors.id, {AUTHOR_NAME} FROM authors"
+        )
+        op.execute(
+            "INSERT INTO books_search (rowid, title, description, author, author_id) "
+            f"SELECT books.id, books.title, books.description, {AUTHOR_NAME}, "
+            "books.author_id FROM books JOIN authors ON authors.id = books.author_id"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_authors_search_vector', table_name='authors')
+        op.drop_index('ix_books_search_vector', table_name='books')
+        op.drop_column('authors', 'search_vector')
+        op.drop_column('books', 'search_vector')
+    elif dialect == 'sqlite':
+        op.execute("DROP TABLE authors_search")
+        op.execute("DROP TABLE books_search")
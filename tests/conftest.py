@@ -1,6 +1,17 @@
+import email
+import threading
+import socketserver
 import pytest
+from sqlalchemy import event
 from book_library_app import create_app, db
 from book_library_app.commands.db_manage_commands import add_data
+from book_library_app.utils import reset_boto3_client
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "explain: query plans checks, fail on sequential scans"
+    )
 
 
 @pytest.fixture
@@ -48,3 +59,111 @@ def sample_data(app):
 @pytest.fixture
 def author():
     return {"first_name": "George", "last_name": "Orwell", "birth_date": "25-06-1903"}
+
+
+@pytest.fixture
+def s3_credentials(monkeypatch):
+    # presigned links are signed locally so fake credentials are enough
+    monkeypatch.setenv("S3_KEY", "testing")
+    monkeypatch.setenv("S3_SECRET", "testing")
+    monkeypatch.setenv("S3_BUCKET", "booklibraryimagebucket")
+    monkeypatch.setenv("signature_version", "s3v4")
+    reset_boto3_client()
+    yield
+    reset_boto3_client()
+
+
+@pytest.fixture
+def sql_statements(app):
+    """List of SQL statements and COMMITs executed during the test"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def commit(conn):
+        statements.append("COMMIT")
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "commit", commit)
+
+    yield statements
+
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    event.remove(engine, "commit", commit)
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """The smallest part of SMTP used by smtplib: login, sending and closing"""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 localhost ESMTP stand-in")
+        data = None
+        for line in self.rfile:
+            if data is not None:
+                if line.rstrip(b"\r\n") == b".":
+                    server.messages.append(email.message_from_bytes(b"".join(data)))
+                    data = None
+                    self.reply("250 OK")
+                else:
+                    data.append(line)
+                continue
+
+            command = line.decode().split(" ")[0].strip().upper()
+            if command == "EHLO":
+                self.reply("250-localhost")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif command == "AUTH":
+                self.reply("235 Authentication successful")
+            elif command == "MAIL" and server.failures:
+                server.failures -= 1
+                self.reply("451 Try again later")
+            elif command == "DATA":
+                data = []
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        # number of next emails rejected with temporary error
+        self.failures = 0
+
+
+@pytest.fixture
+def smtp_server(app):
+    """Local SMTP server which keeps received messages, app sends emails to it"""
+    server = SMTPStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    app.config.update(
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=server.server_address[1],
+        MAIL_USE_SSL=False,
+        MAIL_USERNAME="sender@test.com",
+        MAIL_PASSWORD="password",
+        MAIL_SENDER="sender@test.com",
+    )
+
+    yield server
+
+    app.extensions["mail_queue"].stop()
+    server.shutdown()
+    server.server_close()
@@ -1,5 +1,21 @@
+import time
+import jwt
 import pytest
+from datetime import datetime, timedelta
 from flask import Flask
+from werkzeug.security import generate_password_hash
+from book_library_app import db
+from book_library_app.models import (
+    HashResetTable,
+    OutgoingEmail,
+    RefreshToken,
+    RevokedToken,
+    User,
+)
+from book_library_app.utils import jwt_cache
+from book_library_app.refresh_tokens import get_token_hash
+from book_library_app.revocations import BloomFilter
+from book_library_app.mail_queue import queue_email
 
 
 def test_app(app):
@@ -110,3 +126,396 @@ def test_get_current_user_missing_token(client):
     assert response.headers["Content-Type"] == "application/json"
 
     assert "data" not in response_data
+
+
+def send_recovery_email(client, email: str):
+    return client.post("/api/v1/auth/reset/password", json={"email": email})
+
+
+def test_recovery_email_is_queued(app, client, user, smtp_server):
+    response = send_recovery_email(client, user["email"])
+
+    assert response.status_code == 200
+    # nothing is sent during request
+    assert smtp_server.connections == 0
+    with app.app_context():
+        email = OutgoingEmail.query.one()
+        assert (email.recipient, email.status) == (user["email"], "pending")
+        hash_code = HashResetTable.query.one().hash_code
+
+        assert app.extensions["mail_queue"].process_due() == 1
+        assert OutgoingEmail.query.one().status == "sent"
+
+    message = smtp_server.messages[0]
+    assert message["To"] == user["email"]
+    assert message["Subject"] == "Reset password request"
+    assert hash_code in message.get_payload()[0].get_payload()
+
+
+def test_queued_emails_share_smtp_connection(app, client, smtp_server):
+    for number in range(3):
+        send_recovery_email(client, f"user{number}@gmail.com")
+
+    with app.app_context():
+        assert app.extensions["mail_queue"].process_due() == 3
+
+    assert len(smtp_server.messages) == 3
+    assert smtp_server.connections == 1
+
+
+def test_queued_email_is_retried(app, client, smtp_server, monkeypatch):
+    monkeypatch.setitem(app.config, "MAIL_MAX_ATTEMPTS", 2)
+    mail_queue = app.extensions["mail_queue"]
+    smtp_server.failures = 1
+    send_recovery_email(client, "test@gmail.com")
+
+    with app.app_context():
+        mail_queue.process_due()
+        email = OutgoingEmail.query.one()
+        assert (email.status, email.attempts) == ("pending", 1)
+        assert email.next_attempt_at > datetime.utcnow()
+        assert "451" in email.last_error
+        # email is not due before backoff
+        assert mail_queue.process_due() == 0
+
+        email.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        mail_queue.process_due()
+        assert OutgoingEmail.query.one().status == "sent"
+
+    smtp_server.failures = 2
+    send_recovery_email(client, "test@gmail.com")
+    with app.app_context():
+        mail_queue.process_due()
+        OutgoingEmail.query.update({OutgoingEmail.next_attempt_at: datetime.utcnow()})
+        db.session.commit()
+        mail_queue.process_due()
+        statuses = [email.status for email in OutgoingEmail.query.order_by("id")]
+        assert statuses == ["sent", "failed"]
+    assert len(smtp_server.messages) == 1
+
+
+def test_queued_email_with_other_error_fails(app, client, smtp_server, monkeypatch):
+    monkeypatch.setitem(app.config, "MAIL_MAX_ATTEMPTS", 1)
+
+    def build_message(*args):
+        raise UnicodeEncodeError("ascii", "ę", 0, 1, "ordinal not in range(128)")
+
+    monkeypatch.setattr("book_library_app.mail_queue.build_message", build_message)
+    send_recovery_email(client, "test@gmail.com")
+
+    with app.app_context():
+        assert app.extensions["mail_queue"].process_due() == 1
+        email = OutgoingEmail.query.one()
+        assert (email.status, email.attempts) == ("failed", 1)
+        assert "ascii" in email.last_error
+
+
+def test_queued_email_sent_by_worker(app, client, smtp_server, monkeypatch):
+    monkeypatch.setitem(app.config, "MAIL_QUEUE_WORKERS", 2)
+    send_recovery_email(client, "test@gmail.com")
+
+    for _ in range(100):
+        if smtp_server.messages:
+            break
+        time.sleep(0.05)
+    assert smtp_server.messages[0]["To"] == "test@gmail.com"
+
+
+def test_emails_queued_before_restart_are_sent(app, client, smtp_server, monkeypatch):
+    monkeypatch.setitem(app.config, "MAIL_QUEUE_WORKERS", 2)
+    with app.app_context():
+        queue_email("test@gmail.com", "Queued before restart")
+        db.session.commit()
+
+    # workers start on any request, not only when a new email is queued
+    client.get("/api/v1/books")
+    for _ in range(100):
+        if smtp_server.messages:
+            break
+        time.sleep(0.05)
+    assert smtp_server.messages[0]["To"] == "test@gmail.com"
+
+
+def test_verified_token_is_cached(client, token, monkeypatch):
+    decode_calls = []
+    decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decode_calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+    jwt_cache.clear()
+    hits = jwt_cache.hits
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for _ in range(3):
+        assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+    assert decode_calls == [token]
+    assert jwt_cache.hits - hits == 2
+
+    # the cache does not accept tokens with other signature
+    header, payload, signature = token.split(".")
+    headers = {"Authorization": f"Bearer {header}.{payload}.{signature[::-1]}"}
+    response = client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == 404
+    assert len(decode_calls) == 2
+
+
+def test_cached_token_expires(app, client, user, token, monkeypatch):
+    with app.app_context():
+        payload = jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])
+        payload["exp"] = int(time.time()) + 60
+        token = jwt.encode(payload, app.config["SECRET_KEY"])
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+    # clocks of the cache and of PyJWT are moved after exp
+    class Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(minutes=2)
+
+    later = time.monotonic() + 120
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    monkeypatch.setattr(jwt.api_jwt, "datetime", Later)
+    response = client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == 404
+    assert "expired" in response.get_json()["message"]
+
+
+def test_login_rehashes_password(app, client, user):
+    with app.app_context():
+        db_user = User.query.filter_by(username=user["username"]).one()
+        db_user.password = generate_password_hash(
+            user["password"], method="pbkdf2:sha1:500"
+        )
+        db.session.commit()
+
+    response = client.post(
+        "/api/v1/auth/login",
+        json={"username": user["username"], "password": user["password"]},
+    )
+
+    assert response.status_code == 200
+    with app.app_context():
+        password = User.query.filter_by(username=user["username"]).one().password
+        assert password.startswith("pbkdf2:sha256:1000$")
+
+
+@pytest.fixture
+def hashing_pool(app, monkeypatch):
+    monkeypatch.setitem(app.config, "PASSWORD_HASH_WORKERS", 1)
+    yield app.extensions["password_hasher"]
+    app.extensions["password_hasher"].shutdown()
+
+
+def test_passwords_hashed_in_pool(client, user, hashing_pool):
+    response = client.post(
+        "/api/v1/auth/login",
+        json={"username": user["username"], "password": "wrong password"},
+    )
+    assert response.status_code == 401
+    response = client.post(
+        "/api/v1/auth/login",
+        json={"username": user["username"], "password": user["password"]},
+    )
+    assert response.status_code == 200
+    assert hashing_pool.executor is not None
+
+
+def test_saturated_hashing_pool(app, client, user, hashing_pool, monkeypatch):
+    monkeypatch.setitem(app.config, "PASSWORD_HASH_QUEUE_SIZE", 0)
+    monkeypatch.setitem(app.config, "PASSWORD_HASH_QUEUE_TIMEOUT", 0.1)
+    hashing_pool.start()
+    # the only slot is taken by another request
+    hashing_pool.slots.acquire()
+
+    response = client.post(
+        "/api/v1/auth/login",
+        json={"username": user["username"], "password": user["password"]},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    hashing_pool.slots.release()
+    response = client.post(
+        "/api/v1/auth/login",
+        json={"username": user["username"], "password": user["password"]},
+    )
+    assert response.status_code == 200
+
+
+def login(client, user) -> dict:
+    response = client.post(
+        "/api/v1/auth/login",
+        json={"username": user["username"], "password": user["password"]},
+    )
+    return response.get_json()
+
+
+def test_refresh_token_rotation(app, client, user, monkeypatch):
+    tokens = login(client, user)
+
+    def no_hashing(*args):
+        raise AssertionError("password hashed")
+
+    monkeypatch.setattr(app.extensions["password_hasher"], "run", no_hashing)
+    response = client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 200
+    new_tokens = response.get_json()
+    assert new_tokens["refresh_token"] != tokens["refresh_token"]
+    headers = {"Authorization": f"Bearer {new_tokens['token']}"}
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+    # reused token revokes its family, also the token which replaced it
+    response = client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+    response = client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": new_tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+    with app.app_context():
+        record = RefreshToken.query.filter_by(
+            token_hash=get_token_hash(new_tokens["refresh_token"])
+        ).one()
+        assert record.revoked_at is not None
+
+
+def test_refresh_token_revoked_by_other_process(app, client, user, monkeypatch):
+    tokens = login(client, user)
+    monkeypatch.setitem(app.config, "REFRESH_TOKEN_SYNC_INTERVAL", 0)
+    with app.app_context():
+        RefreshToken.query.update({RefreshToken.revoked_at: datetime.utcnow()})
+        db.session.commit()
+
+    response = client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+    assert "revoked" in response.get_json()["message"]
+    assert app.extensions["revoked_refresh_tokens"].hashes
+
+
+def test_refresh_tokens_revoked_on_password_update(client, user):
+    tokens = login(client, user)
+    response = client.put(
+        "/api/v1/auth/update/password",
+        json={"current_password": user["password"], "new_password": "new password"},
+        headers={"Authorization": f"Bearer {tokens['token']}"},
+    )
+    assert response.status_code == 200
+
+    response = client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": "unknown"})
+    assert response.status_code == 401
+    assert "Invalid" in response.get_json()["message"]
+
+
+def test_logout(client, user):
+    tokens = login(client, user)
+    other_tokens = login(client, user)
+    headers = {"Authorization": f"Bearer {tokens['token']}"}
+
+    response = client.post(
+        "/api/v1/auth/logout",
+        json={"refresh_token": tokens["refresh_token"]},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    response = client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == 404
+    assert "revoked" in response.get_json()["message"]
+    response = client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+    # other sessions of the user are not affected
+    headers = {"Authorization": f"Bearer {other_tokens['token']}"}
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+
+def test_logout_all(client, user):
+    tokens = [login(client, user) for _ in range(2)]
+    headers = {"Authorization": f"Bearer {tokens[0]['token']}"}
+
+    response = client.post("/api/v1/auth/logout/all", headers=headers)
+    assert response.status_code == 200
+
+    for revoked in tokens:
+        headers = {"Authorization": f"Bearer {revoked['token']}"}
+        assert client.get("/api/v1/auth/me", headers=headers).status_code == 404
+        response = client.post(
+            "/api/v1/auth/refresh", json={"refresh_token": revoked["refresh_token"]}
+        )
+        assert response.status_code == 401
+    # tokens issued after revocation are valid
+    headers = {"Authorization": f"Bearer {login(client, user)['token']}"}
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+
+def test_logout_with_token_without_jti(app, client, user):
+    new_token = login(client, user)["token"]
+    with app.app_context():
+        payload = jwt.decode(new_token, app.config["SECRET_KEY"], algorithms=["HS256"])
+        # tokens issued before jti was added
+        old_token = jwt.encode(
+            {"user_id": payload["user_id"], "exp": payload["exp"]},
+            app.config["SECRET_KEY"],
+        )
+    headers = {"Authorization": f"Bearer {old_token}"}
+
+    assert client.post("/api/v1/auth/logout", headers=headers).status_code == 200
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 404
+    headers = {"Authorization": f"Bearer {new_token}"}
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+
+def test_not_revoked_token_checked_in_memory(client, user, token, sql_statements):
+    client.post("/api/v1/auth/logout", headers={"Authorization": f"Bearer {token}"})
+    headers = {"Authorization": f"Bearer {login(client, user)['token']}"}
+    sql_statements.clear()
+
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+    assert not [
+        statement for statement in sql_statements if "revoked_tokens" in statement
+    ]
+
+
+def test_token_revoked_by_other_process(app, client, user, token, monkeypatch):
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+    monkeypatch.setitem(app.config, "TOKEN_REVOCATION_SYNC_INTERVAL", 0)
+    with app.app_context():
+        payload = jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])
+        db.session.add(
+            RevokedToken(
+                kind="token",
+                key=payload["jti"],
+                expires_at=datetime.utcfromtimestamp(payload["exp"]),
+            )
+        )
+        db.session.commit()
+
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 404
+
+
+def test_bloom_filter():
+    bloom_filter = BloomFilter(1000, 0.01)
+    for number in range(1000):
+        bloom_filter.add(f"revoked{number}")
+
+    assert all(f"revoked{number}" in bloom_filter for number in range(1000))
+    false_positives = sum(f"valid{number}" in bloom_filter for number in range(10000))
+    assert false_positives < 300
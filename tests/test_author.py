@@ -9,6 +9,7 @@ def test_get_authors_no_records(client):
         "pagination": {
             "total_pages": 0,
             "total_records": 0,
+            "count_strategy": "exact",
             "current_page": "/api/v1/authors?page=1",
         },
     }
@@ -30,6 +31,7 @@ def test_get_authors(client, sample_data):
     assert response_data["pagination"] == {
         "total_pages": 2,
         "total_records": 10,
+        "count_strategy": "exact",
         "current_page": "/api/v1/authors?page=1",
         "next_page": "/api/v1/authors?page=2",
     }
@@ -47,6 +49,7 @@ def test_get_authors_with_params(client, sample_data):
     assert response_data["pagination"] == {
         "total_pages": 5,
         "total_records": 10,
+        "count_strategy": "exact",
         "current_page": "/api/v1/authors?page=2&fields=first_name&sort=-id&limit=2",
         "next_page": "/api/v1/authors?page=3&fields=first_name&sort=-id&limit=2",
         "previous_page": "/api/v1/authors?page=1&fields=first_name&sort=-id&limit=2",
@@ -139,3 +142,221 @@ def test_add_author_missing_token(client, author):
     assert response.headers["Content-Type"] == "application/json"
     assert response_data["success"] is False
     assert "data" not in response_data
+
+
+@pytest.mark.parametrize(
+    "sort", ["id", "-id", "-birth_date,first_name", "last_name,-id", "-id,last_name"]
+)
+def test_get_authors_cursor_pagination(client, sample_data, sort):
+    response = client.get(f"api/v1/authors?sort={sort}&limit=10")
+    expected_ids = [author["id"] for author in response.get_json()["data"]]
+
+    pages = []
+    url = f"api/v1/authors?sort={sort}&limit=3&cursor="
+    while url:
+        response = client.get(url)
+        response_data = response.get_json()
+
+        assert response.status_code == 200
+        assert "total_records" not in response_data["pagination"]
+        pages.append([author["id"] for author in response_data["data"]])
+        url = response_data["pagination"].get("next_page")
+
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    assert sum(pages, []) == expected_ids
+
+    # walk back from the last page
+    for page in reversed(pages[:-1]):
+        response = client.get(response_data["pagination"]["previous_page"])
+        response_data = response.get_json()
+        assert [author["id"] for author in response_data["data"]] == page
+
+    assert "previous_page" not in response_data["pagination"]
+
+
+def test_get_authors_invalid_cursor(client, sample_data):
+    response = client.get("api/v1/authors?cursor=abc")
+    response_data = response.get_json()
+
+    assert response.status_code == 400
+    assert response_data["success"] is False
+    assert response_data["message"] == "Invalid cursor"
+
+
+def test_get_authors_skip_count(client, app, sample_data):
+    app.config["PAGINATION_COUNT"] = "skip"
+    response = client.get("api/v1/authors?page=2&limit=5")
+    response_data = response.get_json()
+
+    assert response.status_code == 200
+    assert response_data["numbers_of_records"] == 5
+    assert response_data["pagination"] == {
+        "total_pages": None,
+        "total_records": None,
+        "count_strategy": "skip",
+        "current_page": "/api/v1/authors?page=2&limit=5",
+        "previous_page": "/api/v1/authors?page=1&limit=5",
+    }
+
+
+def test_get_authors_estimated_count_fallback(client, app, sample_data):
+    app.config["PAGINATION_COUNT"] = "estimate"
+    response = client.get("api/v1/authors")
+    response_data = response.get_json()
+
+    # planner estimates are available only on postgres
+    assert response_data["pagination"]["count_strategy"] == "exact"
+    assert response_data["pagination"]["total_records"] == 10
+
+
+def test_get_authors_cached_count(client, app, sample_data, token, author):
+    app.config["PAGINATION_COUNT"] = "cached"
+    response = client.get("api/v1/authors?last_name=Orwell&limit=1")
+    pagination = response.get_json()["pagination"]
+
+    assert pagination["count_strategy"] == "cached"
+    assert pagination["total_records"] == 1
+    assert "next_page" not in pagination
+
+    client.post(
+        "api/v1/authors", json=author, headers={"Authorization": f"Bearer {token}"}
+    )
+
+    # the same filters in different order and other page use cached count
+    response = client.get("api/v1/authors?limit=1&page=2&last_name=Orwell")
+    response_data = response.get_json()
+    assert response_data["pagination"]["total_records"] == 1
+    assert response_data["numbers_of_records"] == 1
+    assert "previous_page" in response_data["pagination"]
+
+
+def test_get_authors_cached_count_of_search(client, app, sample_data):
+    app.config["PAGINATION_COUNT"] = "cached"
+    response = client.get("api/v1/authors?q=Andrzej&limit=1")
+    assert response.get_json()["pagination"]["total_records"] == 1
+
+    # other search is counted on its own
+    response = client.get("api/v1/authors?q=Tolkien&limit=1")
+    pagination = response.get_json()["pagination"]
+    assert pagination["count_strategy"] == "cached"
+    assert pagination["total_records"] == 0
+
+
+@pytest.mark.parametrize("limit", [1, 5, 10])
+def test_get_authors_query_count(client, sample_data, sql_statements, limit):
+    response = client.get(f"api/v1/authors?limit={limit}")
+    response_data = response.get_json()
+
+    assert response.status_code == 200
+    assert len(response_data["data"]) == limit
+    # table versions, count, page and books of all authors on the page
+    assert len(sql_statements) == 4
+
+
+def test_get_authors_books_preview(client, app, sample_data, sql_statements):
+    app.config["AUTHOR_BOOKS_PREVIEW"] = 2
+    response = client.get("api/v1/authors?limit=10&include_books=1")
+    response_data = response.get_json()
+
+    assert response.status_code == 200
+    assert all(len(author["books"]) <= 1 for author in response_data["data"])
+    assert len(sql_statements) == 4
+
+    # preview can't be bigger than configured limit
+    response = client.get("api/v1/authors?limit=10&include_books=100")
+    books = [len(author["books"]) for author in response.get_json()["data"]]
+    assert max(books) == 2
+
+    response = client.get("api/v1/authors?limit=10&include_books=0")
+    assert all(author["books"] == [] for author in response.get_json()["data"])
+
+
+def test_get_author_books(client, sample_data):
+    response = client.get("api/v1/authors/1/books?limit=1&sort=-id")
+    response_data = response.get_json()
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/json"
+    assert response_data["number_of_records"] == 1
+    assert response_data["data"][0]["author_id"] == 1
+    assert "author" not in response_data["data"][0]
+    assert response_data["pagination"] == {
+        "total_pages": 2,
+        "total_records": 2,
+        "count_strategy": "exact",
+        "current_page": "/api/v1/authors/1/books?page=1&limit=1&sort=-id",
+        "next_page": "/api/v1/authors/1/books?page=2&limit=1&sort=-id",
+    }
+
+
+def test_get_author_if_modified_since(client, sample_data):
+    response = client.get("api/v1/authors/1")
+    last_modified = response.headers["Last-Modified"]
+
+    response = client.get(
+        "api/v1/authors/1", headers={"If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
+
+    # ETag is checked before date
+    response = client.get(
+        "api/v1/authors/1",
+        headers={"If-Modified-Since": last_modified, "If-None-Match": '"old"'},
+    )
+    assert response.status_code == 200
+
+
+def test_get_wrong_single_author_has_no_etag(client):
+    response = client.get("api/v1/authors/1")
+
+    assert response.status_code == 404
+    assert "ETag" not in response.headers
+
+
+def test_search_authors(client, sample_data, token):
+    response = client.get("api/v1/authors?q=Andrzej")
+    response_data = response.get_json()
+
+    assert response.status_code == 200
+    assert [author["last_name"] for author in response_data["data"]] == ["Sapkowski"]
+
+    client.delete("api/v1/authors/9", headers={"Authorization": f"Bearer {token}"})
+    response = client.get("api/v1/authors?q=Andrzej")
+    assert response.get_json()["data"] == []
+
+
+def test_create_authors_bulk(client, token, author):
+    authors = [
+        author,
+        {"first_name": "Aldous", "last_name": "Huxley"},
+        {"first_name": "Ray", "last_name": "Bradbury", "birth_date": "22-08-1920"},
+    ]
+    response = client.post(
+        "/api/v1/authors/bulk",
+        json=authors,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    response_data = response.get_json()
+
+    assert response.status_code == 201
+    assert response_data["number_of_records"] == 2
+    assert [item["id"] for item in response_data["data"]] == [1, 2]
+    assert response_data["data"][1]["last_name"] == "Bradbury"
+    assert response_data["errors"] == [
+        {"index": 1, "errors": {"birth_date": ["Missing data for required field."]}}
+    ]
+
+    response = client.get("/api/v1/authors/2")
+    assert response.get_json()["data"]["birth_date"] == "22-08-1920"
+    response = client.get("/api/v1/authors?q=bradbury")
+    assert [item["id"] for item in response.get_json()["data"]] == [2]
+
+
+@pytest.mark.parametrize("data", [{"first_name": "George"}, [{}] * 3])
+def test_create_authors_bulk_invalid_body(client, token, app, monkeypatch, data):
+    monkeypatch.setitem(app.config, "BULK_MAX_ITEMS", 2)
+    response = client.post(
+        "/api/v1/authors/bulk", json=data, headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 400
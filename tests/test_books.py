@@ -0,0 +1,406 @@
+import time
+import pytest
+from book_library_app import db, utils
+from book_library_app.models import Book
+from book_library_app.response_cache import (
+    ResponseCache,
+    SQLiteResponseCache,
+    init_response_cache,
+)
+
+
+def test_get_single_book(client, sample_data, s3_credentials):
+    response = client.get("/api/v1/books/1")
+    response_data = response.get_json()
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/json"
+
+    assert response_data["data"]["title"] == "Animal Farm"
+    assert response_data["data"]["author"]["last_name"] == "Orwell"
+    assert "cover1.jpg" in response_data["data"]["cover_name"]
+
+
+def test_get_single_book_is_pure_read(
+    client, sample_data, s3_credentials, sql_statements
+):
+    response = client.get("/api/v1/books/1")
+
+    assert response.status_code == 200
+    # table versions for ETag and the book with its author
+    assert len(sql_statements) == 2
+    assert all(statement.startswith("SELECT") for statement in sql_statements)
+
+
+def test_get_wrong_single_book(client):
+    response = client.get("/api/v1/books/60")
+    response_data = response.get_json()
+
+    assert response.status_code == 404
+    assert response.headers["Content-Type"] == "application/json"
+    assert response_data["success"] is False
+
+
+def test_get_books_cursor_pagination_nullable_sort(client, sample_data, app):
+    with app.app_context():
+        Book.query.filter(Book.id.in_([2, 5, 6])).update(
+            {Book.average_book_score: None}, synchronize_session=False
+        )
+        db.session.commit()
+
+    for sort in ["average_book_score", "-average_book_score"]:
+        response = client.get(f"/api/v1/books?sort={sort},id&limit=20")
+        expected_ids = [book["id"] for book in response.get_json()["data"]]
+
+        ids = []
+        url = f"/api/v1/books?sort={sort}&limit=4&fields=id&cursor="
+        while url:
+            response_data = client.get(url).get_json()
+            ids += [book["id"] for book in response_data["data"]]
+            url = response_data["pagination"].get("next_page")
+
+        assert sorted(ids) == sorted(expected_ids)
+        assert len(ids) == len(set(ids))
+        # null is the greatest value
+        nulls = ids[-3:] if sort == "average_book_score" else ids[:3]
+        assert nulls == [2, 5, 6]
+
+
+def test_s3_client_is_shared(app, s3_credentials):
+    with app.app_context():
+        client = utils.get_boto3_client()
+        assert utils.get_boto3_client() is client
+
+        # after fork the client is created again
+        utils.reset_boto3_client()
+        assert utils.get_boto3_client() is not client
+
+
+@pytest.fixture
+def signed_links(app, s3_credentials, monkeypatch):
+    """Cover names signed by S3 client, responses are not cached so every request
+    gets its links"""
+    utils.cover_link_cache.clear()
+    app.extensions["response_cache"] = None
+    with app.app_context():
+        client = utils.get_boto3_client()
+    signed = []
+    generate_presigned_url = client.generate_presigned_url
+
+    def counting_generate_presigned_url(method, Params, **kwargs):
+        signed.append(Params["Key"])
+        return generate_presigned_url(method, Params=Params, **kwargs)
+
+    monkeypatch.setattr(
+        client, "generate_presigned_url", counting_generate_presigned_url
+    )
+    return signed
+
+
+def test_get_books_cover_links_are_cached(client, sample_data, signed_links):
+    response = client.get("/api/v1/books?fields=id,cover_name&limit=3")
+    response_data = response.get_json()
+
+    assert response.status_code == 200
+    assert signed_links == ["cover1.jpg", "cover2.jpg", "cover3.jpg"]
+    assert "X-Amz-Signature" in response_data["data"][0]["cover_name"]
+
+    response = client.get("/api/v1/books?fields=id,cover_name&limit=3")
+    assert response.get_json()["data"] == response_data["data"]
+    assert len(signed_links) == 3
+
+
+def test_cover_link_refreshed_before_expiration(app, client, sample_data, signed_links):
+    app.config["COVER_LINK_MIN_TTL"] = 300
+
+    client.get("/api/v1/books/1")
+    client.get("/api/v1/books/1")
+
+    assert signed_links == ["cover1.jpg", "cover1.jpg"]
+
+
+def test_invalidated_cover_link_is_signed_again(app, client, sample_data, signed_links):
+    client.get("/api/v1/books/1")
+    with app.app_context():
+        utils.invalidate_book_cover_link("cover1.jpg")
+    client.get("/api/v1/books/1")
+
+    assert signed_links == ["cover1.jpg", "cover1.jpg"]
+
+
+@pytest.mark.parametrize("limit", [1, 5, 14])
+def test_get_books_query_count(client, sample_data, sql_statements, limit):
+    response = client.get(f"/api/v1/books?limit={limit}")
+    response_data = response.get_json()
+
+    assert response.status_code == 200
+    assert len(response_data["data"]) == limit
+    assert all("last_name" in book["author"] for book in response_data["data"])
+    # table versions, count and page with joined authors
+    assert len(sql_statements) == 3
+
+
+def test_get_books_fields_projection(client, sample_data, sql_statements):
+    response = client.get("/api/v1/books?fields=id,title&sort=-number_of_pages")
+    response_data = response.get_json()
+
+    assert response.status_code == 200
+    assert set(response_data["data"][0]) == {"id", "title"}
+    page_statement = next(
+        statement for statement in sql_statements if "LIMIT" in statement
+    )
+    assert "books.title" in page_statement
+    assert "books.number_of_pages" in page_statement
+    assert "books.description" not in page_statement
+    assert "authors" not in page_statement
+
+
+def test_get_books_cursor_with_projection(client, sample_data, sql_statements):
+    response = client.get("/api/v1/books?fields=title&sort=number_of_pages&cursor=")
+    response = client.get(response.get_json()["pagination"]["next_page"])
+
+    assert response.status_code == 200
+    # sort keys needed for the next cursor are selected with the page
+    assert len(sql_statements) == 4
+
+
+def test_get_books_not_modified(client, sample_data, sql_statements):
+    response = client.get("/api/v1/books?limit=5&sort=title")
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+    assert response.last_modified is not None
+
+    sql_statements.clear()
+    # arguments in different order are the same response
+    response = client.get(
+        "/api/v1/books?sort=title&limit=5", headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+    # only table versions are read
+    assert len(sql_statements) == 1
+
+    response = client.get("/api/v1/books?limit=6", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_get_books_etag_changes_after_write(client, sample_data, token, author):
+    etag = client.get("/api/v1/books").headers["ETag"]
+
+    response = client.post(
+        "/api/v1/authors", json=author, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 201
+
+    response = client.get("/api/v1/books", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_get_books_response_cache(app, client, sample_data, token, backend, tmp_path):
+    app.config.update(RESPONSE_CACHE=backend, RESPONSE_CACHE_PATH=tmp_path / "db")
+    init_response_cache(app)
+    cache = app.extensions["response_cache"]
+
+    response = client.get("/api/v1/books?sort=-number_of_votes&limit=3")
+    book = response.get_json()["data"][0]
+    assert response.headers["X-Cache"] == "MISS"
+
+    cached_response = client.get("/api/v1/books?limit=3&sort=-number_of_votes")
+    assert cached_response.headers["X-Cache"] == "HIT"
+    assert cached_response.get_json() == response.get_json()
+    assert cached_response.headers["ETag"] == response.headers["ETag"]
+
+    # votes are not a part of books responses
+    assert client.get("/api/v1/votes").headers["X-Cache"] == "MISS"
+    client.post(
+        "/api/v1/vote",
+        json={"points": 5, "comment_text": "Good", "book_id": book["id"]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    response = client.get("/api/v1/books?limit=3&sort=-number_of_votes")
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.get_json()["data"][0]["id"] == book["id"]
+    assert response.get_json()["data"][0]["number_of_votes"] == (
+        book["number_of_votes"] + 1
+    )
+    assert cache.stats() == {"hits": 1, "misses": 3, "hit_ratio": 0.25}
+
+
+@pytest.mark.parametrize("url", ["/api/v1/books/1", "/api/v1/authors/1"])
+def test_delete_changes_votes_etag(app, client, sample_data, token, url):
+    app.config.update(RESPONSE_CACHE="memory")
+    init_response_cache(app)
+    with app.app_context():
+        book_id = Book.query.filter(Book.author_id == 1).first().id
+    votes_url = f"/api/v1/votes?book_id={book_id}"
+    assert client.get(votes_url).get_json()["data"]
+    assert client.get(votes_url).headers["X-Cache"] == "HIT"
+
+    # votes of deleted books lose their book
+    client.delete(url, headers={"Authorization": f"Bearer {token}"})
+    response = client.get(votes_url)
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.get_json()["data"] == []
+
+
+def test_response_cache_backend_without_save():
+    class IncompleteCache(ResponseCache):
+        def load(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        IncompleteCache(max_size=2, ttl=10)
+
+
+def test_response_cache_eviction(tmp_path, monkeypatch):
+    cache = SQLiteResponseCache(max_size=2, ttl=10, path=tmp_path / "db")
+    for key in ["a", "b", "c"]:
+        cache.set(key, (key.encode(), "application/json"))
+
+    # least recently used entry is evicted
+    assert cache.get("a") is None
+    assert cache.get("b") == (b"b", "application/json")
+
+    monkeypatch.setattr(time, "time", lambda: 10**10)
+    assert cache.get("b") is None
+
+
+@pytest.mark.parametrize("backend", ["auto", "like"])
+def test_search_books(app, client, sample_data, backend):
+    app.config["SEARCH_BACKEND"] = backend
+    response = client.get("/api/v1/books?q=hunger games&fields=id,title")
+    titles = [book["title"] for book in response.get_json()["data"]]
+
+    assert response.status_code == 200
+    assert sorted(titles) == ["Catching Fire", "Hunger Games", "Mockingjay"]
+    if backend == "auto":
+        # title matches are more important than description
+        assert titles[0] == "Hunger Games"
+
+    # author names are searched too
+    response = client.get("/api/v1/books?q=orwell&sort=title")
+    titles = [book["title"] for book in response.get_json()["data"]]
+    assert titles == ["1984", "Animal Farm"]
+
+
+def test_search_books_pagination(client, sample_data):
+    response = client.get("/api/v1/books?q=harvard&limit=1")
+    response_data = response.get_json()
+
+    assert response_data["numbers_of_records"] == 1
+    assert response_data["pagination"]["total_records"] == 2
+    response = client.get(response_data["pagination"]["next_page"])
+    assert response.get_json()["numbers_of_records"] == 1
+    assert response.get_json()["data"][0]["id"] != response_data["data"][0]["id"]
+
+    response = client.get('/api/v1/books?q="*')
+    assert response.get_json()["data"] == []
+
+
+def test_search_index_follows_writes(client, sample_data, token, author):
+    headers = {"Authorization": f"Bearer {token}"}
+    book = {
+        "title": "Burmese Days",
+        "isbn": 9780141185378,
+        "number_of_pages": 300,
+        "description": "Set in the imperial outpost of Kyauktada",
+        "book_category": "novel",
+        "cover_name": "cover15.jpg",
+    }
+    response = client.post("/api/v1/authors/1/books", json=book, headers=headers)
+    book_id = response.get_json()["data"]["id"]
+    response = client.get("/api/v1/books?q=kyauktada orwell")
+    assert [book["id"] for book in response.get_json()["data"]] == [book_id]
+
+    # author name is a part of book index
+    author["last_name"] = "Blair"
+    client.put("/api/v1/authors/1", json=author, headers=headers)
+    response = client.get("/api/v1/books?q=blair&sort=id")
+    assert [book["id"] for book in response.get_json()["data"]] == [1, 2, book_id]
+    assert client.get("/api/v1/books?q=kyauktada orwell").get_json()["data"] == []
+
+    client.delete(f"/api/v1/books/{book_id}", headers=headers)
+    assert client.get("/api/v1/books?q=kyauktada").get_json()["data"] == []
+
+
+def test_create_books_bulk(client, sample_data, token, sql_statements):
+    book = {
+        "title": "Burmese Days",
+        "isbn": 9780141185378,
+        "number_of_pages": 300,
+        "description": "Set in the imperial outpost of Kyauktada",
+        "book_category": "novel",
+    }
+    books = [
+        dict(book, cover_name="cover15.jpg"),
+        dict(book, cover_name="cover16.jpg"),
+        dict(book, isbn=9780141185385, cover_name="cover17.jpg"),
+        dict(book, isbn=9780141036137, cover_name="cover18.jpg"),
+        {"title": "Coming Up for Air", "isbn": 9780141185651, "number_of_pages": 1},
+    ]
+    sql_statements.clear()
+    response = client.post(
+        "/api/v1/authors/1/books/bulk",
+        json=books,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    response_data = response.get_json()
+
+    assert response.status_code == 201
+    assert [item["id"] for item in response_data["data"]] == [15, 16]
+    assert [item["cover_name"] for item in response_data["data"]] == [
+        "cover15.jpg",
+        "cover17.jpg",
+    ]
+    # repeated ISBN, ISBN of 1984 from sample data and missing required column
+    assert [error["index"] for error in response_data["errors"]] == [1, 3, 4]
+    assert "description" in response_data["errors"][2]["errors"]
+    inserts = [s for s in sql_statements if s.startswith("INSERT INTO books ")]
+    assert len(inserts) == 1
+
+    response = client.get("/api/v1/books?q=kyauktada&sort=id")
+    assert [item["id"] for item in response.get_json()["data"]] == [15, 16]
+    response = client.get("/api/v1/suggest?prefix=burmese")
+    assert [item["id"] for item in response.get_json()["data"]] == [15, 16]
+
+
+def test_create_books_bulk_without_covers(client, sample_data, token):
+    books = [
+        {
+            "title": f"Essays {number}",
+            "isbn": 9780141185390 + number,
+            "number_of_pages": 200,
+            "description": "Essays",
+            "book_category": "essay",
+        }
+        for number in range(3)
+    ]
+    response = client.post(
+        "/api/v1/authors/1/books/bulk",
+        json=books,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    response_data = response.get_json()
+
+    # cover names are unique, so only the first book gets the default one
+    assert response.status_code == 201
+    assert [item["cover_name"] for item in response_data["data"]] == ["cover0.jpg"]
+    assert response_data["errors"] == [
+        {"index": index, "errors": {"cover_name": ["Cover cover0.jpg is already used"]}}
+        for index in (1, 2)
+    ]
+
+
+def test_create_books_bulk_wrong_author(client, token):
+    response = client.post(
+        "/api/v1/authors/1/books/bulk",
+        json=[],
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 404
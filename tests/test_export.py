@@ -0,0 +1,61 @@
+import csv
+import gzip
+import json
+import pytest
+
+
+def read_ndjson(response) -> list[dict]:
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_export_books(client, sample_data, sql_statements):
+    sql_statements.clear()
+    response = client.get("/api/v1/export/books")
+    books = read_ndjson(response)
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert (
+        response.headers["Content-Disposition"] == "attachment; filename=books.ndjson"
+    )
+    assert [book["id"] for book in books] == list(range(1, 15))
+    assert "author" not in books[0]
+    # rows are read with one query, without COUNT
+    assert len([s for s in sql_statements if s.startswith("SELECT")]) == 1
+
+
+def test_export_matches_list_endpoint(client, sample_data):
+    params = "fields=id,title,number_of_pages&number_of_pages[gte]=300&sort=-title"
+    exported = read_ndjson(client.get(f"/api/v1/export/books?{params}"))
+    listed = client.get(f"/api/v1/books?{params}&limit=20").get_json()["data"]
+
+    assert exported == listed
+    assert set(exported[0]) == {"id", "title", "number_of_pages"}
+
+
+def test_export_authors_csv(client, sample_data):
+    response = client.get("/api/v1/export/authors?format=csv&fields=id,birth_date")
+    rows = list(csv.reader(response.get_data(as_text=True).splitlines()))
+
+    assert response.mimetype == "text/csv"
+    assert rows[0] == ["id", "birth_date"]
+    assert rows[1] == ["1", "25-06-1903"]
+    assert len(rows) == 11
+
+
+def test_export_gzip(client, sample_data):
+    response = client.get(
+        "/api/v1/export/votes", headers={"Accept-Encoding": "gzip, deflate"}
+    )
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    votes = [json.loads(line) for line in gzip.decompress(response.data).splitlines()]
+    assert len(votes) == 16
+
+
+@pytest.mark.parametrize(
+    "url, status_code",
+    [("/api/v1/export/users", 404), ("/api/v1/export/books?format=xml", 400)],
+)
+def test_export_invalid_arguments(client, url, status_code):
+    assert client.get(url).status_code == status_code
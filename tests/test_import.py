@@ -0,0 +1,174 @@
+import csv
+import json
+import pytest
+from book_library_app import db
+from book_library_app.commands.db_manage_commands import import_data_command
+from book_library_app.models import Author, Book, ImportCheckpoint, User, Votes
+
+
+@pytest.fixture
+def authors_file(tmp_path):
+    path = tmp_path / "authors.jsonl"
+    with open(path, "w") as file:
+        for number in range(7):
+            author = {
+                "first_name": f"Name{number}",
+                "last_name": f"Surname{number}",
+                "birth_date": "25-06-1903" if number % 2 else "1903-06-25",
+            }
+            file.write(json.dumps(author) + "\n")
+    return path
+
+
+def test_import_authors(app, authors_file):
+    runner = app.test_cli_runner()
+    result = runner.invoke(
+        import_data_command, ["authors", str(authors_file), "--batch-size", "3"]
+    )
+
+    assert "3 rows imported" in result.output
+    assert "7 authors have been imported" in result.output
+    with app.app_context():
+        assert ImportCheckpoint.query.count() == 0
+        assert Author.query.count() == 7
+        assert {author.birth_date.isoformat() for author in Author.query} == {
+            "1903-06-25"
+        }
+
+    response = app.test_client().get("/api/v1/authors?q=surname4")
+    assert [author["id"] for author in response.get_json()["data"]] == [5]
+
+
+def test_import_resumes_from_checkpoint(app, authors_file):
+    with app.app_context():
+        db.session.add(
+            ImportCheckpoint(kind="authors", source=str(authors_file.resolve()), rows=5)
+        )
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(import_data_command, ["authors", str(authors_file)])
+
+    assert "Resuming after 5 rows" in result.output
+    with app.app_context():
+        assert [author.first_name for author in Author.query] == ["Name5", "Name6"]
+
+    result = runner.invoke(
+        import_data_command, ["authors", str(authors_file), "--restart"]
+    )
+    with app.app_context():
+        assert Author.query.count() == 9
+
+
+def test_import_checkpoint_saved_with_batch(app, authors_file):
+    lines = authors_file.read_text().splitlines()
+    invalid = json.dumps({"first_name": "X", "last_name": "Y", "birth_date": "bad"})
+    authors_file.write_text("\n".join(lines[:4] + [invalid] + lines[5:]) + "\n")
+
+    runner = app.test_cli_runner()
+    args = ["authors", str(authors_file), "--batch-size", "3"]
+    result = runner.invoke(import_data_command, args)
+
+    # the failed batch is rolled back with its checkpoint
+    assert "Row 5, birth_date" in result.output
+    with app.app_context():
+        assert ImportCheckpoint.query.one().rows == 3
+        assert Author.query.count() == 3
+
+    authors_file.write_text("\n".join(lines) + "\n")
+    result = runner.invoke(import_data_command, args)
+    assert "Resuming after 3 rows" in result.output
+    with app.app_context():
+        assert [author.first_name for author in Author.query] == [
+            f"Name{number}" for number in range(7)
+        ]
+
+
+def test_import_books_users_and_votes_csv(app, authors_file, tmp_path):
+    runner = app.test_cli_runner()
+    runner.invoke(import_data_command, ["authors", str(authors_file)])
+
+    files = {
+        "books": [
+            {
+                "id": number,
+                "title": f"Book {number}",
+                "isbn": 9780000000000 + number,
+                "number_of_pages": 100,
+                "description": "Line\twith tab" if number == 1 else "",
+                "author_id": number,
+                "book_category": "novel",
+                "cover_name": f"cover{number}.jpg",
+            }
+            for number in range(1, 4)
+        ],
+        "users": [
+            {
+                "username": f"user{number}",
+                "email": f"{number}@x.com",
+                "password": "secret",
+            }
+            for number in range(4)
+        ],
+        "votes": [
+            {"points": 5, "comment_text": "", "book_id": 1, "user_id": 1},
+            {"points": 2, "comment_text": "", "book_id": 1, "user_id": 2},
+            {"points": "", "comment_text": "", "book_id": 2, "user_id": 1},
+        ],
+    }
+    for kind, rows in files.items():
+        path = tmp_path / f"{kind}.csv"
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        result = runner.invoke(
+            import_data_command,
+            [kind, str(path), "--batch-size", "2", "--workers", "2"],
+        )
+        assert f"{len(rows)} {kind} have been imported" in result.output
+
+    with app.app_context():
+        assert Book.query.get(1).description == "Line\twith tab"
+        assert Book.query.get(2).number_of_votes == 1
+        assert Book.query.get(1).average_book_score == pytest.approx(3.5)
+        assert Votes.query.filter(Votes.points.is_(None)).count() == 1
+        users = User.query.all()
+        assert len(users) == 4
+        assert all(user.is_password_valid("secret") for user in users)
+
+
+def test_import_invalid_row(app, tmp_path):
+    path = tmp_path / "books.jsonl"
+    path.write_text(json.dumps({"title": "Book", "isbn": "not a number"}) + "\n")
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(import_data_command, ["books", str(path)])
+
+    assert "Row 1, isbn" in result.output
+    with app.app_context():
+        assert db.session.query(Book.id).count() == 0
+
+
+def test_import_books_without_covers(app, authors_file, tmp_path):
+    runner = app.test_cli_runner()
+    runner.invoke(import_data_command, ["authors", str(authors_file)])
+    path = tmp_path / "books.jsonl"
+    with open(path, "w") as file:
+        for number in range(1, 4):
+            book = {
+                "title": f"Book {number}",
+                "isbn": 9780000000000 + number,
+                "number_of_pages": 100,
+                "description": "",
+                "author_id": number,
+                "book_category": "novel",
+            }
+            file.write(json.dumps(book) + "\n")
+
+    result = runner.invoke(import_data_command, ["books", str(path)])
+
+    # cover names are unique, so only one book can have the default cover
+    assert "Row 2, cover_name: cover0.jpg (default) is already used" in result.output
+    with app.app_context():
+        assert db.session.query(Book.id).count() == 0
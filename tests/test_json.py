@@ -0,0 +1,70 @@
+import pytest
+from datetime import date, datetime
+from flask import json
+from flask.json import JSONEncoder
+from config import TestingConfig
+from book_library_app import create_app
+from book_library_app.json_provider import OrjsonEncoder
+from book_library_app.models import Author, AuthorSchema, User, UserSchema
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {
+            "data": AuthorSchema().dump(
+                Author(
+                    id=1,
+                    first_name="George",
+                    last_name="Orwell",
+                    birth_date=date(1903, 6, 25),
+                )
+            )
+        },
+        {
+            "data": UserSchema().dump(
+                User(
+                    id=1,
+                    username="test",
+                    email="test@gmail.com",
+                    creation_date=datetime(2022, 4, 1, 12, 30, 15, 123456),
+                )
+            )
+        },
+        {"birth_date": date(1903, 6, 25), "created": datetime(2022, 4, 1, 12, 30)},
+        {"title": "Zażółć gęślą jaźń", "scores": [1.5, None, True]},
+        {1: "int keys", 2: "are converted to strings"},
+        {"isbn": 2**70},
+    ],
+)
+@pytest.mark.parametrize("sort_keys", [True, False])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_orjson_encoder_output(data, sort_keys, indent):
+    # the same arguments as in jsonify
+    separators = (",", ":") if indent is None else (", ", ": ")
+    options = {"sort_keys": sort_keys, "indent": indent, "separators": separators}
+    expected = json.dumps(data, cls=JSONEncoder, **options)
+    result = json.dumps(data, cls=OrjsonEncoder, **options)
+
+    assert json.loads(result) == json.loads(expected)
+    if indent is None:
+        assert result == expected
+
+
+def test_json_backend(app, client, author, token):
+    assert app.json_encoder is OrjsonEncoder
+
+    response = client.post(
+        "/api/v1/authors", json=author, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.get_json()["data"]["birth_date"] == "25-06-1903"
+
+    response = client.get("/api/v1/authors/20")
+    assert response.status_code == 404
+    assert response.get_json()["success"] is False
+
+
+def test_stdlib_json_backend(monkeypatch):
+    monkeypatch.setattr(TestingConfig, "JSON_BACKEND", "json")
+
+    assert create_app("testing").json_encoder is JSONEncoder
@@ -0,0 +1,120 @@
+"""EXPLAIN of every query apply_filter and apply_order can generate, run only them
+with `python -m pytest -m explain`"""
+
+import pytest
+from sqlalchemy import inspect
+from book_library_app import db
+from book_library_app.models import Author, Book, HashResetTable, Votes
+from book_library_app.search import apply_search
+from book_library_app.utils import apply_filter, apply_order
+
+pytestmark = pytest.mark.explain
+
+# columns which are not indexed, they are only shown and filtered together
+# with indexed ones
+UNINDEXED_COLUMNS = {
+    "first_name",
+    "last_name",
+    "author_average_score",
+    "number_of_pages",
+    "description",
+    "book_category",
+    "cover_name",
+    "number_of_votes",
+    "score_sum",
+    "points",
+    "comment_text",
+}
+
+FILTER_VALUES = {"birth_date": "25-06-1903", "title": "Animal Farm"}
+
+
+def get_query_args() -> list:
+    """Request arguments filtering or sorting by every indexed column"""
+    query_args = []
+    for model in [Author, Book, Votes]:
+        primary_key = inspect(model).primary_key[0].key
+        for column in inspect(model).columns.keys():
+            if column in UNINDEXED_COLUMNS or column == primary_key:
+                continue
+            value = FILTER_VALUES.get(column, "1")
+            query_args += [
+                (model, {column: value}),
+                (model, {f"{column}[gte]": value}),
+                (model, {f"{column}[lt]": value, "sort": f"-{column}"}),
+                (model, {"sort": column}),
+                (model, {"sort": f"-{column}"}),
+            ]
+    return query_args
+
+
+def get_sequential_scans(statement) -> list[str]:
+    """Tables read from beginning to end by query according to database plan"""
+    if db.engine.dialect.name == "postgresql":
+        # planner prefers sequential scans of small tables, when they are disabled
+        # sequential scan is chosen only if there is no index to use
+        db.session.execute("SET LOCAL enable_seqscan = off")
+        plan = db.session.execute(
+            db.text(f"EXPLAIN (FORMAT JSON) {statement}")
+        ).scalar()
+        nodes, scans = [plan[0]["Plan"]], []
+        while nodes:
+            node = nodes.pop()
+            nodes += node.get("Plans", [])
+            if node["Node Type"] == "Seq Scan":
+                scans.append(node["Relation Name"])
+        db.session.rollback()
+        return scans
+
+    plan = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {statement}")).all()
+    return [
+        row.detail
+        for row in plan
+        if row.detail.startswith("SCAN")
+        and "INDEX" not in row.detail
+        or row.detail == "USE TEMP B-TREE FOR ORDER BY"
+    ]
+
+
+def compile_query(query) -> str:
+    return query.statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+
+
+@pytest.mark.parametrize(
+    "model,query_args",
+    get_query_args(),
+    ids=lambda value: value.__name__ if isinstance(value, type) else str(value),
+)
+def test_filter_and_order_use_indexes(app, model, query_args):
+    with app.test_request_context(query_string=query_args):
+        # without sort it is like count query of pagination
+        query = apply_filter(model, model.query)
+        if "sort" in query_args:
+            query = apply_order(model, query).limit(5)
+
+        assert get_sequential_scans(compile_query(query)) == []
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        # vote of a user for a book is checked before it is saved
+        lambda: Votes.query.filter(Votes.user_id == 1, Votes.book_id == 1),
+        lambda: HashResetTable.query.filter(HashResetTable.hash_code == "hash"),
+        # books preview of authors on a page
+        lambda: Book.query.filter(Book.author_id.in_([1, 2])),
+    ],
+)
+def test_lookups_use_indexes(app, query):
+    with app.app_context():
+        assert get_sequential_scans(compile_query(query())) == []
+
+
+@pytest.mark.parametrize("model", [Author, Book])
+def test_search_uses_index(app, model):
+    with app.test_request_context(query_string={"q": "george orwell"}):
+        query = apply_search(model, model.query)
+        scans = get_sequential_scans(compile_query(query))
+
+        # only matching records are sorted by rank
+        assert [scan for scan in scans if "ORDER BY" not in scan] == []
@@ -0,0 +1,45 @@
+import json
+import pytest
+from book_library_app.models import (
+    Author,
+    AuthorSchema,
+    Book,
+    BookSchema,
+    User,
+    UserSchema,
+    Votes,
+    VotesSchema,
+)
+from book_library_app.serializers import get_serializer
+
+
+@pytest.mark.parametrize(
+    "model,schema_class,schema_args",
+    [
+        (Book, BookSchema, {}),
+        (Book, BookSchema, {"only": ["id", "title", "cover_name"]}),
+        (Book, BookSchema, {"exclude": ["author"]}),
+        (Author, AuthorSchema, {}),
+        (Author, AuthorSchema, {"only": ["birth_date", "last_name"]}),
+        (Votes, VotesSchema, {}),
+        (User, UserSchema, {}),
+    ],
+)
+def test_compiled_serializer_output(app, sample_data, model, schema_class, schema_args):
+    with app.app_context():
+        items = model.query.all()
+        if model is Author:
+            # not saved, only to check serialization of None
+            items[0].author_average_score = None
+
+        expected = schema_class(many=True, **schema_args).dump(items)
+        result = get_serializer(schema_class, many=True, **schema_args).dump(items)
+
+    assert json.dumps(result, sort_keys=True) == json.dumps(expected, sort_keys=True)
+
+
+def test_compiled_serializer_is_cached():
+    serializer = get_serializer(BookSchema, many=True, only=["title", "id"])
+
+    assert get_serializer(BookSchema, many=True, only=["id", "title"]) is serializer
+    assert get_serializer(BookSchema, many=True) is not serializer
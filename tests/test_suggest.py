@@ -0,0 +1,98 @@
+import time
+import pytest
+from book_library_app import db
+from book_library_app.models import Book
+from book_library_app.suggestions import bump_suggest_versions
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        ("prefix=hun&kind=book", ["Hunger Games"]),
+        ("prefix=  THE  ", []),
+        ("prefix=o&kind=book", ["Old Man and the Sea", "Origin"]),
+        ("prefix=o&kind=book&limit=1", ["Old Man and the Sea"]),
+        ("prefix=geo&kind=author", ["George Orwell"]),
+        ("prefix=orw&kind=author", ["George Orwell"]),
+        ("prefix=&kind=author", []),
+    ],
+)
+def test_suggest(client, sample_data, query, expected):
+    response = client.get(f"/api/v1/suggest?{query}")
+
+    assert response.status_code == 200
+    assert [record["text"] for record in response.get_json()["data"]] == expected
+
+
+def test_suggest_invalid_kind(client):
+    response = client.get("/api/v1/suggest?prefix=a&kind=user")
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+def test_suggest_follows_writes(client, sample_data, token, author):
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/v1/suggest?prefix=orw&kind=author").get_json()["data"]
+
+    author["last_name"] = "Blair"
+    client.put("/api/v1/authors/1", json=author, headers=headers)
+    assert not client.get("/api/v1/suggest?prefix=orw&kind=author").get_json()["data"]
+    response = client.get("/api/v1/suggest?prefix=blair&kind=author")
+    assert response.get_json()["data"] == [{"id": 1, "text": "George Blair"}]
+
+    client.delete("/api/v1/authors/1", headers=headers)
+    assert client.get("/api/v1/suggest?prefix=blair&kind=author").get_json() == {
+        "data": [],
+        "numbers_of_records": 0,
+    }
+    assert not client.get("/api/v1/suggest?prefix=animal").get_json()["data"]
+
+
+def test_suggest_rebuilt_after_write_of_other_worker(app, client, sample_data):
+    app.config["SUGGEST_REFRESH_INTERVAL"] = 0
+    index = app.extensions["suggest"]["book"]
+    client.get("/api/v1/suggest?prefix=it")
+
+    # other worker changes title without updating index of this one
+    with app.app_context():
+        Book.query.get(6).title = "Insomnia"
+        bump_suggest_versions(Book)
+        db.session.commit()
+        index.refresh()
+    while index.rebuilding:
+        time.sleep(0.01)
+
+    response = client.get("/api/v1/suggest?prefix=i")
+    assert [record["text"] for record in response.get_json()["data"]] == [
+        "Inferno",
+        "Insomnia",
+    ]
+
+
+def test_suggest_not_rebuilt_after_other_writes(app, client, sample_data, token):
+    app.config["SUGGEST_REFRESH_INTERVAL"] = 0
+    headers = {"Authorization": f"Bearer {token}"}
+    index = app.extensions["suggest"]["book"]
+    client.get("/api/v1/suggest?prefix=it")
+    version = index.version
+
+    # votes do not change titles and own writes are already in the index
+    client.post(
+        "/api/v1/vote",
+        json={"points": 4, "comment_text": "", "book_id": 1},
+        headers=headers,
+    )
+    book = {
+        "title": "Insomnia",
+        "isbn": 9780000000001,
+        "number_of_pages": 100,
+        "description": "",
+        "book_category": "horror",
+    }
+    client.post("/api/v1/authors/1/books", json=book, headers=headers)
+    response = client.get("/api/v1/suggest?prefix=ins")
+
+    assert not index.rebuilding
+    assert index.version == version + 1
+    assert [record["text"] for record in response.get_json()["data"]] == ["Insomnia"]
@@ -0,0 +1,327 @@
+import random
+import pytest
+from datetime import date
+from book_library_app import db
+from book_library_app.models import Author, Book, User, Votes
+from book_library_app.utils import apply_vote_delta
+
+
+def full_recompute() -> tuple:
+    """Book and author stats calculated from scratch based on rows in Votes"""
+    books_stats = {}
+    for book in Book.query.all():
+        points = [vote.points for vote in Votes.query.filter_by(book_id=book.id)]
+        average = sum(points) / len(points) if points else 0
+        books_stats[book.id] = (len(points), sum(points), average)
+
+    authors_stats = {}
+    for author in Author.query.all():
+        averages = [books_stats[book.id][2] for book in author.books]
+        authors_stats[author.id] = sum(averages) / len(averages) if averages else 0
+    return books_stats, authors_stats
+
+
+def stored_stats() -> tuple:
+    books_stats = {
+        book.id: (book.number_of_votes, book.score_sum, book.average_book_score)
+        for book in Book.query.all()
+    }
+    authors_stats = {
+        author.id: author.author_average_score for author in Author.query.all()
+    }
+    return books_stats, authors_stats
+
+
+@pytest.fixture
+def library(app):
+    with app.app_context():
+        for number in range(2):
+            db.session.add(
+                Author(
+                    first_name=f"A{number}", last_name="B", birth_date=date(1950, 1, 1)
+                )
+            )
+        for number in range(5):
+            db.session.add(
+                Book(
+                    title=f"Book {number}",
+                    isbn=9780000000000 + number,
+                    number_of_pages=100,
+                    description="",
+                    author_id=number % 2 + 1,
+                    book_category="test",
+                    cover_name=f"cover{number}.jpg",
+                )
+            )
+        for number in range(6):
+            db.session.add(
+                User(username=f"user{number}", email=f"u{number}@x.com", password="x")
+            )
+        db.session.commit()
+    return app
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vote_delta_matches_full_recompute(library, seed):
+    rng = random.Random(seed)
+
+    with library.app_context():
+        for _ in range(80):
+            votes = Votes.query.all()
+            action = rng.choice(["create", "edit", "delete"]) if votes else "create"
+            # user can vote for a book only once
+            voted = {(vote.user_id, vote.book_id) for vote in votes}
+            not_voted = [
+                (user_id, book_id)
+                for user_id in range(1, 7)
+                for book_id in range(1, 6)
+                if (user_id, book_id) not in voted
+            ]
+
+            if action == "create" and not_voted:
+                user_id, book_id = rng.choice(not_voted)
+                vote = Votes(points=rng.randint(0, 5), book_id=book_id, user_id=user_id)
+                db.session.add(vote)
+                apply_vote_delta(vote.book_id, vote.points, votes_delta=1)
+            elif action in ("create", "edit"):
+                vote = rng.choice(votes)
+                new_points = rng.randint(0, 5)
+                apply_vote_delta(vote.book_id, new_points - vote.points)
+                vote.points = new_points
+            else:
+                vote = rng.choice(votes)
+                db.session.delete(vote)
+                apply_vote_delta(vote.book_id, -vote.points, votes_delta=-1)
+            db.session.commit()
+
+        expected_books, expected_authors = full_recompute()
+        books, authors = stored_stats()
+
+        for book_id, (number_of_votes, score_sum, average) in expected_books.items():
+            assert books[book_id][0] == number_of_votes
+            assert books[book_id][1] == score_sum
+            assert books[book_id][2] == pytest.approx(average)
+        for author_id, average in expected_authors.items():
+            assert authors[author_id] == pytest.approx(average)
+
+
+def test_vote_endpoints_update_book_stats(client, token, library):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.post(
+        "/api/v1/vote",
+        json={"points": 4, "comment_text": "Good", "book_id": 1},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    comment_id = response.get_json()["data"]["comment_id"]
+
+    response = client.put(
+        f"/api/v1/vote/{comment_id}",
+        json={"points": 2, "comment_text": "Fine"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    with library.app_context():
+        book = Book.query.get(1)
+        assert (book.number_of_votes, book.score_sum, book.average_book_score) == (
+            1,
+            2,
+            2,
+        )
+        assert Author.query.get(book.author_id).author_average_score == pytest.approx(
+            2 / 3
+        )
+
+    response = client.delete(f"/api/v1/vote/{comment_id}", headers=headers)
+    assert response.status_code == 200
+
+    with library.app_context():
+        book = Book.query.get(1)
+        assert (book.number_of_votes, book.score_sum, book.average_book_score) == (
+            0,
+            0,
+            0,
+        )
+
+
+def test_vote_for_missing_book(client, token, library):
+    response = client.post(
+        "/api/v1/vote",
+        json={"points": 4, "comment_text": "Good", "book_id": 60},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 404
+    with library.app_context():
+        assert Votes.query.count() == 0
+
+
+@pytest.fixture
+def stale_votes(library):
+    """Votes added without updating stats"""
+    with library.app_context():
+        rng = random.Random(0)
+        for user_id in range(1, 7):
+            for book_id in range(1, 6):
+                db.session.add(
+                    Votes(points=rng.randint(0, 5), book_id=book_id, user_id=user_id)
+                )
+        db.session.commit()
+    return library
+
+
+def test_recompute_stats_dry_run(stale_votes):
+    result = stale_votes.test_cli_runner().invoke(
+        args=["db-manage", "recompute-stats", "--dry-run"]
+    )
+
+    assert "5 books and 2 authors have outdated stats" in result.output
+    assert "Book 1: number_of_votes 0 -> 6" in result.output
+    with stale_votes.app_context():
+        assert all(
+            number_of_votes == 0 for number_of_votes, _, _ in stored_stats()[0].values()
+        )
+
+
+def test_recompute_stats(stale_votes):
+    result = stale_votes.test_cli_runner().invoke(args=["db-manage", "recompute-stats"])
+
+    assert "Stats have been recalculated for 5 books and 2 authors" in result.output
+    with stale_votes.app_context():
+        expected_books, expected_authors = full_recompute()
+        books, authors = stored_stats()
+
+        assert books == pytest.approx(expected_books)
+        assert authors == pytest.approx(expected_authors)
+
+
+def test_recompute_stats_author_without_books(library):
+    with library.app_context():
+        author = Author.query.get(2)
+        author.author_average_score = 4.5
+        for book in author.books:
+            db.session.delete(book)
+        db.session.commit()
+
+    result = library.test_cli_runner().invoke(
+        args=["db-manage", "recompute-stats", "--dry-run"]
+    )
+    assert "Author 2: author_average_score 4.5 -> 0" in result.output
+
+    library.test_cli_runner().invoke(args=["db-manage", "recompute-stats"])
+    with library.app_context():
+        assert Author.query.get(2).author_average_score == 0
+
+
+def test_recompute_stats_range(stale_votes):
+    result = stale_votes.test_cli_runner().invoke(
+        args=["db-manage", "recompute-stats", "--start-id", "2", "--end-id", "3"]
+    )
+
+    assert "Stats have been recalculated for 2 books and 2 authors" in result.output
+    with stale_votes.app_context():
+        expected_books, _ = full_recompute()
+        books, _ = stored_stats()
+
+        assert books[1] == (0, 0, 0)
+        assert books[2] == pytest.approx(expected_books[2])
+        assert books[3] == pytest.approx(expected_books[3])
+        assert books[4] == (0, 0, 0)
+
+
+def test_get_book_votes(client, sample_data):
+    response = client.get("/api/v1/vote/1?limit=1")
+    response_data = response.get_json()
+
+    assert response.status_code == 200
+    assert response_data["numbers_of_records"] == 1
+    assert response_data["data"][0]["book_id"] == 1
+    assert (
+        response_data["pagination"]["current_page"] == "/api/v1/vote/1?page=1&limit=1"
+    )
+
+
+def test_vote_changes_etags(client, token, library):
+    etags = {
+        url: client.get(url).headers["ETag"]
+        for url in ["/api/v1/votes", "/api/v1/vote/1", "/api/v1/authors/1"]
+    }
+
+    client.post(
+        "/api/v1/vote",
+        json={"points": 4, "comment_text": "Good", "book_id": 1},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    for url, etag in etags.items():
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+
+def test_table_versions_bumped_right_before_commit(
+    client, token, library, sql_statements
+):
+    headers = {"Authorization": f"Bearer {token}"}
+    # the first write creates rows of table_versions in database made by create_all
+    client.post(
+        "/api/v1/vote",
+        json={"points": 4, "comment_text": "", "book_id": 1},
+        headers=headers,
+    )
+    sql_statements.clear()
+    client.post(
+        "/api/v1/vote",
+        json={"points": 2, "comment_text": "", "book_id": 2},
+        headers=headers,
+    )
+
+    # shared version rows are locked only for the time of commit
+    bumps = [
+        number
+        for number, statement in enumerate(sql_statements)
+        if statement.startswith("UPDATE table_versions")
+    ]
+    assert len(bumps) == 1
+    commit = sql_statements.index("COMMIT", bumps[0])
+    assert all(
+        "table_versions" in statement for statement in sql_statements[bumps[0] : commit]
+    )
+
+
+def test_create_votes_bulk(client, token, library, sql_statements):
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post(
+        "/api/v1/vote",
+        json={"points": 1, "comment_text": "", "book_id": 1},
+        headers=headers,
+    )
+    votes = [
+        {"points": 4, "comment_text": "Good", "book_id": 2},
+        {"points": 5, "comment_text": "Great", "book_id": 3},
+        {"points": 2, "comment_text": "Again", "book_id": 2},
+        {"points": 3, "comment_text": "Voted", "book_id": 1},
+        {"points": 3, "comment_text": "Missing", "book_id": 20},
+        {"points": 7, "comment_text": "Too much", "book_id": 4},
+        {"points": 0, "comment_text": "Bad", "book_id": 5},
+    ]
+    sql_statements.clear()
+    response = client.post("/api/v1/vote/bulk", json=votes, headers=headers)
+    response_data = response.get_json()
+
+    assert response.status_code == 201
+    assert [vote["book_id"] for vote in response_data["data"]] == [2, 3, 5]
+    assert [error["index"] for error in response_data["errors"]] == [2, 3, 4, 5]
+    assert len([s for s in sql_statements if s.startswith("INSERT INTO votes")]) == 1
+    assert len([s for s in sql_statements if s.startswith("UPDATE books")]) == 1
+
+    with library.app_context():
+        expected_books, expected_authors = full_recompute()
+        books, authors = stored_stats()
+        for book_id, (number_of_votes, score_sum, average) in expected_books.items():
+            assert books[book_id][:2] == (number_of_votes, score_sum)
+            assert books[book_id][2] == pytest.approx(average)
+        for author_id, average in expected_authors.items():
+            assert authors[author_id] == pytest.approx(average)